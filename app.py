@@ -1,6 +1,6 @@
 """
 NEXDB - Entry Point
-Run with: flask run (development) or gunicorn app:app (production)
+Run with: flask run (development); production runs wsgi:app under gunicorn
 """
 
 import os
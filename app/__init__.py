@@ -4,9 +4,9 @@ Main application initialization
 """
 
 import os
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_jwt_extended import JWTManager
 from flask_wtf.csrf import CSRFProtect
@@ -19,7 +19,6 @@ from flask_apscheduler import APScheduler
 
 # Initialize extensions
 db = SQLAlchemy()
-migrate = Migrate()
 login_manager = LoginManager()
 jwt = JWTManager()
 csrf = CSRFProtect()
@@ -38,16 +37,36 @@ def create_app(config_name='default'):
     from config.config import config_by_name
     app.config.from_object(config_by_name[config_name])
     
+    # Tune SQLite engine options before the engine is created
+    from app.sqlite import configure_sqlite, init_sqlite
+    configure_sqlite(app)
+    
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
+    with app.app_context():
+        init_sqlite(app, db.engine)
     login_manager.init_app(app)
     jwt.init_app(app)
     csrf.init_app(app)
     bcrypt.init_app(app)
+    # Registers the sqlite-shared:// rate limit storage scheme
+    from app import ratelimit  # noqa: F401
     limiter.init_app(app)
     scheduler.init_app(app)
-    scheduler.start()
+    
+    # Prometheus metrics; registered first so request timings cover every hook
+    from app.metrics import init_metrics
+    init_metrics(app)
+    
+    # On-demand sampling profiler; wraps the WSGI app to cover whole requests
+    from app.profiling.triggers import init_profiling
+    init_profiling(app)
+    
+    # Migrations are only needed by the `flask db` commands, and Flask-Migrate
+    # pulls in Alembic, so it is only loaded when running under the CLI
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
     
     # Configure login manager
     login_manager.login_view = 'auth.login'
@@ -64,6 +83,14 @@ def create_app(config_name='default'):
     }
     Talisman(app, content_security_policy=csp, force_https=False)  # Set to True in production
     
+    # Fingerprinted static assets, compressed responses and fragment caching
+    from app.assets import init_assets
+    from app.compression import init_compression
+    from app.fragments import init_fragment_cache
+    init_assets(app)
+    init_compression(app)
+    init_fragment_cache(app)
+    
     # Enable CORS for API routes only
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     
@@ -76,6 +103,8 @@ def create_app(config_name='default'):
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
+    # API calls authenticate with bearer tokens, never cookies, so CSRF does not apply
+    csrf.exempt(api_bp)
     app.register_blueprint(database_bp, url_prefix='/database')
     app.register_blueprint(backup_bp, url_prefix='/backup')
     app.register_blueprint(project_bp, url_prefix='/project')
@@ -84,12 +113,25 @@ def create_app(config_name='default'):
     from app.errors import register_error_handlers
     register_error_handlers(app)
     
+    # The current time, for the footer of base.html
+    @app.context_processor
+    def inject_now():
+        from datetime import datetime
+        return {'now': datetime.utcnow()}
+    
     # Register CLI commands
     from app.cli import register_cli_commands
     register_cli_commands(app)
     
-    # Create all database tables if they don't exist
-    with app.app_context():
-        db.create_all()
+    # Create missing tables and start the scheduler on the first request,
+    # so CLI commands skip both
+    from app.lifecycle import init_lifecycle
+    init_lifecycle(app)
+    
+    # Per-request SQL tracing and N+1 detection (development and testing);
+    # registered after the lifecycle hooks so that creating the schema on the
+    # first request is not counted against the route's query budget
+    from app.tracing.sql import init_sql_tracing
+    init_sql_tracing(app)
     
     return app 
\ No newline at end of file
@@ -2,13 +2,20 @@
 NEXDB - API routes
 """
 
-from flask import Blueprint, jsonify, request, current_app, url_for
+from flask import Blueprint, jsonify, request, current_app, url_for, Response, stream_with_context
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
 from app import db, limiter
-from app.models import User, Project, DatabaseServer, Database, DatabaseUser, Backup, BackupSchedule
+from app.models import (User, Project, DatabaseServer, Database, DatabaseUser, Backup, BackupSchedule,
+                        FirewallRule)
 from app.api.utils import admin_required, validate_input, handle_database_connection
-from app.backup.utils import create_backup, upload_to_s3
+from app.cache import cache_stats
+from app.tracing.sql import declare_query_budget
+from app.project.utils import (can_access_project, can_edit_project, can_delete_project,
+                               can_manage_servers)
+from sqlalchemy.orm import joinedload, selectinload
+import itertools
 import json
+import os
 from datetime import datetime, timedelta
 
 # Create Blueprint
@@ -52,41 +59,38 @@ def get_token():
 def get_projects():
     """Get all projects for the current user."""
     user_id = get_jwt_identity()
-    user = User.query.get_or_404(user_id)
-    
-    # Get user's projects (either created by or member of)
-    created_projects = Project.query.filter_by(created_by=user.id).all()
-    member_projects = user.member_projects
-    
-    # Combine and deduplicate projects
-    all_projects = set(created_projects) | set(member_projects)
     
+    # Get user's projects (either created by or member of) with access levels
     projects = []
-    for project in all_projects:
+    for project, access_level in Project.for_user(user_id):
         projects.append({
             'id': project.id,
             'name': project.name,
             'description': project.description,
             'created_at': project.created_at.isoformat(),
-            'access_level': project.get_member_access_level(user.id) or 'owner' 
-                           if project.created_by == user.id else 'read'
+            'access_level': access_level
         })
     
     return jsonify(projects=projects)
 
 
 @api_bp.route('/projects/<int:project_id>', methods=['GET'])
+@declare_query_budget(4)
 @jwt_required()
 def get_project(project_id):
     """Get a specific project."""
     user_id = get_jwt_identity()
-    project = Project.query.get_or_404(project_id)
+    project = Project.query.options(
+        selectinload(Project.database_servers)
+    ).filter_by(id=project_id).first_or_404()
     
     # Check if user has access to this project
-    user = User.query.get_or_404(user_id)
-    if project.created_by != user.id and user not in project.members:
+    if not can_access_project(project, user_id):
         return jsonify(error="Access denied"), 403
     
+    # Load members and their access levels in one query
+    members = project.get_members_with_access_levels()
+    
     # Get project details
     project_data = {
         'id': project.id,
@@ -109,12 +113,12 @@ def get_project(project_id):
         })
     
     # Get member details
-    for member in project.members:
+    for member, access_level in members:
         project_data['members'].append({
             'id': member.id,
             'username': member.username,
             'email': member.email,
-            'access_level': project.get_member_access_level(member.id)
+            'access_level': access_level
         })
     
     return jsonify(project=project_data)
@@ -158,8 +162,7 @@ def update_project(project_id):
     project = Project.query.get_or_404(project_id)
     
     # Check if user has permission to edit
-    if project.created_by != user_id and \
-       project.get_member_access_level(user_id) not in ['admin', 'write']:
+    if not can_edit_project(project, user_id):
         return jsonify(error="Permission denied"), 403
     
     # Update project details
@@ -182,8 +185,7 @@ def delete_project(project_id):
     project = Project.query.get_or_404(project_id)
     
     # Check if user has permission to delete (only creator or admin)
-    if project.created_by != user_id and \
-       project.get_member_access_level(user_id) != 'admin':
+    if not can_delete_project(project, user_id):
         return jsonify(error="Permission denied"), 403
     
     db.session.delete(project)
@@ -201,8 +203,7 @@ def create_server(project_id):
     project = Project.query.get_or_404(project_id)
     
     # Check if user has permission to add server
-    if project.created_by != user_id and \
-       project.get_member_access_level(user_id) not in ['admin', 'write']:
+    if not can_manage_servers(project, user_id):
         return jsonify(error="Permission denied"), 403
     
     # Validate input
@@ -250,11 +251,14 @@ def create_server(project_id):
 def get_server(server_id):
     """Get database server details."""
     user_id = get_jwt_identity()
-    server = DatabaseServer.query.get_or_404(server_id)
+    server = DatabaseServer.query.options(
+        joinedload(DatabaseServer.project),
+        selectinload(DatabaseServer.databases)
+    ).filter_by(id=server_id).first_or_404()
     project = server.project
     
     # Check if user has access to the server's project
-    if project.created_by != user_id and user_id not in [m.id for m in project.members]:
+    if not can_access_project(project, user_id):
         return jsonify(error="Access denied"), 403
     
     # Get server details
@@ -281,10 +285,355 @@ def get_server(server_id):
     return jsonify(server=server_data)
 
 
+@api_bp.route('/servers/<int:server_id>/import', methods=['POST'])
+@jwt_required()
+def import_table_data(server_id):
+    """Stream an uploaded CSV file (optionally gzip-compressed) into a table."""
+    from app.database.utils import import_csv, guess_compression
+    user_id = get_jwt_identity()
+    server = DatabaseServer.query.get_or_404(server_id)
+    project = server.project
+
+    # Check if user has permission to write to the server
+    if not can_manage_servers(project, user_id):
+        return jsonify(error="Permission denied"), 403
+
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify(error="file is required"), 400
+
+    database_name = request.form.get('database')
+    table = request.form.get('table')
+    if not database_name or not table:
+        return jsonify(error="database and table are required"), 400
+
+    try:
+        batch_size = int(request.form.get('batch_size', current_app.config['IMPORT_BATCH_SIZE']))
+    except ValueError:
+        return jsonify(error="batch_size must be a number"), 400
+    if batch_size < 1:
+        return jsonify(error="batch_size must be positive"), 400
+
+    columns = request.form.get('columns')
+    header = request.form.get('header', 'true').lower() not in ('0', 'false', 'no')
+    compression = request.form.get('compression') or guess_compression(upload.filename)
+
+    def log_progress(rows, bytes_read):
+        current_app.logger.info(
+            f"Import into {database_name}.{table} on server {server.id}: "
+            f"{rows} rows committed, {bytes_read} bytes read"
+        )
+
+    result = import_csv(
+        server,
+        database_name,
+        table,
+        upload.stream,
+        columns=columns.split(',') if columns else None,
+        header=header,
+        compression=compression,
+        batch_size=batch_size,
+        progress=log_progress
+    )
+
+    if not result['success']:
+        return jsonify(error=result['message'], rows=result.get('rows', 0)), 400
+
+    return jsonify(
+        message="Import completed successfully",
+        rows=result['rows'],
+        batches=result['batches'],
+        bytes_read=result['bytes_read']
+    )
+
+
+@api_bp.route('/servers/<int:server_id>/export', methods=['POST'])
+@jwt_required()
+def export_table_data(server_id):
+    """Stream a table or query result as CSV/NDJSON to the client or to S3."""
+    from app.database.utils import iter_export, EXPORT_FORMATS
+    from app.backup.utils import upload_stream_to_s3
+    user_id = get_jwt_identity()
+    server = DatabaseServer.query.get_or_404(server_id)
+    project = server.project
+    
+    data = request.json or {}
+    database_name = data.get('database')
+    table = data.get('table')
+    query = data.get('query')
+    fmt = data.get('format', 'csv')
+    compression = data.get('compression')
+    destination = data.get('destination', 'client')
+    
+    # Table exports need read access, ad-hoc queries need write access
+    if not can_access_project(project, user_id) or \
+       (query and not can_manage_servers(project, user_id)):
+        return jsonify(error="Permission denied"), 403
+    
+    if not database_name or not (table or query):
+        return jsonify(error="database and either table or query are required"), 400
+    if fmt not in EXPORT_FORMATS:
+        return jsonify(error=f"format must be one of: {', '.join(EXPORT_FORMATS)}"), 400
+    if compression not in (None, 'gzip'):
+        return jsonify(error="compression must be 'gzip' or omitted"), 400
+    if destination not in ('client', 's3'):
+        return jsonify(error="destination must be 'client' or 's3'"), 400
+    
+    try:
+        chunks = iter_export(server, database_name, table=table, query=query, fmt=fmt,
+                             compression=compression)
+        # Pull the first chunk eagerly so connection and query errors are reported
+        # with a proper status code rather than in the middle of the stream
+        first_chunk = next(chunks, b'')
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        return jsonify(error=f"Export failed: {str(e)}"), 400
+    
+    stream = itertools.chain([first_chunk], chunks)
+    name = table or 'query'
+    extension = fmt + ('.gz' if compression else '')
+    filename = f"{database_name}_{name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    
+    if destination == 's3':
+        s3_key = f"exports/project_{project.id}/server_{server.id}/{filename}"
+        result = upload_stream_to_s3(stream, s3_key)
+        if not result['success']:
+            return jsonify(error=result['message']), 502
+        return jsonify(
+            message="Export uploaded successfully",
+            s3_path=result['s3_path'],
+            size_bytes=result['size_bytes']
+        )
+    
+    mimetype = 'application/gzip' if compression else EXPORT_FORMATS[fmt]
+    return Response(
+        stream_with_context(stream),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@api_bp.route('/servers/<int:server_id>/provision', methods=['POST'])
+@jwt_required()
+def provision_server(server_id):
+    """Create databases, users and grants on a server in one batch."""
+    from app.database.provisioning import provision
+    user_id = get_jwt_identity()
+    server = DatabaseServer.query.get_or_404(server_id)
+    project = server.project
+    
+    # Check if user has permission to manage the server
+    if project is None or not can_manage_servers(project, user_id):
+        return jsonify(error="Permission denied"), 403
+    
+    data = request.json or {}
+    batch = {}
+    for key in ('databases', 'users', 'grants'):
+        batch[key] = data.get(key) or []
+        if not isinstance(batch[key], list):
+            return jsonify(error=f"{key} must be a list"), 400
+        if key != 'databases' and not all(isinstance(item, dict) for item in batch[key]):
+            return jsonify(error=f"{key} must be a list of objects"), 400
+    if not any(batch.values()):
+        return jsonify(error="Nothing to provision"), 400
+    
+    result = provision(server, **batch)
+    if result['message'] and not result['results']:
+        return jsonify(error=result['message']), 400
+    
+    return jsonify(
+        success=result['success'],
+        message=result['message'],
+        results=result['results'],
+        counts=result['counts'],
+        round_trips=result['round_trips']
+    )
+
+
+@api_bp.route('/servers/<int:server_id>/inventory', methods=['POST'])
+@jwt_required()
+def sync_server_inventory(server_id):
+    """Discover a server's databases, users and grants and update the metadata."""
+    from app.database.inventory import sync_server
+    user_id = get_jwt_identity()
+    server = DatabaseServer.query.get_or_404(server_id)
+    project = server.project
+    
+    # Check if user has permission to manage the server
+    if project is None or not can_manage_servers(project, user_id):
+        return jsonify(error="Permission denied"), 403
+    
+    result = sync_server(server_id)
+    if not result['success']:
+        return jsonify(error=result['message']), 502
+    
+    return jsonify(result)
+
+
+@api_bp.route('/servers/<int:server_id>/firewall-rules', methods=['GET'])
+@jwt_required()
+def get_firewall_rules(server_id):
+    """List the addresses allowed to reach a server."""
+    user_id = get_jwt_identity()
+    server = DatabaseServer.query.get_or_404(server_id)
+    
+    # Check if user has access to the server's project
+    if server.project is None or not can_access_project(server.project, user_id):
+        return jsonify(error="Access denied"), 403
+    
+    rules = FirewallRule.query.options(joinedload(FirewallRule.database)).\
+        filter_by(server_id=server.id).order_by(FirewallRule.source).all()
+    return jsonify(rules=[{
+        'id': rule.id,
+        'source': rule.source,
+        'database': rule.database.name if rule.database else None,
+        'description': rule.description or '',
+        'created_at': rule.created_at.isoformat() if rule.created_at else None
+    } for rule in rules])
+
+
+@api_bp.route('/servers/<int:server_id>/firewall-rules', methods=['PUT'])
+@jwt_required()
+@admin_required
+def replace_firewall_rules(server_id):
+    """Replace the addresses allowed to reach a server and sync the firewall.
+    
+    Admins only: the rules open ports in the UFW of the panel's own host.
+    """
+    from app.firewall.sync import replace_server_rules, last_sync_result
+    user_id = get_jwt_identity()
+    server = DatabaseServer.query.get_or_404(server_id)
+    
+    rules = (request.json or {}).get('rules')
+    if not isinstance(rules, list) or not all(isinstance(rule, dict) for rule in rules):
+        return jsonify(error="rules must be a list of objects"), 400
+    
+    try:
+        added, removed = replace_server_rules(server, rules, created_by=user_id)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(error=str(e)), 400
+    db.session.commit()
+    
+    return jsonify(
+        message="Firewall rules updated",
+        added=added,
+        removed=removed,
+        firewall=last_sync_result()
+    )
+
+
+# Administration endpoints
+@api_bp.route('/admin/cache-stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_cache_stats():
+    """Get size and hit/miss counters for the in-process caches of this worker."""
+    return jsonify(caches=cache_stats())
+
+
+@api_bp.route('/admin/inventory-sync', methods=['POST'])
+@jwt_required()
+@admin_required
+def sync_fleet_inventory():
+    """Sync the inventory of every database server concurrently."""
+    from app.database.inventory import sync_fleet
+    results = sync_fleet(current_app._get_current_object())
+    return jsonify(
+        servers=len(results),
+        failed=sum(1 for result in results if not result['success']),
+        results=results
+    )
+
+
+@api_bp.route('/admin/firewall-sync', methods=['POST'])
+@jwt_required()
+@admin_required
+def sync_firewall_rules():
+    """Reconcile UFW with the stored firewall rules; `dry_run` only plans."""
+    from app.firewall.sync import sync_firewall
+    data = request.get_json(silent=True) or {}
+    result = sync_firewall(dry_run=bool(data.get('dry_run')))
+    return jsonify(result), 200 if result['success'] else 502
+
+
+@api_bp.route('/admin/profiles/token', methods=['POST'])
+@jwt_required()
+@admin_required
+def create_profile_token():
+    """Issue a token that profiles the requests sending it in X-NexDB-Profile."""
+    from app.profiling.triggers import issue_profile_token, PROFILE_HEADER
+    if not current_app.config.get('PROFILING_ENABLED', True):
+        return jsonify(error="Profiling is disabled"), 404
+    return jsonify(
+        token=issue_profile_token(current_app, get_jwt_identity()),
+        header=PROFILE_HEADER,
+        expires_in=current_app.config.get('PROFILE_TOKEN_MAX_AGE', 3600)
+    )
+
+
+@api_bp.route('/admin/profiles/jobs', methods=['GET', 'POST'])
+@jwt_required()
+@admin_required
+def profile_jobs():
+    """List the armed jobs, or arm a scheduled job so its next run is profiled."""
+    from app.profiling.triggers import arm_job, armed_jobs
+    if not current_app.config.get('PROFILING_ENABLED', True):
+        return jsonify(error="Profiling is disabled"), 404
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            arm_job(current_app, data.get('job_id'))
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+    return jsonify(armed=armed_jobs(current_app))
+
+
+@api_bp.route('/admin/profiles', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_profiles():
+    """List the stored profiles, newest first."""
+    from app.profiling.store import list_profiles
+    return jsonify(profiles=list_profiles(current_app))
+
+
+@api_bp.route('/admin/profiles/<profile_id>', methods=['GET', 'DELETE'])
+@jwt_required()
+@admin_required
+def get_profile(profile_id):
+    """Get the metadata and busiest functions of a profile, or delete it."""
+    from app.profiling.store import load_profile, delete_profile
+    if request.method == 'DELETE':
+        if not delete_profile(current_app, profile_id):
+            return jsonify(error="Profile not found"), 404
+        return jsonify(message="Profile deleted")
+    profile = load_profile(current_app, profile_id)
+    if profile is None:
+        return jsonify(error="Profile not found"), 404
+    profile['downloads'] = {
+        fmt: url_for('api.download_profile', profile_id=profile_id, fmt=fmt)
+        for fmt in ('svg', 'collapsed')
+    }
+    return jsonify(profile)
+
+
+@api_bp.route('/admin/profiles/<profile_id>.<fmt>', methods=['GET'])
+@jwt_required()
+@admin_required
+def download_profile(profile_id, fmt):
+    """Download a profile's flamegraph (svg) or collapsed stacks (collapsed)."""
+    from flask import send_file
+    from app.profiling.store import profile_path, PROFILE_FORMATS
+    path = profile_path(current_app, profile_id, fmt) if fmt in PROFILE_FORMATS else None
+    if path is None or not os.path.exists(path):
+        return jsonify(error="Profile not found"), 404
+    return send_file(path, mimetype=PROFILE_FORMATS[fmt], as_attachment=True,
+                     download_name=f"profile-{profile_id}.{fmt}")
+
+
 # Additional endpoints would be added for:
-# - Database management
-# - Database user management
 # - Backup operations
 # - Backup scheduling
-# - UFW configuration
 # Etc. 
\ No newline at end of file
@@ -5,21 +5,19 @@ NEXDB - API utilities
 from functools import wraps
 from flask import jsonify, request, g
 from flask_jwt_extended import get_jwt_identity
-import pymysql
-import psycopg2
 import re
 import json
 import logging
 from app.models import User, Project
+from app.auth.identity import get_user_snapshot
 
 def admin_required(fn):
     """Decorator for API routes that require admin privileges."""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_user_snapshot(get_jwt_identity())
         
-        if not user or not user.has_role('admin'):
+        if not user or not user.active or 'admin' not in user.roles:
             return jsonify(error="Admin privileges required"), 403
         
         return fn(*args, **kwargs)
@@ -72,8 +70,64 @@ def sanitize_sql_identifier(identifier):
     return identifier
 
 
+def get_server_connector(app=None):
+    """Return the connector configured by SERVER_CONNECTOR, or None for the real drivers."""
+    from flask import current_app
+    from werkzeug.utils import import_string
+    app = app or current_app._get_current_object()
+    setting = app.config.get('SERVER_CONNECTOR')
+    if setting is None:
+        return None
+    connector = app.extensions.get('nexdb_server_connector')
+    if connector is None:
+        if isinstance(setting, str):
+            setting = import_string(setting)
+        connector = setting(app.config) if isinstance(setting, type) else setting
+        app.extensions['nexdb_server_connector'] = connector
+    return connector
+
+
+def connect_to_server(server, database=None, **options):
+    """Open a driver connection to a database server using its stored credentials."""
+    connector = get_server_connector()
+    if connector is not None:
+        return connector.connect(server, database, **options)
+    
+    import pymysql
+    import psycopg2
+    password = server.password
+
+    if server.server_type == 'mysql':
+        if database:
+            options['database'] = database
+        return pymysql.connect(
+            host=server.host,
+            port=server.port,
+            user=server.username,
+            password=password,
+            **options
+        )
+
+    elif server.server_type == 'postgresql':
+        if database:
+            options['dbname'] = database
+        return psycopg2.connect(
+            host=server.host,
+            port=server.port,
+            user=server.username,
+            password=password,
+            **options
+        )
+
+    raise ValueError(f"Unsupported database type: {server.server_type}")
+
+
 def handle_database_connection(server):
     """Test connection to a database server."""
+    # Database drivers are imported on first use to keep startup light
+    import pymysql
+    import psycopg2
+    
     try:
         if server.server_type == 'mysql':
             conn = pymysql.connect(
@@ -107,8 +161,20 @@ def handle_database_connection(server):
         return {'success': False, 'message': 'Failed to connect to database server'}
 
 
-def execute_query(server, query, params=None):
-    """Execute a query on a database server."""
+def execute_query(server, query, params=None, result_format='rows'):
+    """Execute a query on a database server.
+    
+    With result_format='arrow', SELECT results are returned as a pyarrow Table
+    under 'table' instead of a list of row dictionaries under 'result'.
+    """
+    import pymysql
+    import psycopg2
+    
+    if result_format == 'arrow':
+        from app.database.columnar import columnar_available
+        if not columnar_available():
+            return {'success': False, 'message': 'The arrow result format requires pyarrow'}
+    
     try:
         if server.server_type == 'mysql':
             conn = pymysql.connect(
@@ -121,6 +187,14 @@ def execute_query(server, query, params=None):
             cursor.execute(query, params or ())
             
             if query.strip().upper().startswith(('SELECT', 'SHOW')):
+                if result_format == 'arrow':
+                    from app.database.columnar import rows_to_table, cursor_fields
+                    table = rows_to_table(cursor.fetchall(), cursor.description, server.server_type,
+                                          cursor_fields(cursor))
+                    cursor.close()
+                    conn.close()
+                    return {'success': True, 'table': table}
+                
                 columns = [col[0] for col in cursor.description]
                 result = [dict(zip(columns, row)) for row in cursor.fetchall()]
                 cursor.close()
@@ -144,6 +218,14 @@ def execute_query(server, query, params=None):
             cursor.execute(query, params or ())
             
             if query.strip().upper().startswith(('SELECT', 'SHOW')):
+                if result_format == 'arrow':
+                    from app.database.columnar import rows_to_table, cursor_fields
+                    table = rows_to_table(cursor.fetchall(), cursor.description, server.server_type,
+                                          cursor_fields(cursor))
+                    cursor.close()
+                    conn.close()
+                    return {'success': True, 'table': table}
+                
                 columns = [col.name for col in cursor.description]
                 result = [dict(zip(columns, row)) for row in cursor.fetchall()]
                 cursor.close()
@@ -0,0 +1,59 @@
+"""
+NEXDB - Static asset fingerprinting
+
+Templates link static files through ``asset_url``, which appends a hash of
+the file's contents. Fingerprinted URLs change whenever the file does, so
+responses for them can be cached by browsers and proxies for a year.
+"""
+
+import hashlib
+import os
+import threading
+from flask import current_app, request, url_for
+
+# filename -> (mtime_ns, digest)
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def asset_digest(filename):
+    """Return a short content hash for a file in the static folder."""
+    path = os.path.join(current_app.static_folder, filename)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _digests.get(filename)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _digests_lock:
+        _digests[filename] = (mtime, digest)
+    return digest
+
+
+def asset_url(filename):
+    """Return the fingerprinted URL of a static file."""
+    try:
+        return url_for('static', filename=filename, v=asset_digest(filename))
+    except FileNotFoundError:
+        return url_for('static', filename=filename)
+
+
+def add_static_cache_headers(response):
+    """Mark fingerprinted static responses as immutable."""
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        if request.args.get('v'):
+            max_age = current_app.config.get('STATIC_MAX_AGE', 31536000)
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.cache_control.immutable = True
+        else:
+            # Unversioned URLs must be revalidated so edits show up
+            response.cache_control.no_cache = True
+    return response
+
+
+def init_assets(app):
+    """Register the asset_url template helper and static cache headers."""
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(add_static_cache_headers)
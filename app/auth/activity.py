@@ -0,0 +1,115 @@
+"""
+NEXDB - User activity tracking
+
+Last-seen timestamps are recorded in memory and written back periodically as
+a single UPDATE, so authenticated requests never write just for bookkeeping.
+Pending timestamps live in each worker process, so every worker runs its own
+flush thread rather than relying on the single scheduler process.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import case
+from app import db
+
+
+class ActivityTracker:
+    """Coalesce last-seen updates and flush them in batches."""
+    
+    def __init__(self, interval=60):
+        self.interval = interval
+        self._pending = {}
+        self._last_written = {}
+        self._lock = threading.Lock()
+    
+    def reset(self):
+        """Forget all state, e.g. in a worker forked from a preloaded master."""
+        self._pending = {}
+        self._last_written = {}
+        self._lock = threading.Lock()
+    
+    def touch(self, user_id, seen_at=None):
+        """Record that a user was seen; no database access."""
+        self._pending[user_id] = seen_at or datetime.utcnow()
+    
+    def _take_due(self):
+        """Remove and return pending entries whose user was not written this interval."""
+        now = time.monotonic()
+        due = {}
+        with self._lock:
+            for user_id in list(self._pending):
+                last_written = self._last_written.get(user_id)
+                if last_written is None or now - last_written >= self.interval:
+                    due[user_id] = self._pending.pop(user_id)
+                    self._last_written[user_id] = now
+            # Forget users that have been idle for a while
+            stale = [uid for uid, written in self._last_written.items()
+                     if now - written >= self.interval and uid not in self._pending]
+            for user_id in stale:
+                del self._last_written[user_id]
+        return due
+    
+    def flush(self, force=False):
+        """Write due last-seen timestamps in one UPDATE and return the row count."""
+        if force:
+            with self._lock:
+                due, self._pending = self._pending, {}
+        else:
+            due = self._take_due()
+        if not due:
+            return 0
+        
+        from app.models.user import User
+        users = User.__table__
+        try:
+            db.session.execute(
+                users.update().
+                where(users.c.id.in_(list(due))).
+                values(
+                    last_login_at=case(due, value=users.c.id),
+                    # Bookkeeping only: do not let the onupdate default bump updated_at
+                    updated_at=users.c.updated_at
+                )
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Last-seen flush error: {str(e)}")
+            # Keep the timestamps for the next attempt unless newer ones arrived
+            with self._lock:
+                for user_id, seen_at in due.items():
+                    self._pending.setdefault(user_id, seen_at)
+            return 0
+        return len(due)
+
+
+activity_tracker = ActivityTracker()
+
+
+def flush_activity(app, force=False):
+    """Flush pending last-seen timestamps inside an application context."""
+    with app.app_context():
+        return activity_tracker.flush(force=force)
+
+
+def _flush_loop(app, interval, stop):
+    while not stop.wait(interval):
+        try:
+            flush_activity(app)
+        except Exception as e:
+            logging.error(f"Last-seen flush error: {str(e)}")
+
+
+def init_activity_tracking(app):
+    """Start this process's periodic last-seen flushes and a final flush at exit."""
+    interval = app.config.get('LAST_SEEN_FLUSH_INTERVAL', 60)
+    activity_tracker.interval = interval
+    stop = threading.Event()
+    threading.Thread(target=_flush_loop, args=(app, interval, stop),
+                     name='nexdb-last-seen-flush', daemon=True).start()
+    atexit.register(flush_activity, app, True)
+    atexit.register(stop.set)
+    return stop
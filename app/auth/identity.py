@@ -0,0 +1,146 @@
+"""
+NEXDB - Identity cache
+
+Keeps a compact snapshot of each authenticated user (id, username, active
+flag and role names) so that loading the current user for a session or JWT
+request does not need a database round trip while the snapshot is fresh.
+"""
+
+import os
+from collections import namedtuple
+from flask import current_app, g, has_request_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.cache import get_cache, SharedGeneration
+
+UserSnapshot = namedtuple('UserSnapshot', ['id', 'username', 'active', 'roles'])
+
+# Session.info key collecting user ids whose identity changed in a transaction
+IDENTITY_CHANGES_KEY = 'identity_changes'
+
+# Marker stored in IDENTITY_CHANGES_KEY when every snapshot must be dropped
+ALL_USERS = '*'
+
+_generation = None
+
+
+def _cache():
+    return get_cache('identity', current_app.config.get('IDENTITY_CACHE_TTL', 30))
+
+
+def _shared_generation():
+    global _generation
+    if _generation is None:
+        _generation = SharedGeneration(os.path.join(
+            current_app.config.get('CACHE_GENERATION_DIR') or current_app.instance_path,
+            'identity.generation'
+        ))
+    return _generation
+
+
+def _sync_with_other_workers():
+    """Drop cached snapshots if another process changed users or roles."""
+    if has_request_context():
+        if g.get('_identity_synced'):
+            return
+        g._identity_synced = True
+    if _shared_generation().changed():
+        _cache().clear()
+
+
+def load_user_snapshot(user_id):
+    """Load a user snapshot with its role names in one query."""
+    from app.models.user import User, Role, user_roles
+    rows = db.session.execute(
+        db.select(User.id, User.username, User.active, Role.name).
+        outerjoin(user_roles, user_roles.c.user_id == User.id).
+        outerjoin(Role, Role.id == user_roles.c.role_id).
+        where(User.id == user_id)
+    ).all()
+    if not rows:
+        return None
+    user_id, username, active, _ = rows[0]
+    roles = frozenset(role_name for *_, role_name in rows if role_name is not None)
+    return UserSnapshot(user_id, username, bool(active), roles)
+
+
+def get_user_snapshot(user_id):
+    """Return the cached snapshot for a user id, or None if the user does not exist."""
+    _sync_with_other_workers()
+    return _cache().get_or_load(user_id, lambda: load_user_snapshot(user_id))
+
+
+def invalidate_identity(*user_ids):
+    """Forget cached snapshots, for the given users or for everyone."""
+    cache = _cache()
+    if user_ids and ALL_USERS not in user_ids:
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+    else:
+        cache.clear()
+    _shared_generation().bump()
+
+
+class CachedUser(UserMixin):
+    """Flask-Login user built from a cached snapshot.
+    
+    Identity checks (id, active flag, roles, username) are answered from the
+    snapshot; any other attribute loads the full User row on first access.
+    """
+    
+    def __init__(self, snapshot):
+        self.id = snapshot.id
+        self.username = snapshot.username
+        self.active = snapshot.active
+        self.role_names = snapshot.roles
+        self._user = None
+    
+    @property
+    def is_active(self):
+        return self.active
+    
+    def has_role(self, role_name):
+        """Check if user has a specific role."""
+        return role_name in self.role_names
+    
+    def get_user(self):
+        """Return the full User model instance."""
+        if self._user is None:
+            from app.models.user import User
+            self._user = db.session.get(User, self.id)
+        return self._user
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get_user(), name)
+    
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_identity_changes(session, flush_context, instances):
+    """Record users and roles that are about to change in this flush."""
+    from app.models.user import User, Role
+    changed = session.info.setdefault(IDENTITY_CHANGES_KEY, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+        elif isinstance(obj, Role):
+            changed.add(ALL_USERS)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    """Invalidate cached snapshots once user or role changes are committed."""
+    changed = session.info.pop(IDENTITY_CHANGES_KEY, None)
+    if changed:
+        invalidate_identity(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(IDENTITY_CHANGES_KEY, None)
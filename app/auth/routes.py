@@ -5,11 +5,12 @@ NEXDB - Authentication routes
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.urls import url_parse
+from sqlalchemy.orm import selectinload
 from app import db, limiter
 from app.models import User
 from app.auth.forms import LoginForm, RegistrationForm, PasswordResetRequestForm, PasswordResetForm
 from app.auth.utils import send_password_reset_email, generate_reset_token, verify_reset_token
-from datetime import datetime
+from app.auth.activity import activity_tracker
 
 # Create Blueprint
 auth_bp = Blueprint('auth', __name__)
@@ -18,8 +19,8 @@ auth_bp = Blueprint('auth', __name__)
 @auth_bp.before_request
 def update_last_seen():
     if current_user.is_authenticated:
-        current_user.last_login_at = datetime.utcnow()
-        db.session.commit()
+        # Recorded in memory and written back in batches by the activity tracker
+        activity_tracker.touch(current_user.id)
 
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
@@ -129,4 +130,17 @@ def reset_password(token):
 @login_required
 def profile():
     """User profile route."""
-    return render_template('auth/profile.html', title='Profile', user=current_user) 
\ No newline at end of file
+    return render_template('auth/profile.html', title='Profile', user=current_user)
+
+
+@auth_bp.route('/admin')
+@login_required
+def admin():
+    """List user accounts and their roles (admins only)."""
+    if not current_user.has_role('admin'):
+        flash('You do not have permission to view this page.', 'danger')
+        return redirect(url_for('project.dashboard'))
+    
+    users = User.query.options(selectinload(User.roles)).order_by(User.username).all()
+    return render_template('auth/admin.html', title='Admin', users=users)
+
@@ -0,0 +1,32 @@
+"""
+NEXDB - Backup routes
+"""
+
+from flask import Blueprint, render_template
+from flask_login import login_required, current_user
+from app import db
+from app.models import DatabaseServer, Database, Backup
+from app.project.permissions import get_access_map
+
+# Create Blueprint
+backup_bp = Blueprint('backup', __name__)
+
+# Backups listed on the index page, newest first
+RECENT_BACKUPS = 100
+
+
+@backup_bp.route('/')
+@login_required
+def index():
+    """List the latest backups of every project the user can access."""
+    project_ids = list(get_access_map(current_user))
+    rows = db.session.execute(
+        db.select(Backup, Database.name, DatabaseServer.id, DatabaseServer.name).
+        join(Database, Database.id == Backup.database_id).
+        join(DatabaseServer, DatabaseServer.id == Database.server_id).
+        where(DatabaseServer.project_id.in_(project_ids)).
+        order_by(Backup.created_at.desc()).
+        limit(RECENT_BACKUPS)
+    ).all()
+    
+    return render_template('backup/index.html', title='Backups', backups=rows)
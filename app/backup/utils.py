@@ -8,10 +8,13 @@ import tempfile
 import boto3
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from flask import current_app
 from app import db, scheduler
 from app.models import Database, Backup, DatabaseServer
+from app.metrics import observe_backup_stage, count_backup, observe_s3_transfer
 
 def create_backup(database_id):
     """Create a backup of a database."""
@@ -39,6 +42,7 @@ def create_backup(database_id):
         db.session.commit()
         
         # Perform backup based on database type
+        started = time.perf_counter()
         if server.server_type == 'mysql':
             result = backup_mysql(server, database.name, backup_path)
         elif server.server_type == 'postgresql':
@@ -54,10 +58,13 @@ def create_backup(database_id):
             backup.status = 'failed'
             backup.metadata_dict = {'error': result['message']}
             db.session.commit()
+            count_backup('failed', server.server_type)
             return result
         
         # Update backup record with file size
         backup.size_bytes = os.path.getsize(backup_path)
+        observe_backup_stage('dump', time.perf_counter() - started, backup.size_bytes, server.server_type)
+        count_backup('completed', server.server_type)
         backup.status = 'completed'
         backup.metadata_dict = {
             'backup_time': datetime.utcnow().isoformat(),
@@ -141,6 +148,110 @@ def backup_postgresql(server, database_name, backup_path):
         return {'success': False, 'message': str(e)}
 
 
+def get_s3_client():
+    """Create an S3 client from the application configuration."""
+    return boto3.client(
+        's3',
+        aws_access_key_id=current_app.config.get('S3_ACCESS_KEY'),
+        aws_secret_access_key=current_app.config.get('S3_SECRET_KEY'),
+        region_name=current_app.config.get('S3_REGION'),
+        endpoint_url=current_app.config.get('S3_ENDPOINT_URL') or None
+    )
+
+
+def upload_stream_to_s3(chunks, s3_key, part_size=None, concurrency=None):
+    """Upload an iterable of byte chunks to S3 through a multipart upload.
+    
+    Up to `concurrency` parts (S3_UPLOAD_CONCURRENCY) are uploaded at once
+    while the next one is filled, so at most concurrency + 1 parts are held
+    in memory and arbitrarily large streams are uploaded with constant memory.
+    """
+    bucket_name = current_app.config.get('S3_BUCKET')
+    if not bucket_name:
+        return {'success': False, 'message': 'S3 bucket not configured'}
+    
+    part_size = part_size or current_app.config.get('S3_MULTIPART_PART_SIZE', 8 * 1024 * 1024)
+    concurrency = max(1, concurrency or current_app.config.get('S3_UPLOAD_CONCURRENCY', 1))
+    s3_client = get_s3_client()
+    upload_id = None
+    executor = None
+    pending = []
+    
+    try:
+        upload = s3_client.create_multipart_upload(Bucket=bucket_name, Key=s3_key)
+        upload_id = upload['UploadId']
+        
+        parts = []
+        buffer = bytearray()
+        total_bytes = 0
+        part_count = 0
+        
+        def upload_part(part_number, body):
+            # Only time the transfer, not the production of the stream
+            started = time.perf_counter()
+            response = s3_client.upload_part(
+                Bucket=bucket_name,
+                Key=s3_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            observe_s3_transfer('upload_part', len(body), time.perf_counter() - started)
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+        
+        def flush_part():
+            nonlocal part_count, executor
+            part_count += 1
+            body = bytes(buffer)
+            buffer.clear()
+            if concurrency == 1:
+                parts.append(upload_part(part_count, body))
+                return
+            if executor is None:
+                executor = ThreadPoolExecutor(concurrency, thread_name_prefix='nexdb-s3-upload')
+            while len(pending) >= concurrency:
+                parts.append(pending.pop(0).result())
+            pending.append(executor.submit(upload_part, part_count, body))
+        
+        for chunk in chunks:
+            buffer.extend(chunk)
+            total_bytes += len(chunk)
+            if len(buffer) >= part_size:
+                flush_part()
+        
+        # S3 requires at least one part, even for an empty stream
+        if buffer or not part_count:
+            flush_part()
+        while pending:
+            parts.append(pending.pop(0).result())
+        
+        s3_client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+        
+        return {'success': True, 's3_path': s3_key, 'size_bytes': total_bytes, 'parts': len(parts)}
+    
+    except Exception as e:
+        logging.error(f"S3 multipart upload error: {str(e)}")
+        # Parts still uploading would be stored after the abort, and kept
+        # (and billed) as parts of an upload that no longer exists
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if upload_id:
+            try:
+                s3_client.abort_multipart_upload(Bucket=bucket_name, Key=s3_key, UploadId=upload_id)
+            except Exception as abort_error:
+                logging.error(f"S3 multipart abort error: {str(abort_error)}")
+        return {'success': False, 'message': f"S3 upload failed: {str(e)}"}
+    
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
 def upload_to_s3(backup_id):
     """Upload a backup to S3."""
     try:
@@ -167,12 +278,7 @@ def upload_to_s3(backup_id):
             return {'success': False, 'message': 'S3 bucket not configured'}
         
         # Upload to S3
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=current_app.config.get('S3_ACCESS_KEY'),
-            aws_secret_access_key=current_app.config.get('S3_SECRET_KEY'),
-            region_name=current_app.config.get('S3_REGION')
-        )
+        s3_client = get_s3_client()
         
         # Create S3 object key
         database = Database.query.get(backup.database_id)
@@ -181,7 +287,13 @@ def upload_to_s3(backup_id):
         s3_key = f"backups/project_{project_id}/database_{backup.database_id}/{backup.filename}"
         
         # Upload file
+        started = time.perf_counter()
         s3_client.upload_file(backup_path, bucket_name, s3_key)
+        seconds = time.perf_counter() - started
+        size_bytes = os.path.getsize(backup_path)
+        observe_s3_transfer('upload_file', size_bytes, seconds)
+        observe_backup_stage('upload', seconds, size_bytes,
+                             server.server_type if server else 'unknown')
         
         # Update backup record
         backup.location = 's3'
@@ -230,12 +342,7 @@ def backup_all_databases():
 def test_s3_connection():
     """Test S3 connection."""
     try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=current_app.config.get('S3_ACCESS_KEY'),
-            aws_secret_access_key=current_app.config.get('S3_SECRET_KEY'),
-            region_name=current_app.config.get('S3_REGION')
-        )
+        s3_client = get_s3_client()
         
         # List buckets to test connection
         s3_client.list_buckets()
@@ -249,6 +356,8 @@ def setup_backup_scheduler(app):
     """Set up backup scheduler jobs."""
     with app.app_context():
         from app.models import BackupSchedule
+        from app.profiling.triggers import profiled_job
+        from app.tracing.sql import traced_job
         
         # Remove all existing jobs
         scheduler.remove_all_jobs()
@@ -257,10 +366,12 @@ def setup_backup_scheduler(app):
         schedules = BackupSchedule.query.filter_by(enabled=True).all()
         
         for schedule in schedules:
+            job_id = f"backup_{schedule.id}"
+            func = traced_job(app, job_id, profiled_job(app, job_id, create_backup))
             if schedule.frequency == 'daily':
                 scheduler.add_job(
-                    id=f"backup_{schedule.id}",
-                    func=create_backup,
+                    id=job_id,
+                    func=func,
                     args=[schedule.database_id],
                     trigger='cron',
                     hour=schedule.time.hour,
@@ -268,8 +379,8 @@ def setup_backup_scheduler(app):
                 )
             elif schedule.frequency == 'weekly':
                 scheduler.add_job(
-                    id=f"backup_{schedule.id}",
-                    func=create_backup,
+                    id=job_id,
+                    func=func,
                     args=[schedule.database_id],
                     trigger='cron',
                     day_of_week=schedule.day_of_week,
@@ -278,8 +389,8 @@ def setup_backup_scheduler(app):
                 )
             elif schedule.frequency == 'monthly':
                 scheduler.add_job(
-                    id=f"backup_{schedule.id}",
-                    func=create_backup,
+                    id=job_id,
+                    func=func,
                     args=[schedule.database_id],
                     trigger='cron',
                     day=schedule.day_of_month,
@@ -0,0 +1,6 @@
+"""
+NEXDB - Performance benchmarks
+
+Benchmarks are run with ``flask bench <name>`` and return plain dicts so their
+results can be printed, stored or compared between runs.
+"""
@@ -0,0 +1,265 @@
+"""
+NEXDB - Backup pipeline benchmark
+
+Measures the path of a backup from the dump tool to S3 without a database
+server or S3: app/bench/dumpgen.py stands in for mysqldump and pg_dump, and
+the local stand-in of app.bench.s3server receives the upload. Each
+configuration is a combination of:
+
+- mode: `tempfile` dumps to a temporary file and uploads it with
+  upload_file, as create_backup and upload_to_s3 do; `streaming` pipes the
+  dump straight into upload_stream_to_s3;
+- codec: none, gzip-<level>, and brotli-<quality>, zstd-<level> or
+  lzma-<preset> when their packages are available;
+- part size and the number of parts uploaded at once.
+
+Every configuration runs in a fresh interpreter so that its peak memory is
+its own. Throughput is the size of the uncompressed dump over the time
+from starting the dump to completing the upload. CPU time is that of the
+pipeline process; the generator's CPU is reported separately since a real
+dump tool's cost is different.
+"""
+
+import itertools
+import json
+import lzma
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from app.bench.loadtest import _free_port, _wait_for_port
+
+MODES = ('tempfile', 'streaming')
+READ_SIZE = 256 * 1024
+MIB = 1024 * 1024
+
+_CHILD = """
+import json, sys
+from app import create_app
+app = create_app(sys.argv[1])
+from app.bench.backup import run_pipeline
+with app.app_context():
+    print(json.dumps(run_pipeline(**json.loads(sys.argv[2]))))
+"""
+
+
+class _Brotli:
+    """brotli.Compressor with the compress/flush interface of zlib."""
+    
+    def __init__(self, quality):
+        import brotli
+        self.compressor = brotli.Compressor(quality=quality)
+    
+    def compress(self, data):
+        return self.compressor.process(data)
+    
+    def flush(self):
+        return self.compressor.finish()
+
+
+def make_compressor(codec):
+    """Return a compressor for a codec name such as 'gzip-6', or None for 'none'."""
+    name, _, level = codec.partition('-')
+    if name == 'none':
+        return None
+    if name == 'gzip':
+        return zlib.compressobj(int(level or 6), zlib.DEFLATED, 31)
+    if name == 'lzma':
+        return lzma.LZMACompressor(preset=int(level or 0))
+    if name == 'brotli':
+        return _Brotli(int(level or 5))
+    if name == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=int(level or 3)).compressobj()
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def codec_available(codec):
+    try:
+        make_compressor(codec)
+        return True
+    except ImportError:
+        return False
+
+
+class _CountingReader:
+    """Iterate over a pipe in READ_SIZE chunks, counting the bytes read."""
+    
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.bytes = 0
+    
+    def __iter__(self):
+        while True:
+            chunk = self.pipe.read(READ_SIZE)
+            if not chunk:
+                return
+            self.bytes += len(chunk)
+            yield chunk
+
+
+def _compress(chunks, compressor):
+    if compressor is None:
+        yield from chunks
+        return
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _proc_status_bytes(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _reset_peak_memory():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _finish_dump(process):
+    process.stdout.close()
+    if process.wait() != 0:
+        raise RuntimeError(f'The dump command exited with status {process.returncode}')
+
+
+def _tempfile_pipeline(dump_command, codec, part_size, concurrency, key):
+    from flask import current_app
+    from boto3.s3.transfer import TransferConfig
+    from app.backup.utils import get_s3_client
+    backup_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(backup_dir, 'dump.sql')
+        compressor = make_compressor(codec)
+        with open(path, 'wb') as f:
+            if compressor is None:
+                subprocess.run(dump_command, stdout=f, check=True)
+                dump_bytes = None
+            else:
+                process = subprocess.Popen(dump_command, stdout=subprocess.PIPE)
+                reader = _CountingReader(process.stdout)
+                for chunk in _compress(reader, compressor):
+                    f.write(chunk)
+                _finish_dump(process)
+                dump_bytes = reader.bytes
+        stored_bytes = os.path.getsize(path)
+        config = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                                max_concurrency=concurrency, use_threads=concurrency > 1)
+        get_s3_client().upload_file(path, current_app.config['S3_BUCKET'], key, Config=config)
+        return dump_bytes or stored_bytes, stored_bytes
+    finally:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+
+
+def _streaming_pipeline(dump_command, codec, part_size, concurrency, key):
+    from app.backup.utils import upload_stream_to_s3
+    process = subprocess.Popen(dump_command, stdout=subprocess.PIPE)
+    try:
+        reader = _CountingReader(process.stdout)
+        result = upload_stream_to_s3(_compress(reader, make_compressor(codec)), key,
+                                     part_size=part_size, concurrency=concurrency)
+    finally:
+        _finish_dump(process)
+    if not result['success']:
+        raise RuntimeError(result['message'])
+    return reader.bytes, result['size_bytes']
+
+
+def run_pipeline(mode, codec, part_size, concurrency, dump_command, key='bench/dump.sql'):
+    """Run one backup through the pipeline and measure it; needs an app context."""
+    pipeline = _tempfile_pipeline if mode == 'tempfile' else _streaming_pipeline
+    _reset_peak_memory()
+    baseline_rss = _proc_status_bytes('VmRSS')
+    own_before = resource.getrusage(resource.RUSAGE_SELF)
+    dump_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    dump_bytes, stored_bytes = pipeline(dump_command, codec, part_size, concurrency, key)
+    seconds = time.perf_counter() - started
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    dump = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = own.ru_utime + own.ru_stime - own_before.ru_utime - own_before.ru_stime
+    return {
+        'mode': mode,
+        'codec': codec,
+        'part_size': part_size,
+        'concurrency': concurrency,
+        'dump_bytes': dump_bytes,
+        'stored_bytes': stored_bytes,
+        'ratio': round(stored_bytes / dump_bytes, 4) if dump_bytes else None,
+        'seconds': round(seconds, 3),
+        'mb_per_second': round(dump_bytes / MIB / seconds, 1),
+        'cpu_seconds': round(cpu_seconds, 3),
+        'cpu_percent': round(cpu_seconds / seconds * 100, 1),
+        'dump_cpu_seconds': round(dump.ru_utime + dump.ru_stime
+                                  - dump_before.ru_utime - dump_before.ru_stime, 3),
+        'peak_memory_bytes': max(0, _proc_status_bytes('VmHWM') - baseline_rss),
+    }
+
+
+def run_backup_benchmark(config_name='production', size=256 * MIB, compressibility=0.7,
+                         modes=MODES, codecs=('none', 'gzip-1', 'gzip-6'),
+                         part_sizes=(8 * MIB,), concurrencies=(1, 4), s3_latency=0.02,
+                         seed=0, root=None, timeout=60):
+    """Run every combination of the given settings; returns the results and skipped codecs."""
+    root = root or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    skipped = [codec for codec in codecs if not codec_available(codec)]
+    codecs = [codec for codec in codecs if codec not in skipped]
+    dump_command = [sys.executable, os.path.join(root, 'app', 'bench', 'dumpgen.py'),
+                    '--size', str(size), '--compressibility', str(compressibility), '--seed', str(seed)]
+    results = []
+    with tempfile.TemporaryDirectory(prefix='nexdb-backup-bench-') as scratch:
+        s3_port = _free_port()
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+        s3 = subprocess.Popen(
+            [sys.executable, '-m', 'app.bench.s3server', '--port', str(s3_port),
+             '--latency', str(s3_latency)],
+            cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_for_port(s3, s3_port, timeout)
+            database_uri = f"sqlite:///{os.path.join(scratch, 'app.sqlite')}"
+            env.update({
+                'FLASK_CONFIG': config_name,
+                'DATABASE_URL': database_uri,
+                'DEV_DATABASE_URL': database_uri,
+                'TEST_DATABASE_URL': database_uri,
+                'START_BACKGROUND_SERVICES': 'false',
+                'S3_ENDPOINT_URL': f'http://127.0.0.1:{s3_port}',
+                'S3_BUCKET': 'nexdb-bench',
+                'S3_ACCESS_KEY': 'bench',
+                'S3_SECRET_KEY': 'bench',
+            })
+            env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+            for mode, codec, part_size, concurrency in itertools.product(
+                    modes, codecs, part_sizes, concurrencies):
+                arguments = {'mode': mode, 'codec': codec, 'part_size': part_size,
+                             'concurrency': concurrency, 'dump_command': dump_command}
+                output = subprocess.run(
+                    [sys.executable, '-c', _CHILD, config_name, json.dumps(arguments)],
+                    cwd=root, env=env, capture_output=True, text=True, check=True
+                ).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+        finally:
+            s3.terminate()
+            s3.wait(timeout=timeout)
+    return {
+        'size': size,
+        'compressibility': compressibility,
+        's3_latency': s3_latency,
+        'cpus': os.cpu_count(),
+        'results': results,
+        'skipped_codecs': skipped,
+    }
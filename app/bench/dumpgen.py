@@ -0,0 +1,70 @@
+"""
+NEXDB - Synthetic dump generator
+
+Stands in for mysqldump and pg_dump in benchmarks: writes `size` bytes of
+SQL-like text to stdout. `compressibility` is the share of each line taken
+from a small vocabulary of SQL words, which every codec shrinks well; the
+rest of the line is random base64 that no codec can shrink. Run it as a
+script, the way a dump command would be run:
+
+    python app/bench/dumpgen.py --size 268435456 --compressibility 0.7
+
+It imports nothing from the application, so starting it costs what
+starting a dump tool does.
+"""
+
+import argparse
+import base64
+import random
+import sys
+
+LINE_LENGTH = 128
+BLOCK_LINES = 512
+
+_VOCABULARY = (
+    "INSERT INTO `orders` VALUES (id, customer_id, status, total, created_at, updated_at) "
+    "SELECT NULL DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci PRIMARY KEY "
+    "pending shipped delivered cancelled refunded 2024-01-01 00:00:00 'example' "
+) * 4
+
+
+def generate(size, compressibility=0.7, seed=0):
+    """Yield blocks of synthetic dump text adding up to size bytes."""
+    rng = random.Random(seed)
+    fixed = max(0, min(LINE_LENGTH - 1, int(LINE_LENGTH * compressibility)))
+    variable = LINE_LENGTH - 1 - fixed
+    # base64 turns 3 random bytes into 4 characters
+    random_bytes = (variable * BLOCK_LINES * 3 + 3) // 4
+    offsets = len(_VOCABULARY) - fixed
+    header = b'-- NEXDB synthetic dump\n'[:size]
+    written = len(header)
+    row = 0
+    yield header
+    while written < size:
+        noise = base64.b64encode(rng.randbytes(random_bytes)).decode('ascii')
+        lines = []
+        for i in range(BLOCK_LINES):
+            start = (row * 7) % offsets
+            lines.append(_VOCABULARY[start:start + fixed] + noise[i * variable:(i + 1) * variable])
+            row += 1
+        block = ('\n'.join(lines) + '\n').encode('ascii')
+        block = block[:size - written]
+        written += len(block)
+        yield block
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic database dump to stdout.')
+    parser.add_argument('--size', type=int, required=True, help='Bytes to write.')
+    parser.add_argument('--compressibility', type=float, default=0.7,
+                        help='Share of each line that compresses well (0 to 1).')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    out = sys.stdout.buffer
+    for block in generate(args.size, args.compressibility, args.seed):
+        out.write(block)
+    out.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+NEXDB - Endpoint benchmark
+
+Times the pages whose cost grows with the fleet: the project listing, a
+project's detail and the dashboard, against whatever data the application's
+database holds (usually a fleet from `flask generate-fleet`). Each endpoint
+is requested as the heavy user (user 1, a member of hundreds of projects)
+and as a typical user. The dashboard is timed warm, from its summary row,
+and cold, with the row deleted before every request.
+
+Every request has to answer 200: a case that gets anything else stops the
+run, since timing an error page says nothing about the endpoint. Every run
+is saved as JSON, by default under instance/bench/endpoints, and
+compared with the previous run so that a change can be judged by its effect
+on the same dataset.
+"""
+
+import contextvars
+import glob
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func
+from app import db, limiter
+from app.models.user import User
+from app.models.project import Project, project_users
+from app.models.database_server import DatabaseServer, Database
+from app.models.backup import Backup
+from app.models.dashboard import DashboardSummary
+from app.tracing.sql import trace_queries
+
+COUNTED_TABLES = (User, Project, DatabaseServer, Database, Backup)
+
+
+class EndpointError(RuntimeError):
+    """A benchmarked request did not answer 200."""
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _typical_user(heavy_user_id):
+    """Return the user with the median number of memberships."""
+    counts = db.session.execute(
+        db.select(project_users.c.user_id, func.count())
+        .where(project_users.c.user_id != heavy_user_id)
+        .group_by(project_users.c.user_id)
+        .order_by(func.count(), project_users.c.user_id)
+    ).all()
+    return counts[len(counts) // 2][0] if counts else None
+
+
+def _largest_project(user_id):
+    """Return the id of the user's project with the most servers."""
+    return db.session.execute(
+        db.select(project_users.c.project_id)
+        .outerjoin(DatabaseServer, DatabaseServer.project_id == project_users.c.project_id)
+        .where(project_users.c.user_id == user_id)
+        .group_by(project_users.c.project_id)
+        .order_by(func.count(DatabaseServer.id).desc(), project_users.c.project_id)
+        .limit(1)
+    ).scalar()
+
+
+def _cases(heavy_user_id, typical_user_id):
+    """Return (name, path, user id, api, cold) for every timed request."""
+    cases = []
+    for role, user_id in (('heavy', heavy_user_id), ('typical', typical_user_id)):
+        if user_id is None:
+            continue
+        cases.append((f'projects list ({role})', '/api/projects', user_id, True, False))
+        project_id = _largest_project(user_id)
+        if project_id is not None:
+            cases.append((f'project detail ({role})', f'/api/projects/{project_id}', user_id, True, False))
+        cases.append((f'dashboard warm ({role})', '/project/dashboard', user_id, False, False))
+        cases.append((f'dashboard cold ({role})', '/project/dashboard', user_id, False, True))
+    return cases
+
+
+def _time_case(app, path, user_id, api, cold, iterations):
+    # Each request pushes its own app context, as in production
+    client = app.test_client()
+    headers = {}
+    if api:
+        with app.app_context():
+            headers['Authorization'] = f'Bearer {create_access_token(identity=user_id)}'
+    else:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+    
+    def drop_summary():
+        with app.app_context():
+            db.session.execute(db.delete(DashboardSummary).where(DashboardSummary.user_id == user_id))
+            db.session.commit()
+    
+    def check(response):
+        if response.status_code != 200:
+            raise EndpointError(f"GET {path} as user {user_id} answered HTTP {response.status_code}")
+    
+    # One untimed request fills the caches a warm request relies on
+    if cold:
+        drop_summary()
+    response = client.get(path, headers=headers)
+    check(response)
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        if cold:
+            drop_summary()
+        with trace_queries(path) as trace:
+            started = time.perf_counter()
+            response = client.get(path, headers=headers)
+            timings.append(time.perf_counter() - started)
+        check(response)
+        queries.append(trace.queries)
+    return {
+        'status': response.status_code,
+        'bytes': len(response.get_data()),
+        'queries': max(queries),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(_percentile(timings, 0.95) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3)
+    }
+
+
+def _run_cases(app, cases, iterations):
+    results = []
+    for name, path, user_id, api, cold in cases:
+        result = _time_case(app, path, user_id, api, cold, iterations)
+        result.update({'name': name, 'path': path, 'user_id': user_id})
+        results.append(result)
+    return results
+
+
+def _previous_run(output_dir, exclude=None):
+    runs = sorted(glob.glob(os.path.join(output_dir, '*.json')))
+    runs = [path for path in runs if path != exclude]
+    return runs[-1] if runs else None
+
+
+def _compare(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    for result in report['results']:
+        before = previous.get(result['name'])
+        if before and before.get('median_ms'):
+            result['baseline_median_ms'] = before['median_ms']
+            result['change'] = round(result['median_ms'] / before['median_ms'] - 1, 4)
+    report['baseline'] = {'path': baseline_path, 'label': baseline.get('label'),
+                          'created_at': baseline.get('created_at'),
+                          'dataset': baseline.get('dataset')}
+
+
+def run_endpoint_benchmark(app, iterations=50, label=None, output_dir=None, compare=None):
+    """Time the fleet-sensitive endpoints and save the results.
+    
+    compare is the path of an earlier run to compare with; by default the
+    latest run in output_dir is used. Returns the report, whose 'path' is
+    where it was saved.
+    """
+    output_dir = output_dir or os.path.join(app.instance_path, 'bench', 'endpoints')
+    os.makedirs(output_dir, exist_ok=True)
+    limiter_enabled = limiter.enabled
+    limiter.enabled = False
+    try:
+        with app.app_context():
+            database = db.engine.url.get_backend_name()
+            dataset = {model.__tablename__: db.session.scalar(db.select(func.count()).select_from(model))
+                       for model in COUNTED_TABLES}
+            heavy_user_id = db.session.scalar(db.select(func.min(User.id)))
+            typical_user_id = _typical_user(heavy_user_id)
+            cases = _cases(heavy_user_id, typical_user_id)
+        # An empty context, so that a caller's app context (the CLI's) is not shared
+        results = contextvars.Context().run(_run_cases, app, cases, iterations)
+    finally:
+        limiter.enabled = limiter_enabled
+    
+    created_at = datetime.utcnow()
+    report = {
+        'label': label,
+        'created_at': created_at.isoformat(),
+        'iterations': iterations,
+        'database': database,
+        'dataset': dataset,
+        'results': results,
+        'baseline': None
+    }
+    filename = created_at.strftime('%Y%m%dT%H%M%S')
+    if label:
+        filename += '-' + ''.join(c if c.isalnum() or c in '-_' else '-' for c in label)
+    path = os.path.join(output_dir, f'{filename}.json')
+    baseline_path = compare or _previous_run(output_dir, exclude=path)
+    if baseline_path:
+        _compare(report, baseline_path)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    report['path'] = path
+    return report
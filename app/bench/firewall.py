@@ -0,0 +1,83 @@
+"""
+NEXDB - Firewall sync benchmark
+
+Replays a change of client addresses against a FakeUfw whose commands each
+cost `latency` seconds, like real ufw processes do, comparing two ways of
+applying it:
+
+- per-rule: run `ufw allow` for every desired rule (ufw skips the ones that
+  exist) and look each removed rule up in `ufw status numbered` before
+  deleting it, which is what scripting ufw rule by rule amounts to;
+- diff: one status read, then only the deletions and additions from
+  app.firewall.sync.plan_changes, applied in one pass.
+"""
+
+import ipaddress
+import time
+from app.firewall.sync import plan_changes, apply_plan
+from app.firewall.ufw import FakeUfw, parse_status, rule_key, allow_args, delete_args
+
+COMMENT = 'nexdb'
+SYSTEM_RULES = [('22/tcp', 'ALLOW IN', 'Anywhere', ''), ('5000/tcp', 'ALLOW IN', 'Anywhere', '')]
+
+
+def _addresses(count, offset=0):
+    network = ipaddress.ip_network('10.0.0.0/8')
+    return [str(network[1 + offset + index]) for index in range(count)]
+
+
+def build_scenario(clients, changed, ports):
+    """Return the current and desired rule sets for `changed` replaced clients per port."""
+    current, desired = set(), set()
+    for port in ports:
+        before = _addresses(clients)
+        after = before[changed:] + _addresses(changed, offset=clients)
+        current.update((source, port, 'tcp') for source in before)
+        desired.update((source, port, 'tcp') for source in after)
+    return current, desired
+
+
+def _fake_ufw(rules, latency):
+    return FakeUfw(SYSTEM_RULES + [(f"{port}/{protocol}", 'ALLOW IN', source, COMMENT)
+                                   for source, port, protocol in sorted(rules)], latency=latency)
+
+
+def _managed(ufw):
+    return {rule_key(rule) for rule in parse_status(ufw.status())[1] if rule.comment == COMMENT}
+
+
+def apply_per_rule(ufw, desired):
+    for source, port, protocol in sorted(desired):
+        ufw.run(allow_args(source, port, protocol, COMMENT))
+    stale = _managed(ufw) - desired
+    for key in stale:
+        _, rules = parse_status(ufw.run(['status', 'numbered']).stdout)
+        for rule in rules:
+            if rule.comment == COMMENT and rule_key(rule) == key:
+                ufw.run(delete_args(rule.number))
+                break
+
+
+def apply_diff(ufw, desired):
+    _, rules = parse_status(ufw.run(['status', 'numbered']).stdout)
+    apply_plan(ufw, plan_changes(rules, desired, COMMENT), COMMENT)
+
+
+def run_firewall_benchmark(clients=200, changed=20, servers=2, latency=0.05):
+    """Apply the same address change both ways and report commands and time."""
+    ports = [3306 + index for index in range(servers)]
+    current, desired = build_scenario(clients, changed, ports)
+    results = []
+    for name, apply in (('per-rule', apply_per_rule), ('diff', apply_diff)):
+        ufw = _fake_ufw(current, latency)
+        started = time.perf_counter()
+        apply(ufw, desired)
+        seconds = time.perf_counter() - started
+        results.append({
+            'strategy': name,
+            'commands': len(ufw.calls),
+            'seconds': seconds,
+            'correct': _managed(ufw) == desired and ufw.rules[:len(SYSTEM_RULES)] == SYSTEM_RULES,
+        })
+    return {'rules': len(desired), 'changes': len(current ^ desired), 'latency': latency,
+            'results': results}
@@ -0,0 +1,193 @@
+"""
+NEXDB - Synthetic fleet generator
+
+Fills an empty database with a fleet large enough to show how pages and
+queries scale: by default 10k users, 50k projects, 200k servers, 200k
+databases and 2M backups. Rows are generated lazily, chunk by chunk, and
+inserted with executemany, or with COPY on PostgreSQL (psycopg2), never as
+ORM objects, so memory stays flat whatever the size.
+
+User 1 is a heavy user who is a member of HEAVY_USER_PROJECTS projects, the
+account to benchmark worst-case listings with; everyone else gets a handful
+of random memberships. Every user shares one password hash and every server
+one encrypted password, so that logging in and reading credentials work as
+they do for real rows.
+"""
+
+import csv
+import io
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, time as dt_time
+from sqlalchemy import text
+from app import db
+from app.models.user import User
+from app.models.project import Project, project_users
+from app.models.database_server import DatabaseServer, Database, DatabaseUser
+from app.models.backup import Backup, BackupSchedule
+
+FLEET_SIZES = {
+    'users': 10000,
+    'projects': 50000,
+    'project_users': 150000,
+    'database_servers': 200000,
+    'databases': 200000,
+    'database_users': 200000,
+    'backups': 2000000,
+    'backup_schedules': 50000,
+}
+
+HEAVY_USER_PROJECTS = 500
+INSERT_CHUNK = 10000
+
+_EPOCH = datetime(2024, 1, 1)
+
+
+def scaled_sizes(scale=1.0, **overrides):
+    """Return FLEET_SIZES multiplied by scale, with explicit counts taking precedence."""
+    sizes = {name: max(1, int(count * scale)) for name, count in FLEET_SIZES.items()}
+    sizes.update({name: count for name, count in overrides.items() if count is not None})
+    return sizes
+
+
+def _copy(conn, table, rows):
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row[column] for column in columns)
+    buffer.seek(0)
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _insert(conn, table, rows, chunk_size=INSERT_CHUNK):
+    """Insert an iterable of row dicts chunk by chunk; returns the row count."""
+    use_copy = conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2'
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return count
+        if use_copy:
+            _copy(conn, table, chunk)
+        else:
+            conn.execute(table.insert(), chunk)
+        count += len(chunk)
+
+
+def _memberships(rng, sizes):
+    heavy = rng.sample(range(1, sizes['projects'] + 1), min(HEAVY_USER_PROJECTS, sizes['projects']))
+    pairs = {(project_id, 1) for project_id in heavy}
+    target = max(sizes['project_users'], len(pairs))
+    attempts = 0
+    while sizes['users'] > 1 and len(pairs) < target and attempts < target * 4:
+        pairs.add((rng.randint(1, sizes['projects']), rng.randint(2, sizes['users'])))
+        attempts += 1
+    for project_id, user_id in sorted(pairs):
+        yield {'project_id': project_id, 'user_id': user_id,
+               'access_level': rng.choice(['read', 'write', 'admin'])}
+
+
+def _fleet_rows(sizes, rng, password_hash, encrypted_password):
+    users, projects = sizes['users'], sizes['projects']
+    servers, databases = sizes['database_servers'], sizes['databases']
+    
+    def stamp(i, total):
+        # Spread creation times over a year, in id order
+        return _EPOCH + timedelta(minutes=525600 * i // max(total, 1))
+    
+    yield User.__table__, (
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+         'password_hash': password_hash, 'active': True,
+         'created_at': stamp(i, users), 'updated_at': stamp(i, users)}
+        for i in range(1, users + 1)
+    )
+    yield Project.__table__, (
+        {'id': i, 'name': f'project{i}', 'description': f'Synthetic project {i}',
+         'created_by': rng.randint(1, users), 'created_at': stamp(i, projects),
+         'updated_at': stamp(i, projects)}
+        for i in range(1, projects + 1)
+    )
+    yield project_users, _memberships(rng, sizes)
+    yield DatabaseServer.__table__, (
+        {'id': i, 'name': f'server{i}', 'description': None,
+         'host': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+         'port': 3306 if i % 2 else 5432, 'server_type': 'mysql' if i % 2 else 'postgresql',
+         'username': 'admin', 'encrypted_password': encrypted_password,
+         'project_id': rng.randint(1, projects), 'created_at': stamp(i, servers),
+         'updated_at': stamp(i, servers)}
+        for i in range(1, servers + 1)
+    )
+    yield Database.__table__, (
+        {'id': i, 'name': f'db{i}', 'description': None, 'server_id': rng.randint(1, servers),
+         'created_at': stamp(i, databases), 'updated_at': stamp(i, databases)}
+        for i in range(1, databases + 1)
+    )
+    yield DatabaseUser.__table__, (
+        {'id': i, 'username': f'dbuser{i}', 'encrypted_password': encrypted_password,
+         'privileges': None, 'database_id': rng.randint(1, databases),
+         'created_at': _EPOCH, 'updated_at': _EPOCH}
+        for i in range(1, sizes['database_users'] + 1)
+    )
+    yield Backup.__table__, (
+        {'id': i, 'filename': f'backup{i}.sql.gz', 'size_bytes': rng.randint(1, 10 ** 9),
+         'created_at': stamp(i, sizes['backups']),
+         'status': 'completed' if i % 50 else 'failed', 'location': 's3' if i % 3 else 'local',
+         's3_path': None, 'database_id': rng.randint(1, databases)}
+        for i in range(1, sizes['backups'] + 1)
+    )
+    yield BackupSchedule.__table__, (
+        {'id': i, 'database_id': rng.randint(1, databases), 'frequency': 'daily',
+         'time': dt_time(rng.randint(0, 23)), 'retention_count': 7, 'enabled': True,
+         'upload_to_s3': bool(i % 2), 'created_at': _EPOCH, 'updated_at': _EPOCH}
+        for i in range(1, sizes['backup_schedules'] + 1)
+    )
+
+
+def _reset_sequences(conn, tables):
+    for table in tables:
+        if 'id' in table.c:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"(SELECT coalesce(max(id), 1) FROM {table.name}))"
+            ))
+
+
+def generate_fleet(engine, sizes=None, seed=0, password_hash='x', encrypted_password='x',
+                   chunk_size=INSERT_CHUNK, progress=None):
+    """Create the schema in engine and fill it with a synthetic fleet.
+    
+    The tables must be empty. Returns the rows and seconds per table;
+    progress, if given, is called with each table's name, rows and seconds.
+    """
+    sizes = sizes or dict(FLEET_SIZES)
+    rng = random.Random(seed)
+    db.metadata.create_all(engine)
+    
+    report = {}
+    with engine.begin() as conn:
+        tables = []
+        for table, rows in _fleet_rows(sizes, rng, password_hash, encrypted_password):
+            started = time.perf_counter()
+            count = _insert(conn, table, rows, chunk_size)
+            seconds = time.perf_counter() - started
+            report[table.name] = {'rows': count, 'seconds': round(seconds, 3)}
+            tables.append(table)
+            if progress:
+                progress(table.name, count, seconds)
+        if engine.dialect.name == 'postgresql':
+            _reset_sequences(conn, tables)
+        if engine.dialect.name == 'sqlite':
+            conn.execute(text('ANALYZE'))
+    
+    if engine.dialect.name == 'postgresql':
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text('ANALYZE'))
+    return report
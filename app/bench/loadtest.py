@@ -0,0 +1,373 @@
+"""
+NEXDB - API load test
+
+Drives a weighted mix of API calls from many concurrent asyncio clients and
+reports throughput, p50/p95/p99 latency and error rates, overall and per
+operation:
+
+- token: POST /api/auth/token (a bcrypt password check);
+- projects: GET /api/projects;
+- server: GET /api/servers/<id>;
+- backup: POST /api/servers/<id>/export to S3, the API's on-demand dump of
+  a database to the backup bucket.
+
+Without a target URL the load test is self-contained: it starts gunicorn on
+the application's database (usually a fleet from `flask generate-fleet`)
+once per worker count, with the managed servers replaced by
+FakeServerConnector and S3 by the local stand-in of app.bench.s3server, so
+runs with 1, 2, 4... workers show where throughput stops scaling. Against a
+running instance (`url`), that instance must have rate limiting disabled
+(RATELIMIT_ENABLED=false) for token calls to be measured.
+
+The clients speak HTTP/1.1 over asyncio streams, keeping connections alive
+when the server allows it (gunicorn's sync workers close them after every
+response, as they do for real clients).
+"""
+
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+from sqlalchemy import select
+from app import db
+from app.models.user import User
+from app.models.project import project_users
+from app.models.database_server import DatabaseServer, Database
+
+OPERATIONS = ('token', 'projects', 'server', 'backup')
+DEFAULT_MIX = {'token': 1, 'projects': 10, 'server': 10, 'backup': 1}
+
+
+def parse_mix(value):
+    """Parse 'projects=10,server=5' into operation weights."""
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name}; expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('The mix needs at least one operation with a positive weight')
+    return mix
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class HttpClient:
+    """A minimal HTTP/1.1 client over one asyncio connection at a time."""
+    
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.connections = 0
+    
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+    
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+        version, status = status_line.split(b' ', 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0].strip(), 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                parts.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            body = b''.join(parts)
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close' or version == b'HTTP/1.0':
+            await self.close()
+        return int(status), body
+    
+    async def request(self, method, path, body=None, headers=None):
+        """Send a request and return its status and body; JSON bodies are encoded."""
+        data = b'' if body is None else json.dumps(body).encode('utf-8')
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                 f'Content-Length: {len(data)}', 'Connection: keep-alive']
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+        payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + data
+        
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout)
+                self.connections += 1
+            try:
+                self.writer.write(payload)
+                await self.writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                # A kept-alive connection may have been closed while idle
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                await self.close()
+                raise
+
+
+def load_targets(users=20, servers_per_user=20):
+    """Return the accounts to log in with and the servers and databases each can see.
+    
+    Needs an app context; only active users who are members of a project with
+    at least one server holding a database are chosen.
+    """
+    rows = db.session.execute(
+        select(User.id, User.username, DatabaseServer.id, Database.name)
+        .join(project_users, project_users.c.user_id == User.id)
+        .join(DatabaseServer, DatabaseServer.project_id == project_users.c.project_id)
+        .join(Database, Database.server_id == DatabaseServer.id)
+        .where(User.active.is_(True))
+        .order_by(User.id, DatabaseServer.id)
+        .limit(users * servers_per_user * 4)
+    ).all()
+    targets = {}
+    for user_id, username, server_id, database_name in rows:
+        target = targets.setdefault(user_id, {'username': username, 'servers': {}})
+        if len(target['servers']) < servers_per_user:
+            target['servers'].setdefault(server_id, database_name)
+    return [dict(target, servers=list(target['servers'].items()))
+            for target in list(targets.values())[:users]]
+
+
+class _Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(int)
+    
+    def add(self, operation, seconds, status):
+        self.latencies[operation].append(seconds)
+        self.statuses[str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[operation] += 1
+    
+    def summary(self, seconds):
+        def stats(latencies, errors):
+            return {
+                'requests': len(latencies),
+                'errors': errors,
+                'error_rate': round(errors / len(latencies), 4) if latencies else 0.0,
+                'throughput': round(len(latencies) / seconds, 1),
+                'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+                'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+                'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+            }
+        everything = [value for values in self.latencies.values() for value in values]
+        result = stats(everything, sum(self.errors.values()))
+        result['operations'] = {operation: stats(self.latencies[operation], self.errors[operation])
+                                for operation in OPERATIONS if operation in self.latencies}
+        result['statuses'] = dict(self.statuses)
+        return result
+
+
+async def _call(client, operation, target, token, rng, password):
+    if operation == 'token':
+        return await client.request('POST', '/api/auth/token',
+                                    {'username': target['username'], 'password': password})
+    headers = {'Authorization': f'Bearer {token}'}
+    if operation == 'projects':
+        return await client.request('GET', '/api/projects', headers=headers)
+    server_id, database_name = rng.choice(target['servers'])
+    if operation == 'server':
+        return await client.request('GET', f'/api/servers/{server_id}', headers=headers)
+    return await client.request('POST', f'/api/servers/{server_id}/export', {
+        'database': database_name, 'table': 'loadtest', 'format': 'csv',
+        'compression': 'gzip', 'destination': 's3'
+    }, headers)
+
+
+async def _login(host, port, targets, password, timeout):
+    client = HttpClient(host, port, timeout)
+    tokens = []
+    try:
+        for target in targets:
+            status, body = await client.request(
+                'POST', '/api/auth/token', {'username': target['username'], 'password': password})
+            if status != 200:
+                raise RuntimeError(f"Logging in as {target['username']} failed with HTTP {status}: "
+                                   f"{body[:200].decode('utf-8', 'replace')}")
+            tokens.append(json.loads(body)['access_token'])
+    finally:
+        await client.close()
+    return tokens
+
+
+async def _drive(url, targets, password, mix, clients, duration, warmup, timeout, seed):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    tokens = await _login(host, port, targets, password, timeout)
+    operations = list(mix)
+    weights = [mix[operation] for operation in operations]
+    recorder = _Recorder()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    
+    async def run_client(index):
+        rng = random.Random(seed * 100003 + index)
+        client = HttpClient(host, port, timeout)
+        target, token = targets[index % len(targets)], tokens[index % len(targets)]
+        try:
+            while True:
+                operation = rng.choices(operations, weights)[0]
+                began = time.perf_counter()
+                if began >= deadline:
+                    break
+                try:
+                    status, _ = await _call(client, operation, target, token, rng, password)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                    status = type(e).__name__
+                if began >= measure_from:
+                    recorder.add(operation, time.perf_counter() - began, status)
+        finally:
+            await client.close()
+        return client.connections
+    
+    connections = await asyncio.gather(*(run_client(index) for index in range(clients)))
+    result = recorder.summary(duration)
+    result['connections'] = sum(connections)
+    return result
+
+
+def run_load(url, targets, password='benchmark', mix=None, clients=50, duration=30, warmup=3,
+             timeout=30, seed=0):
+    """Drive the mix against url for duration seconds after warmup; returns the summary."""
+    if not targets:
+        raise RuntimeError('No user with a server holding a database was found; '
+                           'run `flask generate-fleet` first')
+    result = asyncio.run(_drive(url, targets, password, mix or DEFAULT_MIX, clients, duration,
+                                warmup, timeout, seed))
+    # The clients share the machine's CPUs with the server when both run locally
+    result.update({'url': url, 'clients': clients, 'duration': duration, 'cpus': os.cpu_count()})
+    return result
+
+
+def _wait_for_port(process, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{process.args[2]} exited with status {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Nothing listened on port {port} within {timeout}s')
+
+
+def _s3_stats(port):
+    import urllib.request
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stats', timeout=5) as response:
+        return json.loads(response.read())
+
+
+def run_loadtest(database_uri, worker_counts=(1, 2, 4), threads=1, config_name='production',
+                 server_latency=0.005, export_rows=1000, root=None, startup_timeout=60, **load):
+    """Start gunicorn with each worker count and run the load against it.
+    
+    The managed servers are faked with server_latency seconds per round trip
+    and export_rows rows per export, and uploads go to a local S3 stand-in.
+    `load` holds run_load's arguments other than the URL.
+    """
+    root = root or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    results = []
+    with tempfile.TemporaryDirectory(prefix='nexdb-loadtest-') as scratch:
+        s3_port = _free_port()
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+        s3 = subprocess.Popen([sys.executable, '-m', 'app.bench.s3server', '--port', str(s3_port)],
+                              cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_for_port(s3, s3_port, startup_timeout)
+            env.update({
+                'FLASK_CONFIG': config_name,
+                'DATABASE_URL': database_uri,
+                'DEV_DATABASE_URL': database_uri,
+                'TEST_DATABASE_URL': database_uri,
+                'RATELIMIT_ENABLED': 'false',
+                'RATELIMIT_STORAGE_URI': 'memory://',
+                'START_BACKGROUND_SERVICES': 'false',
+                'AUTO_CREATE_SCHEMA': 'false',
+                'SCHEDULER_LOCK_FILE': os.path.join(scratch, 'scheduler.lock'),
+                'PROMETHEUS_MULTIPROC_DIR': os.path.join(scratch, 'metrics'),
+                'CACHE_GENERATION_DIR': scratch,
+                'SERVER_CONNECTOR': 'app.database.fake.FakeServerConnector',
+                'FAKE_SERVER_LATENCY': str(server_latency),
+                'FAKE_SERVER_ROWS': str(export_rows),
+                'S3_ENDPOINT_URL': f'http://127.0.0.1:{s3_port}',
+                'S3_BUCKET': 'nexdb-loadtest',
+                'S3_ACCESS_KEY': 'loadtest',
+                'S3_SECRET_KEY': 'loadtest',
+                # Every worker must sign and accept the same tokens
+                'SECRET_KEY': env.get('SECRET_KEY') or os.urandom(16).hex(),
+                'JWT_SECRET_KEY': env.get('JWT_SECRET_KEY') or os.urandom(32).hex(),
+            })
+            for workers in worker_counts:
+                port = _free_port()
+                server = subprocess.Popen(
+                    [sys.executable, '-m', 'gunicorn', '--config', os.path.join(root, 'gunicorn.conf.py'),
+                     '--workers', str(workers), '--threads', str(threads),
+                     '--bind', f'127.0.0.1:{port}'],
+                    cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+                try:
+                    _wait_for_port(server, port, startup_timeout)
+                    uploaded = _s3_stats(s3_port)['bytes']
+                    result = run_load(f'http://127.0.0.1:{port}', **load)
+                    result['s3_bytes'] = _s3_stats(s3_port)['bytes'] - uploaded
+                finally:
+                    server.terminate()
+                    server.wait(timeout=startup_timeout)
+                result.update({'workers': workers, 'threads': threads})
+                results.append(result)
+        finally:
+            s3.terminate()
+            s3.wait(timeout=startup_timeout)
+    return results
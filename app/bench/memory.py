@@ -0,0 +1,139 @@
+"""
+NEXDB - Worker memory benchmark
+
+Starts gunicorn with and without --preload, warms the workers up with a batch
+of requests, and reads each process's resident (RSS), proportional (PSS) and
+unique (USS) memory from /proc. USS is what a worker costs on its own; with
+preloading, the code and data loaded in the master move from USS into pages
+shared copy-on-write. Linux only.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = ('no-preload', 'preload')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    """Return the child process ids of pid."""
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            children.extend(int(child) for child in f.read().split())
+    return children
+
+
+def process_memory(pid):
+    """Return the RSS, PSS and USS of a process in bytes."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            response.read()
+    except urllib.error.HTTPError:
+        # Error pages are still served by a fully loaded worker
+        pass
+
+
+def _wait_until_ready(server, url, workers, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {server.returncode}')
+        if len(_children(server.pid)) == workers:
+            try:
+                _get(url)
+                return
+            except OSError:
+                pass
+        time.sleep(0.2)
+    raise RuntimeError(f'gunicorn did not start {workers} workers within {timeout}s')
+
+
+def measure_mode(preload, workers=3, requests=300, path='/login', config_name='production',
+                 root=None, timeout=60):
+    """Run gunicorn in one mode and return the memory of the master and workers."""
+    root = root or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}{path}'
+    with tempfile.TemporaryDirectory(prefix='nexdb-memory-bench-') as scratch:
+        database_uri = f"sqlite:///{os.path.join(scratch, 'app.sqlite')}"
+        env = dict(os.environ)
+        env.update({
+            'PYTHONPATH': os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')])),
+            'FLASK_CONFIG': config_name,
+            'GUNICORN_PRELOAD': 'true' if preload else 'false',
+            'DATABASE_URL': database_uri,
+            'DEV_DATABASE_URL': database_uri,
+            'TEST_DATABASE_URL': database_uri,
+            'RATELIMIT_STORAGE_URI': f"sqlite-shared:///{os.path.join(scratch, 'ratelimit.sqlite')}",
+            'SCHEDULER_LOCK_FILE': os.path.join(scratch, 'scheduler.lock'),
+            'CACHE_GENERATION_DIR': scratch,
+            # Without preloading, every worker would otherwise draw its own key
+            'SECRET_KEY': env.get('SECRET_KEY') or os.urandom(16).hex(),
+        })
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', os.path.join(root, 'gunicorn.conf.py'),
+             '--workers', str(workers), '--bind', f'127.0.0.1:{port}'],
+            cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_until_ready(server, url, workers, timeout)
+            with ThreadPoolExecutor(max_workers=workers * 4) as pool:
+                list(pool.map(_get, [url] * requests))
+            time.sleep(1)
+            worker_pids = _children(server.pid)
+            return {
+                'mode': 'preload' if preload else 'no-preload',
+                'master': process_memory(server.pid),
+                'workers': [process_memory(pid) for pid in worker_pids],
+            }
+        finally:
+            server.terminate()
+            server.wait(timeout=timeout)
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0
+
+
+def run_memory_benchmark(workers=3, requests=300, path='/login', config_name='production',
+                         modes=MODES):
+    """Measure each mode and summarise the memory a worker costs in it."""
+    results = []
+    for mode in modes:
+        result = measure_mode(mode == 'preload', workers, requests, path, config_name)
+        processes = [result['master']] + result['workers']
+        result.update({
+            'worker_rss': _mean([memory['rss'] for memory in result['workers']]),
+            'worker_pss': _mean([memory['pss'] for memory in result['workers']]),
+            'worker_uss': _mean([memory['uss'] for memory in result['workers']]),
+            'total_pss': sum(memory['pss'] for memory in processes),
+        })
+        results.append(result)
+    return results
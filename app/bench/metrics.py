@@ -0,0 +1,91 @@
+"""
+NEXDB - Metrics overhead benchmark
+
+Times what metrics add to the hot path: the request hooks (per request) and
+the cursor hooks (per query), in a single process and in gunicorn's
+multiprocess mode, against the time of a whole request without metrics. Each
+mode runs in a fresh interpreter since PROMETHEUS_MULTIPROC_DIR is read when
+prometheus_client is imported. End-to-end timings of two full requests differ
+by far more than the hooks cost, so the hooks are timed on their own. The
+reference request has to answer 200, so that an error page is never the
+baseline.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+MODES = ('single', 'multiprocess')
+
+_CHILD = """
+import json, statistics, sys, time
+from types import SimpleNamespace
+from app import create_app, limiter, metrics
+app = create_app(sys.argv[1])
+limiter.enabled = False
+path, iterations = sys.argv[2], int(sys.argv[3])
+
+def per_call_us(fn, rounds=5):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - started) / iterations * 1e6)
+    return statistics.median(samples)
+
+result = {}
+if sys.argv[4] == 'baseline':
+    client = app.test_client()
+    status = client.get(path).status_code
+    result['request_us'] = per_call_us(lambda: client.get(path))
+    result['status'] = status
+else:
+    response = SimpleNamespace(status_code=200)
+    context = SimpleNamespace()
+    with app.test_request_context(path):
+        def request_hooks():
+            metrics._start_timer()
+            metrics._record_request(response)
+        result['request_hooks_us'] = per_call_us(request_hooks)
+    def query_hooks():
+        metrics._before_cursor_execute(None, None, 'SELECT 1', (), context, False)
+        metrics._after_cursor_execute(None, None, 'SELECT 1', (), context, False)
+    result['query_hooks_us'] = per_call_us(query_hooks)
+print(json.dumps(result))
+"""
+
+
+def _run_child(mode, config_name, path, iterations, root):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    env['START_BACKGROUND_SERVICES'] = 'false'
+    env['METRICS_ENABLED'] = 'false' if mode == 'baseline' else 'true'
+    # Metrics are only turned on outside debug and testing with a token
+    env.setdefault('METRICS_TOKEN', 'bench')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        if mode == 'multiprocess':
+            env['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir
+        output = subprocess.run(
+            [sys.executable, '-c', _CHILD, config_name, path, str(iterations), mode],
+            cwd=root, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_metrics_benchmark(config_name='default', path='/login', iterations=20000, root=None):
+    """Return the median request time and the cost of the metric hooks per mode."""
+    root = root or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    baseline = _run_child('baseline', config_name, path, max(1, iterations // 20), root)
+    if baseline['status'] != 200:
+        raise RuntimeError(f"GET {path} answered HTTP {baseline['status']}; choose a path that answers 200")
+    results = []
+    for mode in MODES:
+        result = _run_child(mode, config_name, path, iterations, root)
+        result['mode'] = mode
+        result['request_share'] = result['request_hooks_us'] / baseline['request_us']
+        results.append(result)
+    return {'request_us': baseline['request_us'], 'status': baseline['status'], 'modes': results}
@@ -0,0 +1,149 @@
+"""
+NEXDB - Query plan checks
+
+Loads a synthetic dataset into a scratch database and checks the plans of the
+queries behind the main pages, so a dropped or unusable index is reported as a
+failure instead of surfacing as a slow page in production.
+"""
+
+import json
+import os
+import tempfile
+from collections import namedtuple
+from sqlalchemy import create_engine, text
+from app import db
+from app.bench.fleet import generate_fleet
+from app.models.project import Project, project_users
+from app.models.database_server import DatabaseServer, Database, DatabaseUser
+from app.models.backup import Backup, BackupSchedule
+
+# tables: tables that must be reached through an index, never scanned
+# ordered: the ORDER BY must be satisfied by an index rather than a sort
+PlanCheck = namedtuple('PlanCheck', ['name', 'statement', 'tables', 'ordered'])
+
+# Row counts of the synthetic dataset at scale 1
+DATASET_SIZES = {
+    'users': 200,
+    'projects': 2000,
+    'project_users': 6000,
+    'database_servers': 5000,
+    'databases': 20000,
+    'database_users': 20000,
+    'backups': 100000,
+    'backup_schedules': 10000,
+}
+
+
+def key_queries():
+    """Return the queries whose plans are checked."""
+    return [
+        PlanCheck('servers in a project',
+                  db.select(DatabaseServer).where(DatabaseServer.project_id == 7),
+                  ['database_servers'], False),
+        PlanCheck('databases on a server',
+                  db.select(Database).where(Database.server_id == 42),
+                  ['databases'], False),
+        PlanCheck('users of a database',
+                  db.select(DatabaseUser).where(DatabaseUser.database_id == 42),
+                  ['database_users'], False),
+        PlanCheck('latest backups of a database',
+                  db.select(Backup).where(Backup.database_id == 42).
+                  order_by(Backup.created_at.desc()).limit(20),
+                  ['backups'], True),
+        PlanCheck('backup schedules of a database',
+                  db.select(BackupSchedule).where(BackupSchedule.database_id == 42),
+                  ['backup_schedules'], False),
+        PlanCheck('projects created by a user',
+                  db.select(Project).where(Project.created_by == 3),
+                  ['projects'], False),
+        PlanCheck('projects a user is a member of',
+                  db.select(Project).join(project_users, project_users.c.project_id == Project.id).
+                  where(project_users.c.user_id == 3),
+                  ['project_users', 'projects'], False),
+        PlanCheck('servers with their databases for a project',
+                  db.select(DatabaseServer, Database).
+                  join(Database, Database.server_id == DatabaseServer.id).
+                  where(DatabaseServer.project_id == 7),
+                  ['database_servers', 'databases'], False),
+    ]
+
+
+def build_dataset(engine, scale=1, seed=0):
+    """Create the schema in engine and fill it with a synthetic fleet."""
+    sizes = {name: max(1, int(count * scale)) for name, count in DATASET_SIZES.items()}
+    generate_fleet(engine, sizes, seed=seed)
+    return sizes
+
+
+def _sqlite_problems(conn, sql, check):
+    rows = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}')).all()
+    plan = [row[-1] for row in rows]
+    problems = []
+    for detail in plan:
+        words = detail.split()
+        if words[:1] == ['SCAN'] and len(words) > 1 and words[1] in check.tables:
+            problems.append(f'full scan: {detail}')
+        if check.ordered and 'TEMP B-TREE FOR ORDER BY' in detail:
+            problems.append(f'sort not served by an index: {detail}')
+    return plan, problems
+
+
+def _postgresql_problems(conn, sql, check):
+    # Make sequential scans a last resort so a missing index shows up even on
+    # tables small enough that a scan would be cheaper
+    conn.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = conn.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    problems = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('Plans', []))
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in check.tables:
+            problems.append(f"full scan: Seq Scan on {node['Relation Name']}")
+        if check.ordered and node['Node Type'] in ('Sort', 'Incremental Sort'):
+            problems.append(f"sort not served by an index: {node['Node Type']}")
+    return plan, problems
+
+
+def check_plans(engine, checks=None):
+    """Explain each key query and return one result dict per query."""
+    explainers = {'sqlite': _sqlite_problems, 'postgresql': _postgresql_problems}
+    explain = explainers.get(engine.dialect.name)
+    if explain is None:
+        raise ValueError(f'Query plan checks do not support {engine.dialect.name}')
+    
+    results = []
+    for check in checks or key_queries():
+        sql = str(check.statement.compile(dialect=engine.dialect,
+                                          compile_kwargs={'literal_binds': True}))
+        with engine.begin() as conn:
+            plan, problems = explain(conn, sql, check)
+        results.append({
+            'name': check.name,
+            'passed': not problems,
+            'problems': problems,
+            'plan': plan
+        })
+    return results
+
+
+def run_plan_checks(database_uri=None, scale=1, seed=0):
+    """Build the dataset in a scratch database and check every key query plan.
+    
+    Without database_uri a temporary SQLite file is used. A given database must
+    be empty; it is filled with synthetic rows and left in place.
+    """
+    scratch_dir = None
+    if database_uri is None:
+        scratch_dir = tempfile.TemporaryDirectory(prefix='nexdb-plans-')
+        database_uri = f"sqlite:///{os.path.join(scratch_dir.name, 'plans.sqlite')}"
+    engine = create_engine(database_uri)
+    try:
+        sizes = build_dataset(engine, scale=scale, seed=seed)
+        return {'dataset': sizes, 'results': check_plans(engine)}
+    finally:
+        engine.dispose()
+        if scratch_dir is not None:
+            scratch_dir.cleanup()
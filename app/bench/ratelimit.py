@@ -0,0 +1,71 @@
+"""
+NEXDB - Rate limiter benchmark
+
+Measures the per-hit cost of a limits storage backend and checks that a limit
+is enforced across several processes hitting the same key concurrently.
+"""
+
+import multiprocessing
+import statistics
+import time
+import uuid
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+
+def _worker(uri, strategy, limit, iterations, key, start, results):
+    """Hit one shared key iterations times and report timings and successes."""
+    from app import ratelimit  # noqa: F401
+    storage = storage_from_string(uri)
+    limiter = STRATEGIES[strategy](storage)
+    item = parse(limit)
+    start.wait()
+    timings = []
+    allowed = 0
+    for _ in range(iterations):
+        began = time.perf_counter()
+        if limiter.hit(item, key):
+            allowed += 1
+        timings.append(time.perf_counter() - began)
+    results.put((allowed, timings))
+
+
+def run_ratelimit_benchmark(uri, strategy='fixed-window', processes=4, iterations=2000, allowed=1000):
+    """Run the benchmark and return a dict of latency and correctness figures.
+    
+    Every process hits the same key, so with a correctly shared backend the
+    total number of allowed hits equals the configured limit exactly.
+    """
+    limit = f'{allowed} per hour'
+    key = f'bench-{uuid.uuid4().hex}'
+    start = multiprocessing.Barrier(processes)
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_worker,
+                                args=(uri, strategy, limit, iterations, key, start, results))
+        for _ in range(processes)
+    ]
+    began = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    collected = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+    
+    total_allowed = sum(allowed_hits for allowed_hits, _ in collected)
+    timings = sorted(t for _, worker_timings in collected for t in worker_timings)
+    return {
+        'storage': uri,
+        'strategy': strategy,
+        'processes': processes,
+        'hits': len(timings),
+        'limit': allowed,
+        'allowed': total_allowed,
+        'correct': total_allowed == min(allowed, len(timings)),
+        'mean_us': statistics.mean(timings) * 1e6,
+        'p50_us': timings[len(timings) // 2] * 1e6,
+        'p99_us': timings[int(len(timings) * 0.99)] * 1e6,
+        'hits_per_second': len(timings) / elapsed
+    }
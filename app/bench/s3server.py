@@ -0,0 +1,172 @@
+"""
+NEXDB - Local S3 stand-in
+
+A minimal S3-compatible HTTP server for load tests and benchmarks, serving
+enough of the API for boto3's put_object, multipart uploads, list_buckets
+and head_bucket with path-style addressing (any endpoint given as an IP
+address). Requests are not authenticated and object bodies are counted and
+discarded, so an upload costs the client what it would against a nearby S3
+endpoint with no disk or network in the way. `latency` seconds are slept
+before answering each upload request to stand in for a remote endpoint's
+round trip.
+
+Run it in a thread with start_local_s3(), or as its own process with
+`python -m app.bench.s3server --port 9000`. GET /_stats returns the bytes,
+objects and requests received so far as JSON.
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+_XML = 'application/xml'
+
+
+class LocalS3Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _read_body(self):
+        """Read and discard the request body; returns its size in bytes."""
+        size = 0
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                length = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if length == 0:
+                    self.rfile.readline()
+                    return size
+                size += len(self.rfile.read(length))
+                self.rfile.readline()
+        remaining = int(self.headers.get('Content-Length') or 0)
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            size += len(chunk)
+            remaining -= len(chunk)
+        return size
+    
+    def _send(self, status, body=b'', content_type=_XML, headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def _target(self):
+        url = urlsplit(self.path)
+        bucket, _, key = url.path.lstrip('/').partition('/')
+        return bucket, key, parse_qs(url.query, keep_blank_values=True)
+    
+    def do_HEAD(self):
+        self.server.count(0)
+        self._send(200)
+    
+    def do_GET(self):
+        bucket, key, query = self._target()
+        self.server.count(0)
+        if bucket == '_stats':
+            self._send(200, json.dumps(self.server.stats()), 'application/json')
+        elif not bucket:
+            self._send(200, '<ListAllMyBucketsResult><Owner><ID>nexdb</ID></Owner>'
+                            '<Buckets></Buckets></ListAllMyBucketsResult>')
+        elif not key:
+            self._send(200, f'<ListBucketResult><Name>{bucket}</Name><KeyCount>0</KeyCount>'
+                            '<IsTruncated>false</IsTruncated></ListBucketResult>')
+        else:
+            self._send(404, '<Error><Code>NoSuchKey</Code></Error>')
+    
+    def do_PUT(self):
+        bucket, key, query = self._target()
+        size = self._read_body()
+        self.server.wait()
+        self.server.count(size, objects=0 if 'uploadId' in query else 1)
+        etag = f'"{uuid.uuid4().hex}"'
+        self._send(200, headers={'ETag': etag})
+    
+    def do_POST(self):
+        bucket, key, query = self._target()
+        self._read_body()
+        self.server.wait()
+        if 'uploads' in query:
+            self.server.count(0)
+            self._send(200, f'<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                            f'<UploadId>{uuid.uuid4().hex}</UploadId></InitiateMultipartUploadResult>')
+        elif 'uploadId' in query:
+            self.server.count(0, objects=1)
+            self._send(200, f'<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>'
+                            f'<ETag>"{uuid.uuid4().hex}-1"</ETag></CompleteMultipartUploadResult>')
+        else:
+            self._send(400, '<Error><Code>InvalidRequest</Code></Error>')
+    
+    def do_DELETE(self):
+        self._read_body()
+        self.server.count(0)
+        self._send(204)
+
+
+class LocalS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, LocalS3Handler)
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'bytes': 0, 'objects': 0}
+    
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def count(self, size, objects=0):
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['bytes'] += size
+            self._stats['objects'] += objects
+    
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+def start_local_s3(host='127.0.0.1', port=0, latency=0.0):
+    """Serve a LocalS3Server from a daemon thread; call shutdown() to stop it."""
+    server = LocalS3Server((host, port), latency)
+    thread = threading.Thread(target=server.serve_forever, name='nexdb-local-s3', daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a local S3 stand-in.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds slept per upload request.')
+    args = parser.parse_args()
+    server = LocalS3Server((args.host, args.port), args.latency)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
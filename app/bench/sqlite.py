@@ -0,0 +1,142 @@
+"""
+NEXDB - SQLite concurrency benchmark
+
+Runs a mixed read/write workload from several processes and threads against
+a synthetic metadata store, once per engine profile, and reports throughput,
+latency and lock errors so the tuned profile can be compared with the
+driver defaults.
+"""
+
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.bench.plans import build_dataset
+from app.models.user import User
+from app.models.database_server import DatabaseServer
+from app.models.backup import Backup
+from app.sqlite import create_sqlite_engine
+
+PROFILES = ('default', 'tuned')
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _read(conn, rng, sizes):
+    """Page-like read: a project's servers and a database's latest backups."""
+    conn.execute(db.select(DatabaseServer.__table__).
+                 where(DatabaseServer.project_id == rng.randint(1, sizes['projects']))).all()
+    conn.execute(db.select(Backup.__table__).
+                 where(Backup.database_id == rng.randint(1, sizes['databases'])).
+                 order_by(Backup.created_at.desc()).limit(20)).all()
+
+
+def _write(conn, rng, sizes):
+    """Typical small write: record a backup, or touch a user row."""
+    if rng.random() < 0.5:
+        conn.execute(Backup.__table__.insert().values(
+            filename='bench.sql.gz', status='pending', location='local',
+            created_at=datetime.utcnow(), database_id=rng.randint(1, sizes['databases'])
+        ))
+    else:
+        conn.execute(User.__table__.update().
+                     where(User.id == rng.randint(1, sizes['users'])).
+                     values(last_login_at=datetime.utcnow()))
+
+
+def _thread_loop(engine, sizes, write_ratio, deadline, seed, stats):
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        is_write = rng.random() < write_ratio
+        kind = 'write' if is_write else 'read'
+        began = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                (_write if is_write else _read)(conn, rng, sizes)
+        except OperationalError:
+            stats['errors'] += 1
+            continue
+        stats[kind].append(time.perf_counter() - began)
+
+
+def _process(uri, profile, config, sizes, threads, write_ratio, seconds, seed, start, results):
+    engine = create_sqlite_engine(uri, config, tuned=(profile == 'tuned'))
+    start.wait()
+    deadline = time.monotonic() + seconds
+    thread_stats = [{'read': [], 'write': [], 'errors': 0} for _ in range(threads)]
+    workers = [
+        threading.Thread(target=_thread_loop,
+                         args=(engine, sizes, write_ratio, deadline, seed * 1000 + i, thread_stats[i]))
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    engine.dispose()
+    results.put({
+        'read': [t for stats in thread_stats for t in stats['read']],
+        'write': [t for stats in thread_stats for t in stats['write']],
+        'errors': sum(stats['errors'] for stats in thread_stats)
+    })
+
+
+def run_profile(profile, config=None, processes=4, threads=4, write_ratio=0.2, seconds=10, scale=0.1):
+    """Benchmark one engine profile on a fresh synthetic database.
+    
+    The tuned profile uses the SQLite settings of config, by default the
+    current application's.
+    """
+    config = dict(current_app.config if config is None else config)
+    with tempfile.TemporaryDirectory(prefix='nexdb-sqlite-bench-') as scratch:
+        uri = f"sqlite:///{os.path.join(scratch, 'bench.sqlite')}"
+        setup_engine = create_sqlite_engine(uri, config, tuned=(profile == 'tuned'))
+        sizes = build_dataset(setup_engine, scale=scale)
+        setup_engine.dispose()
+        
+        start = multiprocessing.Barrier(processes)
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=_process,
+                                    args=(uri, profile, config, sizes, threads, write_ratio,
+                                          seconds, i + 1, start, results))
+            for i in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        collected = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+    
+    reads = [t for result in collected for t in result['read']]
+    writes = [t for result in collected for t in result['write']]
+    return {
+        'profile': profile,
+        'processes': processes,
+        'threads': threads,
+        'write_ratio': write_ratio,
+        'seconds': seconds,
+        'reads_per_second': len(reads) / seconds,
+        'writes_per_second': len(writes) / seconds,
+        'read_p50_ms': _percentile(reads, 0.5) * 1000,
+        'read_p99_ms': _percentile(reads, 0.99) * 1000,
+        'write_p50_ms': _percentile(writes, 0.5) * 1000,
+        'write_p99_ms': _percentile(writes, 0.99) * 1000,
+        'lock_errors': sum(result['errors'] for result in collected)
+    }
+
+
+def run_sqlite_benchmark(config=None, profiles=PROFILES, **options):
+    """Benchmark each profile with the same workload and return their results."""
+    return [run_profile(profile, config, **options) for profile in profiles]
@@ -0,0 +1,73 @@
+"""
+NEXDB - Startup benchmark
+
+Measures, in fresh interpreter processes, how long importing the app package,
+running create_app and serving the first request take, and which heavy
+optional dependencies got loaded along the way.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that startup must not import; they load on first use
+LAZY_MODULES = (
+    'boto3',
+    'alembic',
+    'pymysql',
+    'psycopg2',
+    'pyarrow',
+    'cryptography.fernet',
+)
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[2]).status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - started) * 1000,
+    'status': status,
+    'modules': len(sys.modules),
+    'lazy_loaded': [name for name in sys.argv[3].split(',') if name in sys.modules],
+}))
+"""
+
+
+def measure_once(config_name, path, root):
+    """Run one cold start in a subprocess and return its timings."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    # The benchmark must not run scheduled jobs against the configured database
+    env['START_BACKGROUND_SERVICES'] = 'false'
+    output = subprocess.run(
+        [sys.executable, '-c', _CHILD, config_name, path, ','.join(LAZY_MODULES)],
+        cwd=root, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_startup_benchmark(config_name='default', path='/static/js/app.js', runs=5, root=None):
+    """Measure cold starts runs times and return median timings."""
+    root = root or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    samples = [measure_once(config_name, path, root) for _ in range(runs)]
+    # A first request that fails measures an error page, not a started app
+    statuses = sorted(set(sample['status'] for sample in samples) - {200})
+    if statuses:
+        raise RuntimeError(f"The first request to {path} answered {', '.join(map(str, statuses))}, not 200")
+    result = {
+        key: statistics.median(sample[key] for sample in samples)
+        for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms', 'modules')
+    }
+    result['runs'] = runs
+    result['lazy_loaded'] = sorted(set(name for sample in samples for name in sample['lazy_loaded']))
+    return result
@@ -0,0 +1,154 @@
+"""
+NEXDB - In-process caches
+"""
+
+import os
+import threading
+import time
+
+# All caches created through get_cache, by name
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class TTLCache:
+    """Thread-safe in-process cache with per-entry expiry and hit/miss counters."""
+    
+    def __init__(self, name, ttl, maxsize=10000):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Return a cached value, or default if it is missing or expired."""
+        entry = self._data.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return default
+    
+    def set(self, key, value, ttl=None):
+        """Store a value for ttl seconds (the cache default if not given)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                self._evict()
+            self._data[key] = (value, expires_at)
+    
+    def get_or_load(self, key, loader):
+        """Return a cached value, calling loader() and caching its result on a miss."""
+        entry = self._data.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        value = loader()
+        self.set(key, value)
+        return value
+    
+    def invalidate(self, key):
+        """Drop a single entry."""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+    
+    def reset(self):
+        """Drop all entries and counters and replace the lock.
+        
+        Used in a freshly forked worker, where the inherited lock may have been
+        held by a thread that does not exist in the child.
+        """
+        self._lock = threading.Lock()
+        self._data = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def stats(self):
+        """Return size and hit/miss counters for monitoring."""
+        return {
+            'name': self.name,
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+    
+    def _evict(self):
+        """Make room for one entry: drop expired entries, then the oldest one."""
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+        if len(self._data) >= self.maxsize:
+            del self._data[next(iter(self._data))]
+
+
+class SharedGeneration:
+    """Invalidation stamp shared by all processes on a host.
+    
+    Bumping the generation touches a file; other worker processes notice the
+    changed modification time with a single stat() call and drop their caches.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._seen = None
+    
+    def current(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+    
+    def bump(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a'):
+            pass
+        now = time.time_ns()
+        os.utime(self.path, ns=(now, now))
+        # Our own bump is not a change we need to react to
+        self._seen = self.current()
+    
+    def changed(self):
+        """Return True if the generation moved since the last call."""
+        current = self.current()
+        if current != self._seen:
+            first_check = self._seen is None
+            self._seen = current
+            return not first_check
+        return False
+
+
+def get_cache(name, ttl, maxsize=10000):
+    """Return the named cache, creating it on first use."""
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(name, TTLCache(name, ttl, maxsize))
+    return cache
+
+
+def cache_stats():
+    """Return statistics for every registered cache."""
+    return [cache.stats() for cache in list(_caches.values())]
+
+
+def clear_all_caches():
+    """Drop the contents of every registered cache."""
+    for cache in list(_caches.values()):
+        cache.clear()
+
+
+def reset_caches_after_fork():
+    """Give a forked worker empty caches with fresh locks."""
+    global _caches_lock
+    _caches_lock = threading.Lock()
+    for cache in list(_caches.values()):
+        cache.reset()
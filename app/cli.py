@@ -3,6 +3,7 @@ NEXDB - CLI commands
 """
 
 import click
+import json
 import os
 from flask.cli import with_appcontext
 from datetime import datetime
@@ -58,6 +59,111 @@ def register_cli_commands(app):
         backup_all_databases()
         click.echo('Backup completed.')
     
+    @app.cli.command('import-csv')
+    @click.argument('server_id', type=int)
+    @click.argument('database')
+    @click.argument('table')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--batch-size', type=int, default=None, help='Rows per commit.')
+    @click.option('--columns', default=None, help='Comma-separated target columns.')
+    @click.option('--no-header', is_flag=True, help='The file has no header row.')
+    @click.option('--gzip', 'force_gzip', is_flag=True, help='The file is gzip-compressed.')
+    @with_appcontext
+    def import_csv_command(server_id, database, table, path, batch_size, columns, no_header, force_gzip):
+        """Stream a CSV file into a table on a database server."""
+        from app.models.database_server import DatabaseServer
+        from app.database.utils import import_csv, guess_compression
+
+        server = DatabaseServer.query.get(server_id)
+        if not server:
+            click.echo(f'Database server {server_id} not found.')
+            return
+
+        total_bytes = os.path.getsize(path)
+
+        def report(rows, bytes_read):
+            percent = (bytes_read / total_bytes * 100) if total_bytes else 100
+            click.echo(f'{rows} rows committed ({percent:.1f}% of file read)')
+
+        with open(path, 'rb') as f:
+            result = import_csv(
+                server,
+                database,
+                table,
+                f,
+                columns=columns.split(',') if columns else None,
+                header=not no_header,
+                compression='gzip' if force_gzip else guess_compression(path),
+                batch_size=batch_size,
+                progress=report
+            )
+
+        if result['success']:
+            click.echo(f"Imported {result['rows']} rows in {result['batches']} batches.")
+        else:
+            click.echo(f"Import failed: {result['message']}")
+
+    @app.cli.command('rotate-credentials')
+    @click.option('--batch-size', type=int, default=500, help='Rows per transaction.')
+    @click.pass_context
+    @with_appcontext
+    def rotate_credentials_command(ctx, batch_size):
+        """Re-encrypt stored credentials with the primary encryption key."""
+        from app.credentials import rotate_credentials
+        results = rotate_credentials(batch_size=batch_size)
+        failed = False
+        for table, counts in results.items():
+            click.echo(f"{table}: re-encrypted {counts['rotated']} of {counts['checked']} credentials.")
+            if counts['failed']:
+                click.echo(f"{table}: no key decrypts the credentials of ids "
+                           f"{', '.join(map(str, counts['failed']))}; they were skipped.")
+                failed = True
+        # Dropping the old key is only safe once every credential rotated
+        if failed:
+            ctx.exit(1)
+    
+    @app.cli.command('sync-inventory')
+    @click.option('--server-id', 'server_ids', type=int, multiple=True,
+                  help='Server to sync (repeatable); all servers by default.')
+    @click.option('--workers', type=int, default=None, help='Servers synced concurrently.')
+    @with_appcontext
+    def sync_inventory_command(server_ids, workers):
+        """Discover the databases, users and grants of database servers."""
+        from flask import current_app
+        from app.database.inventory import sync_fleet
+        results = sync_fleet(current_app._get_current_object(), list(server_ids) or None, workers)
+        for result in results:
+            if result['success']:
+                click.echo(f"Server {result['server_id']}: {result['databases']} databases, "
+                           f"{result['users']} users; +{result['databases_added']}/"
+                           f"-{result['databases_removed']} databases, +{result['users_added']}/"
+                           f"~{result['users_updated']}/-{result['users_removed']} users "
+                           f"in {result['seconds']}s.")
+                if result['databases_missing']:
+                    click.echo(f"  {result['databases_missing']} missing databases kept for their backups.")
+            else:
+                click.echo(f"Server {result['server_id']}: {result['message']}")
+    
+    @app.cli.command('firewall-sync')
+    @click.option('--dry-run', is_flag=True, help='Only print the changes that would be made.')
+    @with_appcontext
+    def firewall_sync_command(dry_run):
+        """Apply the stored firewall rules to UFW."""
+        from app.firewall.sync import sync_firewall
+        result = sync_firewall(dry_run=dry_run)
+        if 'added' not in result:
+            click.echo(f"Firewall sync failed: {result['message']}")
+            return
+        for rule in result['deleted']:
+            click.echo(f"- [{rule['number']}] {rule['to']} from {rule['source']}")
+        for rule in result['added']:
+            click.echo(f"+ {rule['port']}/{rule['protocol']} from {rule['source']}")
+        verb = 'Would apply' if dry_run else 'Applied'
+        click.echo(f"{verb} {len(result['added'])} additions and {len(result['deleted'])} deletions "
+                   f"({result['unchanged']} rules unchanged) in {result['seconds']}s.")
+        if not result['success']:
+            click.echo(f"Errors: {result['message']}")
+    
     @app.cli.command('test-s3')
     @with_appcontext
     def test_s3():
@@ -69,6 +175,406 @@ def register_cli_commands(app):
         else:
             click.echo('S3 connection failed. Please check your credentials.')
     
+    @app.cli.group('profile')
+    def profile():
+        """Take and manage sampling profiles."""
+    
+    @profile.command('backup-all')
+    @click.option('--interval', type=float, default=None, help='Seconds between samples.')
+    @with_appcontext
+    def profile_backup_all(interval):
+        """Profile a run of every scheduled backup, end to end."""
+        from flask import current_app
+        from app.backup.utils import backup_all_databases
+        from app.profiling.triggers import profile_call
+        from app.profiling.store import profile_path
+        app = current_app._get_current_object()
+        if interval:
+            app.config['PROFILE_SAMPLE_INTERVAL'] = interval
+        result, metadata = profile_call(app, 'cli', 'backup_all_databases', backup_all_databases)
+        if result['success']:
+            failed = sum(1 for item in result['results'] if not item['result'].get('success'))
+            click.echo(f"Backed up {len(result['results'])} databases ({failed} failed).")
+        else:
+            click.echo(f"Backup failed: {result['message']}")
+        click.echo(f"Profile {metadata['id']}: {metadata['samples']} samples over {metadata['seconds']}s.")
+        for item in metadata['top_functions']:
+            click.echo(f"  {item['share']:7.2%}  {item['function']}")
+        click.echo(f"Flamegraph:       {profile_path(app, metadata['id'], 'svg')}")
+        click.echo(f"Collapsed stacks: {profile_path(app, metadata['id'], 'collapsed')}")
+    
+    @profile.command('token')
+    @click.argument('username')
+    @with_appcontext
+    def profile_token(username):
+        """Issue a request profiling token for an admin."""
+        from flask import current_app
+        from app.models.user import User
+        from app.profiling.triggers import issue_profile_token, PROFILE_HEADER
+        user = User.query.filter_by(username=username).first()
+        if not user or not user.active or not user.has_role('admin'):
+            click.echo(f'{username} is not an active admin.')
+            return
+        click.echo(f"{PROFILE_HEADER}: {issue_profile_token(current_app, user.id)}")
+    
+    @profile.command('list')
+    @with_appcontext
+    def profile_list():
+        """List the stored profiles, newest first."""
+        from flask import current_app
+        from app.profiling.store import list_profiles
+        for item in list_profiles(current_app):
+            click.echo(f"{item['id']}  {item['kind']:<7} {item['seconds']:8.3f}s "
+                       f"{item['samples']:7d} samples  {item['name']}")
+    
+    @app.cli.group('bench')
+    def bench():
+        """Run performance benchmarks."""
+    
+    @bench.command('ratelimit')
+    @click.option('--storage', 'uri', default=None,
+                  help='limits storage URI (defaults to RATELIMIT_STORAGE_URI).')
+    @click.option('--strategy', type=click.Choice(['fixed-window', 'moving-window']),
+                  default=None, help='Limiting strategy (defaults to RATELIMIT_STRATEGY).')
+    @click.option('--processes', type=int, default=4, help='Concurrent worker processes.')
+    @click.option('--iterations', type=int, default=2000, help='Hits per process.')
+    @click.option('--limit', type=int, default=1000, help='Allowed hits on the shared key.')
+    @with_appcontext
+    def bench_ratelimit(uri, strategy, processes, iterations, limit):
+        """Measure limiter overhead per request and cross-process correctness."""
+        from flask import current_app
+        from app.bench.ratelimit import run_ratelimit_benchmark
+        uri = uri or current_app.config.get('RATELIMIT_STORAGE_URI', 'memory://')
+        strategy = strategy or current_app.config.get('RATELIMIT_STRATEGY', 'moving-window')
+        result = run_ratelimit_benchmark(uri, strategy, processes, iterations, limit)
+        click.echo(f"{result['storage']} ({result['strategy']}, {result['processes']} processes)")
+        click.echo(f"  per hit: mean {result['mean_us']:.1f}us, p50 {result['p50_us']:.1f}us, "
+                   f"p99 {result['p99_us']:.1f}us, {result['hits_per_second']:.0f} hits/s")
+        status = 'enforced' if result['correct'] else 'NOT enforced'
+        click.echo(f"  allowed {result['allowed']} of {result['hits']} hits for a limit of "
+                   f"{result['limit']}: limit {status} across processes")
+    
+    @bench.command('plans')
+    @click.option('--database-uri', default=None,
+                  help='Empty scratch database to use (defaults to a temporary SQLite file).')
+    @click.option('--scale', type=float, default=1.0, help='Synthetic dataset size multiplier.')
+    @click.option('--verbose', is_flag=True, help='Print every query plan.')
+    @click.pass_context
+    @with_appcontext
+    def bench_plans(ctx, database_uri, scale, verbose):
+        """Check that key queries use indexes on a large synthetic dataset."""
+        from app.bench.plans import run_plan_checks
+        report = run_plan_checks(database_uri, scale=scale)
+        rows = sum(report['dataset'].values())
+        click.echo(f'Synthetic dataset: {rows} rows')
+        failures = 0
+        for result in report['results']:
+            click.echo(f"{'ok  ' if result['passed'] else 'FAIL'} {result['name']}")
+            for problem in result['problems']:
+                click.echo(f'       {problem}')
+            if verbose:
+                for line in result['plan'] if isinstance(result['plan'], list) else [result['plan']]:
+                    click.echo(f'       | {line}')
+            failures += not result['passed']
+        if failures:
+            click.echo(f'{failures} query plan check(s) failed.')
+            ctx.exit(1)
+        click.echo('All query plans use indexes.')
+    
+    @bench.command('sqlite')
+    @click.option('--profile', type=click.Choice(['default', 'tuned', 'both']), default='both',
+                  help='Engine profile to measure.')
+    @click.option('--processes', type=int, default=4, help='Worker processes.')
+    @click.option('--threads', type=int, default=4, help='Threads per process.')
+    @click.option('--write-ratio', type=float, default=0.2, help='Fraction of operations that write.')
+    @click.option('--seconds', type=int, default=10, help='Duration of each run.')
+    @click.option('--scale', type=float, default=0.1, help='Synthetic dataset size multiplier.')
+    @with_appcontext
+    def bench_sqlite(profile, processes, threads, write_ratio, seconds, scale):
+        """Measure the read/write mix a SQLite metadata store sustains."""
+        from flask import current_app
+        from app.bench.sqlite import run_sqlite_benchmark, PROFILES
+        profiles = PROFILES if profile == 'both' else (profile,)
+        results = run_sqlite_benchmark(current_app.config, profiles, processes=processes,
+                                       threads=threads, write_ratio=write_ratio,
+                                       seconds=seconds, scale=scale)
+        for result in results:
+            click.echo(f"{result['profile']}: {result['processes']}x{result['threads']} workers, "
+                       f"{result['write_ratio']:.0%} writes")
+            click.echo(f"  reads  {result['reads_per_second']:8.0f}/s  "
+                       f"p50 {result['read_p50_ms']:.2f}ms  p99 {result['read_p99_ms']:.2f}ms")
+            click.echo(f"  writes {result['writes_per_second']:8.0f}/s  "
+                       f"p50 {result['write_p50_ms']:.2f}ms  p99 {result['write_p99_ms']:.2f}ms")
+            click.echo(f"  lock errors: {result['lock_errors']}")
+    
+    @bench.command('startup')
+    @click.option('--runs', type=int, default=5, help='Cold starts to measure.')
+    @click.option('--path', default='/static/js/app.js', help='URL of the first request.')
+    @click.option('--budget-ms', type=int, default=None,
+                  help='Fail if the median cold start exceeds this (defaults to STARTUP_BUDGET_MS).')
+    @click.pass_context
+    @with_appcontext
+    def bench_startup(ctx, runs, path, budget_ms):
+        """Measure import time, create_app time and time to first request."""
+        from flask import current_app
+        from app.bench.startup import run_startup_benchmark
+        config_name = os.getenv('FLASK_CONFIG', 'default')
+        try:
+            result = run_startup_benchmark(config_name, path, runs)
+        except RuntimeError as e:
+            click.echo(str(e))
+            ctx.exit(1)
+        budget_ms = budget_ms or current_app.config.get('STARTUP_BUDGET_MS', 3000)
+        click.echo(f"import {result['import_ms']:.0f}ms, create_app {result['create_app_ms']:.0f}ms, "
+                   f"first request {result['first_request_ms']:.0f}ms "
+                   f"(total {result['total_ms']:.0f}ms, {result['modules']:.0f} modules, "
+                   f"median of {runs})")
+        failed = False
+        if result['lazy_loaded']:
+            click.echo(f"Startup imported lazy dependencies: {', '.join(result['lazy_loaded'])}")
+            failed = True
+        if result['total_ms'] > budget_ms:
+            click.echo(f"Startup exceeded the {budget_ms}ms budget.")
+            failed = True
+        if failed:
+            ctx.exit(1)
+    
+    @bench.command('memory')
+    @click.option('--workers', type=int, default=3, help='Gunicorn workers to start.')
+    @click.option('--requests', type=int, default=300, help='Warm-up requests per run.')
+    @click.option('--path', default='/login', help='URL requested during warm-up.')
+    def bench_memory(workers, requests, path):
+        """Compare per-worker memory with and without gunicorn --preload."""
+        from app.bench.memory import run_memory_benchmark
+        config_name = os.getenv('FLASK_CONFIG', 'production')
+        results = run_memory_benchmark(workers, requests, path, config_name)
+        mib = 1024 * 1024
+        for result in results:
+            click.echo(f"{result['mode']}: per worker RSS {result['worker_rss'] / mib:.1f} MiB, "
+                       f"PSS {result['worker_pss'] / mib:.1f} MiB, "
+                       f"USS {result['worker_uss'] / mib:.1f} MiB; "
+                       f"total PSS with master {result['total_pss'] / mib:.1f} MiB")
+        by_mode = {result['mode']: result for result in results}
+        if len(by_mode) == 2:
+            saved = by_mode['no-preload']['worker_uss'] - by_mode['preload']['worker_uss']
+            total = by_mode['no-preload']['total_pss'] - by_mode['preload']['total_pss']
+            click.echo(f"Preloading saves {saved / mib:.1f} MiB of unique memory per worker "
+                       f"({total / mib:.1f} MiB in total for {workers} workers).")
+    
+    @bench.command('firewall')
+    @click.option('--clients', type=int, default=200, help='Allowed addresses per server.')
+    @click.option('--changed', type=int, default=20, help='Addresses replaced per server.')
+    @click.option('--servers', type=int, default=2, help='Servers (ports) with rules.')
+    @click.option('--latency', type=float, default=0.05, help='Simulated seconds per ufw command.')
+    def bench_firewall(clients, changed, servers, latency):
+        """Compare per-rule ufw calls with the diffed, batched firewall sync."""
+        from app.bench.firewall import run_firewall_benchmark
+        report = run_firewall_benchmark(clients, changed, servers, latency)
+        click.echo(f"{report['rules']} rules, {report['changes']} changes, "
+                   f"{report['latency'] * 1000:.0f}ms per ufw command")
+        for result in report['results']:
+            click.echo(f"  {result['strategy']:<9} {result['commands']:5d} commands "
+                       f"{result['seconds']:7.2f}s{'' if result['correct'] else '  WRONG RESULT'}")
+    
+    @bench.command('metrics')
+    @click.option('--path', default='/login', help='URL of the reference request.')
+    @click.option('--iterations', type=int, default=20000, help='Hook calls per timing round.')
+    @click.pass_context
+    def bench_metrics(ctx, path, iterations):
+        """Measure what recording Prometheus metrics adds per request and per query."""
+        from app.bench.metrics import run_metrics_benchmark
+        config_name = os.getenv('FLASK_CONFIG', 'default')
+        try:
+            report = run_metrics_benchmark(config_name, path, iterations)
+        except RuntimeError as e:
+            click.echo(str(e))
+            ctx.exit(1)
+        click.echo(f"Request to {path} without metrics: {report['request_us']:.0f}us "
+                   f"(HTTP {report['status']})")
+        for result in report['modes']:
+            click.echo(f"  {result['mode']:<13} request hooks {result['request_hooks_us']:5.2f}us "
+                       f"({result['request_share']:.2%} of the request), "
+                       f"query hooks {result['query_hooks_us']:5.2f}us")
+    
+    @bench.command('endpoints')
+    @click.option('--iterations', type=int, default=50, help='Timed requests per endpoint.')
+    @click.option('--label', default=None, help='Name stored with the run, e.g. a branch name.')
+    @click.option('--output-dir', default=None,
+                  help='Directory of saved runs (defaults to instance/bench/endpoints).')
+    @click.option('--compare', 'compare', default=None,
+                  help='Saved run to compare with (defaults to the latest one).')
+    @click.pass_context
+    def bench_endpoints(ctx, iterations, label, output_dir, compare):
+        """Time the project list, project detail and dashboard on the current data."""
+        from flask import current_app
+        from app.bench.endpoints import run_endpoint_benchmark, EndpointError
+        try:
+            report = run_endpoint_benchmark(current_app._get_current_object(), iterations, label,
+                                            output_dir, compare)
+        except EndpointError as e:
+            click.echo(f'{e}; nothing was saved.')
+            ctx.exit(1)
+        click.echo(', '.join(f'{rows} {table}' for table, rows in report['dataset'].items()))
+        for result in report['results']:
+            change = f"  {result['change']:+.1%}" if 'change' in result else ''
+            click.echo(f"  {result['name']:<26} median {result['median_ms']:8.2f}ms  "
+                       f"p95 {result['p95_ms']:8.2f}ms  {result['queries']:3d} queries  "
+                       f"{result['bytes']:8d} bytes  HTTP {result['status']}{change}")
+        if report['baseline']:
+            click.echo(f"Compared with {report['baseline']['path']}")
+        click.echo(f"Saved to {report['path']}")
+    
+    @bench.command('backup')
+    @click.option('--size', type=int, default=256, help='Size of the synthetic dump in MiB.')
+    @click.option('--compressibility', type=float, default=0.7,
+                  help='Share of each dump line that compresses well (0 to 1).')
+    @click.option('--modes', default='tempfile,streaming', help='Pipelines: tempfile, streaming.')
+    @click.option('--codecs', default='none,gzip-1,gzip-6',
+                  help='Codecs: none, gzip-N, brotli-N, zstd-N, lzma-N.')
+    @click.option('--part-sizes', default='8,32', help='Comma-separated multipart part sizes in MiB.')
+    @click.option('--concurrency', default='1,4', help='Comma-separated parts uploaded at once.')
+    @click.option('--s3-latency', type=float, default=0.02,
+                  help='Seconds the S3 stand-in waits per upload request.')
+    @click.option('--output', type=click.Path(dir_okay=False), default=None,
+                  help='Write the results to this JSON file.')
+    @click.option('--json', 'as_json', is_flag=True, help='Print the results as JSON.')
+    @click.pass_context
+    def bench_backup(ctx, size, compressibility, modes, codecs, part_sizes, concurrency,
+                     s3_latency, output, as_json):
+        """Measure backup pipeline throughput, CPU and memory with a fake dump and S3."""
+        import subprocess
+        from app.bench.backup import run_backup_benchmark, MIB
+        
+        def split(value, cast=str):
+            return [cast(item.strip()) for item in value.split(',') if item.strip()]
+        
+        try:
+            report = run_backup_benchmark(
+                os.getenv('FLASK_CONFIG', 'production'), size * MIB, compressibility,
+                split(modes), split(codecs), [int(float(item) * MIB) for item in split(part_sizes)],
+                split(concurrency, int), s3_latency
+            )
+        except subprocess.CalledProcessError as e:
+            click.echo(f'A pipeline run failed:\n{e.stderr[-2000:]}')
+            ctx.exit(1)
+        if output:
+            with open(output, 'w') as f:
+                json.dump(report, f, indent=2)
+        if as_json:
+            click.echo(json.dumps(report, indent=2))
+            return
+        
+        click.echo(f"{size} MiB dump, compressibility {compressibility}, "
+                   f"{s3_latency * 1000:.0f}ms per S3 request, {report['cpus']} CPU(s)")
+        for result in report['results']:
+            click.echo(f"  {result['mode']:<9} {result['codec']:<8} "
+                       f"{result['part_size'] // MIB:3d} MiB x{result['concurrency']:<2} "
+                       f"{result['mb_per_second']:7.1f} MB/s  CPU {result['cpu_percent']:5.1f}%  "
+                       f"peak {result['peak_memory_bytes'] / MIB:6.1f} MiB  "
+                       f"stored {result['stored_bytes'] / MIB:7.1f} MiB")
+        if report['skipped_codecs']:
+            click.echo(f"Skipped (package not installed): {', '.join(report['skipped_codecs'])}")
+        if output:
+            click.echo(f'Results written to {output}')
+    
+    @app.cli.command('loadtest')
+    @click.option('--url', default=None,
+                  help='Running instance to load (by default gunicorn is started per worker count).')
+    @click.option('--workers', default='1,2,4', help='Comma-separated gunicorn worker counts.')
+    @click.option('--threads', type=int, default=1, help='Threads per gunicorn worker.')
+    @click.option('--clients', type=int, default=50, help='Concurrent clients.')
+    @click.option('--duration', type=float, default=30, help='Measured seconds per run.')
+    @click.option('--warmup', type=float, default=3, help='Unmeasured seconds before each run.')
+    @click.option('--mix', default='token=1,projects=10,server=10,backup=1',
+                  help='Weights of the token, projects, server and backup operations.')
+    @click.option('--users', type=int, default=20, help='Accounts the clients log in with.')
+    @click.option('--password', default='benchmark', help='Password of those accounts.')
+    @click.option('--server-latency', type=float, default=0.005,
+                  help='Seconds per round trip to a fake database server.')
+    @click.option('--export-rows', type=int, default=1000, help='Rows per fake backup export.')
+    @click.option('--timeout', type=float, default=30, help='Seconds before a request fails.')
+    @click.option('--output', type=click.Path(dir_okay=False), default=None,
+                  help='Write the results to this JSON file.')
+    @click.pass_context
+    def loadtest(ctx, url, workers, threads, clients, duration, warmup, mix, users, password,
+                 server_latency, export_rows, timeout, output):
+        """Drive a weighted mix of API calls and report throughput and latency."""
+        from flask import current_app
+        from app.bench.loadtest import load_targets, parse_mix, run_load, run_loadtest
+        try:
+            weights = parse_mix(mix)
+            worker_counts = [int(count) for count in workers.split(',') if count.strip()]
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        targets = load_targets(users)
+        db.session.remove()
+        load = dict(targets=targets, password=password, mix=weights, clients=clients,
+                    duration=duration, warmup=warmup, timeout=timeout)
+        try:
+            if url:
+                results = [run_load(url, **load)]
+            else:
+                config_name = os.getenv('FLASK_CONFIG', 'production')
+                results = run_loadtest(current_app.config['SQLALCHEMY_DATABASE_URI'], worker_counts,
+                                       threads, config_name, server_latency, export_rows, **load)
+        except RuntimeError as e:
+            click.echo(str(e))
+            ctx.exit(1)
+        
+        for result in results:
+            where = f"{result['workers']} worker(s) x {result['threads']} thread(s)" \
+                if 'workers' in result else result['url']
+            click.echo(f"{where}, {result['clients']} clients: {result['throughput']:.1f} req/s, "
+                       f"p50 {result['p50_ms']:.1f}ms p95 {result['p95_ms']:.1f}ms "
+                       f"p99 {result['p99_ms']:.1f}ms, errors {result['error_rate']:.2%}")
+            for name, stats in result['operations'].items():
+                click.echo(f"  {name:<9} {stats['requests']:7d} requests {stats['throughput']:8.1f}/s  "
+                           f"p50 {stats['p50_ms']:7.1f}ms p95 {stats['p95_ms']:7.1f}ms "
+                           f"p99 {stats['p99_ms']:7.1f}ms  errors {stats['error_rate']:.2%}")
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=2)
+            click.echo(f'Results written to {output}')
+    
+    @app.cli.command('generate-fleet')
+    @click.option('--scale', type=float, default=1.0,
+                  help='Multiplier of the default fleet (10k users, 50k projects, ...).')
+    @click.option('--users', type=int, default=None, help='Users to create.')
+    @click.option('--projects', type=int, default=None, help='Projects to create.')
+    @click.option('--servers', type=int, default=None, help='Database servers to create.')
+    @click.option('--databases', type=int, default=None, help='Databases to create.')
+    @click.option('--backups', type=int, default=None, help='Backups to create.')
+    @click.option('--seed', type=int, default=0, help='Random seed.')
+    @click.option('--password', default='benchmark', help='Password of every user.')
+    @click.pass_context
+    @with_appcontext
+    def generate_fleet(ctx, scale, users, projects, servers, databases, backups, seed, password):
+        """Fill an empty database with a large synthetic fleet for benchmarks."""
+        from app import bcrypt
+        from app.bench.fleet import generate_fleet as generate, scaled_sizes
+        from app.credentials import encrypt_secret
+        from app.models.user import User
+        
+        db.create_all()
+        if db.session.scalar(db.select(db.func.count()).select_from(User)):
+            click.echo('The database already has users; generate a fleet into an empty one.')
+            ctx.exit(1)
+        sizes = scaled_sizes(scale, users=users, projects=projects, database_servers=servers,
+                             databases=databases, database_users=databases, backups=backups)
+        db.session.remove()
+        
+        def progress(table, rows, seconds):
+            click.echo(f'  {table:<18} {rows:9d} rows in {seconds:6.1f}s '
+                       f'({rows / max(seconds, 1e-9):,.0f} rows/s)')
+        
+        report = generate(db.engine, sizes, seed=seed,
+                          password_hash=bcrypt.generate_password_hash(password).decode('utf-8'),
+                          encrypted_password=encrypt_secret('benchmark'), progress=progress)
+        rows = sum(table['rows'] for table in report.values())
+        seconds = sum(table['seconds'] for table in report.values())
+        click.echo(f'Fleet created: {rows} rows in {seconds:.1f}s. '
+                   f'Every user can log in with the password "{password}".')
+    
     @app.cli.command('create-sample-data')
     @with_appcontext
     def create_sample_data():
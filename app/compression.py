@@ -0,0 +1,102 @@
+"""
+NEXDB - Response compression
+
+Compresses HTML, JSON and other text responses above COMPRESS_MIN_SIZE with
+brotli when the client accepts it and the brotli package is installed, and
+with gzip otherwise. Static files are compressed once per version and kept
+in memory.
+"""
+
+import gzip
+from flask import current_app, request
+from app.cache import get_cache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+}
+
+
+def choose_encoding(accept_encodings):
+    """Pick the best supported encoding from an Accept-Encoding header."""
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, static=False):
+    """Compress bytes; static assets use the slowest, smallest settings."""
+    config = current_app.config
+    if encoding == 'br':
+        quality = 11 if static else config.get('COMPRESS_BROTLI_QUALITY', 5)
+        return brotli.compress(data, quality=quality)
+    level = 9 if static else config.get('COMPRESS_GZIP_LEVEL', 6)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _static_cache():
+    return get_cache('compressed_static', current_app.config.get('STATIC_MAX_AGE', 31536000),
+                     maxsize=256)
+
+
+def compress_response(response):
+    """after_request hook compressing eligible responses."""
+    # Generated streams (exports) are passed through untouched
+    if (response.status_code != 200
+            or (response.is_streamed and not response.direct_passthrough)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    is_static = request.endpoint == 'static'
+    if response.direct_passthrough and not is_static:
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+    
+    if is_static:
+        # Read the file once; the compressed copy is reused until it changes
+        response.direct_passthrough = False
+        etag, _ = response.get_etag()
+        key = (request.path, etag, encoding)
+        data = _static_cache().get(key)
+        if data is None:
+            data = response.get_data()
+            if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 500):
+                return response
+            data = compress(data, encoding, static=True)
+            _static_cache().set(key, data)
+    else:
+        data = response.get_data()
+        if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 500):
+            return response
+        data = compress(data, encoding)
+    
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The encoded body differs from the one the strong ETag describes
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Enable response compression unless COMPRESS_ENABLED is off."""
+    if app.config.get('COMPRESS_ENABLED', True):
+        app.after_request(compress_response)
@@ -0,0 +1,145 @@
+"""
+NEXDB - Credential encryption
+
+Stored database passwords are Fernet tokens. Ciphers are built once per key
+set and decrypted secrets are cached in process memory for a short TTL, so
+reading ``server.password`` repeatedly does not repeat the key derivation
+and decryption work.
+
+Keys are configured with ``ENCRYPTION_KEYS`` (comma-separated, newest first).
+The first key encrypts; every key can decrypt. To rotate without downtime:
+
+1. Deploy with the new key appended (``old,new``) so every worker can read it.
+2. Deploy with the new key first (``new,old``) so new secrets use it.
+3. Run ``flask rotate-credentials`` to re-encrypt stored secrets in batches.
+4. Drop the old key from ``ENCRYPTION_KEYS``.
+"""
+
+import logging
+import threading
+from flask import current_app
+from app import db
+from app.cache import get_cache
+
+_ciphers = {}
+_ciphers_lock = threading.Lock()
+
+
+def _keys():
+    keys = current_app.config.get('ENCRYPTION_KEYS') or [current_app.config['ENCRYPTION_KEY']]
+    return tuple(keys)
+
+
+def get_cipher(keys=None):
+    """Return the MultiFernet for a key set, building it on first use."""
+    keys = keys or _keys()
+    cipher = _ciphers.get(keys)
+    if cipher is None:
+        with _ciphers_lock:
+            cipher = _ciphers.get(keys)
+            if cipher is None:
+                # Imported here so startup does not pay for cryptography
+                from cryptography.fernet import Fernet, MultiFernet
+                cipher = MultiFernet([Fernet(key.encode()) for key in keys])
+                _ciphers[keys] = cipher
+    return cipher
+
+
+def _cache():
+    return get_cache('credentials', current_app.config.get('CREDENTIAL_CACHE_TTL', 300))
+
+
+def encrypt_secret(plaintext):
+    """Encrypt a secret with the primary key and return the token as text."""
+    token = get_cipher().encrypt(plaintext.encode()).decode()
+    _cache().set(token, plaintext)
+    return token
+
+
+def decrypt_secret(token):
+    """Return the plaintext for a stored token, decrypting only on a cache miss."""
+    if not token:
+        return None
+    return _cache().get_or_load(token, lambda: get_cipher().decrypt(token.encode()).decode())
+
+
+def is_current(token, keys=None):
+    """Check whether a token is already encrypted with the primary key."""
+    from cryptography.fernet import InvalidToken
+    keys = keys or _keys()
+    try:
+        get_cipher(keys[:1]).decrypt(token.encode())
+        return True
+    except InvalidToken:
+        return False
+
+
+def rotate_column(table, column, batch_size=500, progress=None):
+    """Re-encrypt every token in table.column with the primary key.
+    
+    Rows are processed in primary-key order, one short transaction per batch.
+    Each update only applies if the row still holds the token that was read,
+    so passwords changed concurrently are never overwritten. A token that no
+    configured key can decrypt is skipped and reported.
+    
+    Returns a dict with the number of rows checked and re-encrypted, and the
+    ids of the rows that could not be decrypted.
+    """
+    from cryptography.fernet import InvalidToken
+    keys = _keys()
+    cipher = get_cipher(keys)
+    update = (
+        table.update().
+        where(table.c.id == db.bindparam('row_id'),
+              column == db.bindparam('old_token')).
+        values({column.name: db.bindparam('new_token'),
+                # Re-encryption is not a user-visible change
+                'updated_at': table.c.updated_at})
+    )
+    checked = rotated = 0
+    failed = []
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, column).
+            where(table.c.id > last_id, column.isnot(None)).
+            order_by(table.c.id).
+            limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        checked += len(rows)
+        
+        updates = []
+        for row_id, token in rows:
+            if is_current(token, keys):
+                continue
+            try:
+                updates.append({'row_id': row_id, 'old_token': token,
+                                'new_token': cipher.rotate(token.encode()).decode()})
+            except InvalidToken:
+                failed.append(row_id)
+        
+        # One statement per row: executemany row counts are not reliable on
+        # every driver, and rows changed concurrently must not be counted
+        for params in updates:
+            rotated += db.session.execute(update, params).rowcount
+        db.session.commit()
+        if progress:
+            progress(checked, rotated)
+    if failed:
+        logging.error(f"Could not decrypt {len(failed)} credentials in {table.name}.{column.name}: "
+                      f"ids {', '.join(map(str, failed))}")
+    return {'checked': checked, 'rotated': rotated, 'failed': failed}
+
+
+def rotate_credentials(batch_size=500, progress=None):
+    """Re-encrypt all stored server and database user passwords."""
+    from app.models.database_server import DatabaseServer, DatabaseUser
+    results = {}
+    for model in (DatabaseServer, DatabaseUser):
+        table = model.__table__
+        results[table.name] = rotate_column(table, table.c.encrypted_password,
+                                            batch_size=batch_size, progress=progress)
+    return results
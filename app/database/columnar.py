@@ -0,0 +1,228 @@
+"""
+NEXDB - Columnar result encoding (Arrow IPC and Parquet)
+"""
+
+import json
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional; columnar formats are disabled without it
+    pyarrow = None
+
+# PostgreSQL type OIDs mapped to Arrow type factories
+POSTGRES_ARROW_TYPES = {
+    16: lambda: pyarrow.bool_(),
+    20: lambda: pyarrow.int64(),
+    21: lambda: pyarrow.int16(),
+    23: lambda: pyarrow.int32(),
+    26: lambda: pyarrow.int64(),
+    700: lambda: pyarrow.float32(),
+    701: lambda: pyarrow.float64(),
+    25: lambda: pyarrow.string(),
+    1042: lambda: pyarrow.string(),
+    1043: lambda: pyarrow.string(),
+    17: lambda: pyarrow.binary(),
+    1082: lambda: pyarrow.date32(),
+    1083: lambda: pyarrow.time64('us'),
+    1114: lambda: pyarrow.timestamp('us'),
+    1184: lambda: pyarrow.timestamp('us', tz='UTC'),
+}
+
+# MySQL FIELD_TYPE codes mapped to Arrow type factories
+MYSQL_ARROW_TYPES = {
+    1: lambda: pyarrow.int8(),       # TINY
+    2: lambda: pyarrow.int16(),      # SHORT
+    3: lambda: pyarrow.int32(),      # LONG
+    4: lambda: pyarrow.float32(),    # FLOAT
+    5: lambda: pyarrow.float64(),    # DOUBLE
+    7: lambda: pyarrow.timestamp('us'),  # TIMESTAMP
+    8: lambda: pyarrow.int64(),      # LONGLONG
+    9: lambda: pyarrow.int32(),      # INT24
+    10: lambda: pyarrow.date32(),    # DATE
+    12: lambda: pyarrow.timestamp('us'),  # DATETIME
+    13: lambda: pyarrow.int16(),     # YEAR
+    15: lambda: pyarrow.string(),    # VARCHAR
+    253: lambda: pyarrow.string(),   # VAR_STRING
+    254: lambda: pyarrow.string(),   # STRING
+}
+
+# MySQL integer types with the UNSIGNED flag
+MYSQL_UNSIGNED_ARROW_TYPES = {
+    1: lambda: pyarrow.uint8(),      # TINY
+    2: lambda: pyarrow.uint16(),     # SHORT
+    3: lambda: pyarrow.uint32(),     # LONG
+    8: lambda: pyarrow.uint64(),     # LONGLONG
+    9: lambda: pyarrow.uint32(),     # INT24
+}
+
+# MySQL string and blob types; with the binary character set they hold bytes
+# (BINARY, VARBINARY, BLOB), otherwise text (CHAR, VARCHAR, TEXT)
+MYSQL_STRING_TYPES = (15, 249, 250, 251, 252, 253, 254)
+
+MYSQL_UNSIGNED_FLAG = 32
+MYSQL_BINARY_CHARSET = 63
+
+# Decimal type codes, mapped to decimal128 when precision is known
+POSTGRES_NUMERIC = 1700
+MYSQL_DECIMALS = (0, 246)
+
+
+def columnar_available():
+    """Return True if the optional pyarrow dependency is installed."""
+    return pyarrow is not None
+
+
+def cursor_fields(cursor):
+    """Return the field packets of a pymysql cursor's result, or None.
+    
+    A DB-API description leaves out MySQL's column flags and character set,
+    which tell signed from unsigned integers and binary from text columns.
+    """
+    result = getattr(cursor, '_result', None)
+    return getattr(result, 'fields', None)
+
+
+def _column_type(server_type, column, field=None):
+    """Return the Arrow type for a DB-API cursor description entry.
+    
+    field is the column's pymysql field packet, when available.
+    """
+    type_code = column[1]
+    precision, scale = column[4], column[5]
+    
+    if server_type == 'postgresql':
+        if type_code == POSTGRES_NUMERIC and precision and 0 < precision <= 38:
+            return pyarrow.decimal128(precision, scale or 0)
+        factory = POSTGRES_ARROW_TYPES.get(type_code)
+    else:
+        if type_code in MYSQL_DECIMALS and precision and 0 < precision <= 38:
+            return pyarrow.decimal128(precision, scale or 0)
+        factory = MYSQL_ARROW_TYPES.get(type_code)
+        if field is not None:
+            if field.flags & MYSQL_UNSIGNED_FLAG and type_code in MYSQL_UNSIGNED_ARROW_TYPES:
+                factory = MYSQL_UNSIGNED_ARROW_TYPES[type_code]
+            elif type_code in MYSQL_STRING_TYPES and field.charsetnr == MYSQL_BINARY_CHARSET:
+                return pyarrow.binary()
+    
+    # Anything without a lossless mapping (JSON, arrays, intervals...) is
+    # carried as text rather than guessed from the first batch
+    return factory() if factory else pyarrow.string()
+
+
+def schema_from_description(server_type, description, fields=None):
+    """Build an Arrow schema from a DB-API cursor description.
+    
+    fields are the pymysql field packets of the columns (see cursor_fields).
+    """
+    fields = fields or [None] * len(description)
+    return pyarrow.schema([
+        pyarrow.field(column[0], _column_type(server_type, column, field))
+        for column, field in zip(description, fields)
+    ])
+
+
+def _as_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode('utf-8', errors='replace')
+    return str(value)
+
+
+def rows_to_record_batch(rows, schema):
+    """Convert a list of row tuples into an Arrow record batch."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for values, field in zip(columns, schema):
+        if pyarrow.types.is_string(field.type):
+            values = [_as_text(value) for value in values]
+        elif pyarrow.types.is_binary(field.type):
+            values = [bytes(value) if value is not None else None for value in values]
+        arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_record_batches(cursor, server_type, batch_size):
+    """Yield (schema, record batch) pairs from a streaming cursor.
+    
+    The schema is derived from the cursor description, which for PostgreSQL
+    named cursors is only available after the first fetch.
+    """
+    schema = None
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if schema is None:
+            schema = schema_from_description(server_type, cursor.description, cursor_fields(cursor))
+        if not rows:
+            break
+        yield schema, rows_to_record_batch(rows, schema)
+    
+    if schema is not None:
+        # Always emit the schema, even for an empty result
+        yield schema, None
+
+
+class _ChunkSink:
+    """Write-only file object that collects written bytes for draining."""
+    
+    closed = False
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_columnar(batches, fmt):
+    """Encode (schema, record batch) pairs as an Arrow IPC stream or a Parquet file."""
+    sink = _ChunkSink()
+    output = pyarrow.PythonFile(sink, mode='w')
+    writer = None
+    
+    try:
+        for schema, batch in batches:
+            if writer is None:
+                if fmt == 'parquet':
+                    writer = pyarrow.parquet.ParquetWriter(output, schema, compression='zstd')
+                else:
+                    writer = pyarrow.ipc.new_stream(output, schema)
+            
+            if batch is not None:
+                if fmt == 'parquet':
+                    writer.write_table(pyarrow.Table.from_batches([batch]))
+                else:
+                    writer.write_batch(batch)
+            
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def rows_to_table(rows, description, server_type, fields=None):
+    """Build an Arrow table from fully fetched rows and their cursor description."""
+    schema = schema_from_description(server_type, description, fields)
+    return pyarrow.Table.from_batches([rows_to_record_batch(rows, schema)], schema=schema)
@@ -0,0 +1,190 @@
+"""
+NEXDB - Fake database servers
+
+Chosen with the SERVER_CONNECTOR setting, FakeServerConnector stands in for
+the MySQL and PostgreSQL drivers behind connect_to_server, for load tests,
+benchmarks and development machines without managed servers. Its
+connections accept any statement: every SELECT (or COPY ... TO STDOUT)
+returns the same FAKE_SERVER_ROWS synthetic rows, writes and COPY ... FROM
+STDIN are consumed and discarded. Connecting and each statement sleep
+FAKE_SERVER_LATENCY seconds to stand in for the network round trip.
+
+create_async_pool opens a FakeAsyncPool for the introspection API instead;
+it answers the same way, awaiting the latency instead of sleeping, so
+concurrent statements wait together as they would on a real server.
+"""
+
+import asyncio
+import csv
+import io
+import time
+from datetime import datetime
+
+COLUMNS = ('id', 'name', 'created_at')
+
+
+class FakeCursor:
+    """A DB-API cursor over synthetic rows."""
+    
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.itersize = 2000
+        self.description = None
+        self.rowcount = -1
+        self._rows = iter(())
+    
+    def _rows_for(self, count):
+        created_at = datetime(2024, 1, 1)
+        return ((i, f'row{i}', created_at) for i in range(1, count + 1))
+    
+    def execute(self, sql, params=None):
+        self.connection.statements += 1
+        self.connection.wait()
+        if sql.lstrip().upper().startswith(('SELECT', 'WITH', 'SHOW')):
+            self.description = [(column, None, None, None, None, None, None) for column in COLUMNS]
+            self.rowcount = self.connection.rows
+            self._rows = self._rows_for(self.connection.rows)
+        else:
+            self.description = None
+            self.rowcount = 0
+            self._rows = iter(())
+    
+    def executemany(self, sql, seq_of_params):
+        for params in seq_of_params:
+            self.execute(sql, params)
+    
+    def copy_expert(self, sql, file):
+        """Write the rows as CSV for COPY ... TO STDOUT, or drain file for FROM STDIN."""
+        self.connection.statements += 1
+        self.connection.wait()
+        if 'FROM STDIN' in sql.upper():
+            while file.read(65536):
+                pass
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if 'HEADER' in sql.upper():
+            writer.writerow(COLUMNS)
+        for row in self._rows_for(self.connection.rows):
+            if self.connection.cancelled:
+                raise RuntimeError('canceling statement due to user request')
+            writer.writerow(row)
+            if buffer.tell() >= 65536:
+                file.write(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+        file.write(buffer.getvalue())
+    
+    def fetchone(self):
+        return next(self._rows, None)
+    
+    def fetchmany(self, size=None):
+        size = size or self.itersize
+        return [row for _, row in zip(range(size), self._rows)]
+    
+    def fetchall(self):
+        return list(self._rows)
+    
+    def __iter__(self):
+        return self._rows
+    
+    def close(self):
+        self._rows = iter(())
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeConnection:
+    """A DB-API connection to a fake server."""
+    
+    def __init__(self, server, database=None, rows=1000, latency=0.0):
+        self.server = server
+        self.database = database
+        self.rows = rows
+        self.latency = latency
+        self.autocommit = False
+        self.closed = False
+        self.cancelled = False
+        self.statements = 0
+    
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def cursor(self, name=None, *args, **kwargs):
+        return FakeCursor(self, name)
+    
+    def commit(self):
+        pass
+    
+    def rollback(self):
+        pass
+    
+    def cancel(self):
+        """Cancel the running statement, like psycopg2's connection.cancel()."""
+        self.cancelled = True
+    
+    def close(self):
+        self.closed = True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeAsyncPool:
+    """An async pool of fake connections with the interface of app.introspection.pools."""
+    
+    def __init__(self, server, size=4, rows=1000, latency=0.0):
+        self.server = server
+        self.rows = rows
+        self.latency = latency
+        self.statements = 0
+        self.closed = False
+        # Statements beyond size wait for a connection, as they would in a real pool
+        self._connections = asyncio.Semaphore(size)
+    
+    async def fetch(self, sql):
+        """Return (columns, rows) for a statement, as the driver pools do."""
+        async with self._connections:
+            self.statements += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH', 'SHOW')):
+            return [], []
+        created_at = datetime(2024, 1, 1)
+        return list(COLUMNS), [(i, f'row{i}', created_at) for i in range(1, self.rows + 1)]
+    
+    async def close(self):
+        self.closed = True
+
+
+class FakeServerConnector:
+    """Open FakeConnections instead of connecting to the managed servers."""
+    
+    def __init__(self, config=None):
+        config = config or {}
+        self.rows = int(config.get('FAKE_SERVER_ROWS', 1000))
+        self.latency = float(config.get('FAKE_SERVER_LATENCY', 0.0))
+        self.connections = 0
+    
+    def connect(self, server, database=None, **options):
+        """Return a connection to the server, as connect_to_server would."""
+        self.connections += 1
+        connection = FakeConnection(server, database, self.rows, self.latency)
+        connection.wait()
+        return connection
+    
+    async def create_async_pool(self, server, size=4, timeout=None):
+        """Return a FakeAsyncPool for the server, as open_pool would a driver pool."""
+        self.connections += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeAsyncPool(server, size, self.rows, self.latency)
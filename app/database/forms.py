@@ -0,0 +1,24 @@
+"""
+NEXDB - Database forms
+"""
+
+from flask_wtf import FlaskForm
+from wtforms import TextAreaField, SubmitField
+from wtforms.validators import Optional
+
+class ProvisionForm(FlaskForm):
+    """Form for provisioning databases, users and grants in one batch."""
+    databases = TextAreaField('Databases', validators=[Optional()],
+                              description='One database name per line.')
+    users = TextAreaField('Users', validators=[Optional()],
+                          description='One user per line: username database password [host]')
+    grants = TextAreaField('Grants', validators=[Optional()],
+                           description='One grant per line: username database PRIVILEGE[,PRIVILEGE] [host]')
+    submit = SubmitField('Provision')
+
+
+class FirewallForm(FlaskForm):
+    """Form for the addresses allowed to reach a server."""
+    rules = TextAreaField('Allowed addresses', validators=[Optional()],
+                          description='One address or network per line, optionally followed by a database name.')
+    submit = SubmitField('Save and apply')
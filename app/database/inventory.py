@@ -0,0 +1,332 @@
+"""
+NEXDB - Server inventory sync
+
+Discovers every database, login user and grant on a server with three
+catalog queries, then reconciles the Database and DatabaseUser tables with
+the result through bulk inserts, updates and deletes on one connection
+instead of per-row ORM operations. The servers of the fleet are synced
+concurrently from a thread pool.
+
+A DatabaseUser row is a user's registration on one database: users found on
+a server get a row for every database they hold privileges on, with no
+password since it cannot be read back. Databases that disappeared from a
+server are removed unless backups or schedules still refer to them, in which
+case they are kept and reported as missing.
+
+Which grants count:
+
+- MySQL: global grants (ON *.*) of database-level privileges register the
+  user on every non-system database. Schema grants, including wildcard
+  patterns such as `app\\_%`, register it on the matching databases. Table
+  grants register it on the table's database with the privileges they give.
+  Column and routine grants, and privileges held only through MySQL 8 roles,
+  are not read.
+- PostgreSQL: database ACL entries, ownership and superusers (which hold
+  every privilege) are read from the maintenance database. Privileges on
+  schemas and tables live in each database's own catalog and are not read,
+  and neither are grants to PUBLIC.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app import db, scheduler
+from app.models.database_server import DatabaseServer, Database, DatabaseUser
+from app.models.backup import Backup, BackupSchedule
+from app.models.firewall import FirewallRule
+
+Inventory = namedtuple('Inventory', ['databases', 'users', 'grants'])
+
+# Databases and accounts that belong to the server itself
+MYSQL_SYSTEM_DATABASES = {'information_schema', 'mysql', 'performance_schema', 'sys'}
+POSTGRESQL_SYSTEM_DATABASES = {'postgres'}
+
+# Privileges that apply to a database's objects; other global privileges
+# (PROCESS, RELOAD, ...) are server-wide and register the user nowhere
+MYSQL_DATABASE_PRIVILEGES = {
+    'ALTER', 'ALTER ROUTINE', 'CREATE', 'CREATE ROUTINE', 'CREATE TEMPORARY TABLES',
+    'CREATE VIEW', 'DELETE', 'DROP', 'EVENT', 'EXECUTE', 'INDEX', 'INSERT', 'LOCK TABLES',
+    'REFERENCES', 'SELECT', 'SHOW VIEW', 'TRIGGER', 'UPDATE',
+}
+
+MYSQL_CATALOG = {
+    'databases': "SELECT SCHEMA_NAME FROM information_schema.SCHEMATA",
+    'users': "SELECT DISTINCT User FROM mysql.user WHERE User <> '' AND User NOT LIKE 'mysql.%%'",
+    # Global grants have no schema; TABLE_SCHEMA of schema grants may be a pattern
+    'grants': """
+        SELECT GRANTEE, NULL, PRIVILEGE_TYPE FROM information_schema.USER_PRIVILEGES
+        UNION
+        SELECT GRANTEE, TABLE_SCHEMA, PRIVILEGE_TYPE FROM information_schema.SCHEMA_PRIVILEGES
+        UNION
+        SELECT GRANTEE, TABLE_SCHEMA, PRIVILEGE_TYPE FROM information_schema.TABLE_PRIVILEGES
+    """,
+}
+
+POSTGRESQL_CATALOG = {
+    'databases': "SELECT datname FROM pg_database WHERE NOT datistemplate",
+    'users': "SELECT rolname FROM pg_roles WHERE rolcanlogin AND rolname NOT LIKE 'pg\\_%%'",
+    # Explicit ACL entries plus ownership and superusers, which imply every privilege
+    'grants': """
+        SELECT r.rolname, d.datname, a.privilege_type
+        FROM pg_database d
+        CROSS JOIN LATERAL aclexplode(d.datacl) a
+        JOIN pg_roles r ON r.oid = a.grantee
+        WHERE NOT d.datistemplate
+        UNION
+        SELECT r.rolname, d.datname, 'ALL PRIVILEGES'
+        FROM pg_database d
+        JOIN pg_roles r ON r.oid = d.datdba OR r.rolsuper
+        WHERE NOT d.datistemplate
+    """,
+}
+
+_GRANTEE_PATTERN = re.compile(r"^'(.*)'@'(.*)'$")
+
+
+def _mysql_grant_databases(schema, names):
+    """Return the databases a MySQL grant's schema covers.
+    
+    None is a global grant. Otherwise `%` and unescaped `_` are wildcards,
+    as in GRANT ... ON `app\\_%`.*.
+    """
+    if schema is None:
+        return names
+    if schema in names:
+        return {schema}
+    pattern = ''.join(
+        '.*' if part == '%' else '.' if part == '_' else re.escape(part[-1])
+        for part in re.findall(r'\\.|.', schema)
+    )
+    return {name for name in names if re.fullmatch(pattern, name)}
+
+databases = Database.__table__
+database_users = DatabaseUser.__table__
+servers = DatabaseServer.__table__
+firewall_rules = FirewallRule.__table__
+
+
+def fetch_inventory(server):
+    """Read the databases, login users and grants of a server."""
+    from app.api.utils import connect_to_server
+    from app.database.provisioning import POSTGRESQL_MAINTENANCE_DB
+    if server.server_type == 'mysql':
+        catalog, system = MYSQL_CATALOG, MYSQL_SYSTEM_DATABASES
+        conn = connect_to_server(server, connect_timeout=10)
+    elif server.server_type == 'postgresql':
+        catalog, system = POSTGRESQL_CATALOG, POSTGRESQL_SYSTEM_DATABASES
+        conn = connect_to_server(server, POSTGRESQL_MAINTENANCE_DB, connect_timeout=10)
+    else:
+        raise ValueError(f"Unsupported database type: {server.server_type}")
+    
+    try:
+        cursor = conn.cursor()
+        cursor.execute(catalog['databases'])
+        names = {name for name, in cursor.fetchall() if name not in system}
+        cursor.execute(catalog['users'])
+        users = {name for name, in cursor.fetchall()}
+        cursor.execute(catalog['grants'])
+        grant_rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+    
+    grants = {}
+    for grantee, database_name, privilege in grant_rows:
+        privilege = privilege.upper()
+        if server.server_type == 'mysql':
+            # 'user'@'host'; privileges of all hosts of a user are merged
+            match = _GRANTEE_PATTERN.match(grantee)
+            grantee = match.group(1) if match else grantee
+            if database_name is None and privilege not in MYSQL_DATABASE_PRIVILEGES:
+                continue
+            granted = _mysql_grant_databases(database_name, names)
+        else:
+            granted = {database_name} & names
+        # Skips grants to roles that cannot log in
+        if grantee in users:
+            for name in granted:
+                grants.setdefault((grantee, name), set()).add(privilege)
+    return Inventory(names, users, grants)
+
+
+def _privileges(value):
+    try:
+        privileges = json.loads(value) if value else {}
+    except ValueError:
+        return {}
+    return privileges if isinstance(privileges, dict) else {}
+
+
+def reconcile(conn, server_id, inventory, now=None):
+    """Bring a server's metadata in line with its inventory; returns counts."""
+    now = now or datetime.utcnow()
+    counts = {'databases_added': 0, 'databases_removed': 0, 'databases_missing': 0,
+              'users_added': 0, 'users_updated': 0, 'users_removed': 0, 'firewall_rules_removed': 0}
+    
+    existing = dict(conn.execute(
+        db.select(databases.c.name, databases.c.id).where(databases.c.server_id == server_id)
+    ).all())
+    added = sorted(inventory.databases - existing.keys())
+    if added:
+        conn.execute(databases.insert(), [
+            {'name': name, 'description': '', 'server_id': server_id,
+             'created_at': now, 'updated_at': now}
+            for name in added
+        ])
+        counts['databases_added'] = len(added)
+    
+    gone = [existing[name] for name in existing.keys() - inventory.databases]
+    if gone:
+        referenced = set(conn.execute(
+            db.union(db.select(Backup.__table__.c.database_id).
+                     where(Backup.__table__.c.database_id.in_(gone)),
+                     db.select(BackupSchedule.__table__.c.database_id).
+                     where(BackupSchedule.__table__.c.database_id.in_(gone)))
+        ).scalars())
+        removable = [database_id for database_id in gone if database_id not in referenced]
+        if removable:
+            conn.execute(database_users.delete().where(database_users.c.database_id.in_(removable)))
+            counts['firewall_rules_removed'] = conn.execute(
+                firewall_rules.delete().where(firewall_rules.c.database_id.in_(removable))
+            ).rowcount
+            conn.execute(databases.delete().where(databases.c.id.in_(removable)))
+        counts['databases_removed'] = len(removable)
+        counts['databases_missing'] = len(gone) - len(removable)
+    
+    database_ids = dict(conn.execute(
+        db.select(databases.c.name, databases.c.id).
+        where(databases.c.server_id == server_id, databases.c.name.in_(inventory.databases))
+    ).all()) if inventory.databases else {}
+    database_names = {database_id: name for name, database_id in database_ids.items()}
+    
+    wanted = {
+        (username, database_ids[database_name]): sorted(privileges)
+        for (username, database_name), privileges in inventory.grants.items()
+        if database_name in database_ids
+    }
+    registered = {
+        (row.username, row.database_id): row for row in conn.execute(
+            db.select(database_users.c.id, database_users.c.username, database_users.c.database_id,
+                      database_users.c.privileges, database_users.c.encrypted_password).
+            join(databases, databases.c.id == database_users.c.database_id).
+            where(databases.c.server_id == server_id)
+        )
+    }
+    
+    inserts, updates, deletes = [], [], []
+    for (username, database_id), privileges in wanted.items():
+        name = database_names[database_id]
+        row = registered.get((username, database_id))
+        if row is None:
+            inserts.append({'username': username, 'database_id': database_id,
+                            'encrypted_password': None,
+                            'privileges': json.dumps({name: privileges}),
+                            'created_at': now, 'updated_at': now})
+        elif _privileges(row.privileges).get(name) != privileges:
+            updates.append({'row_id': row.id, 'new_privileges': json.dumps({name: privileges})})
+    for key, row in registered.items():
+        if key in wanted:
+            continue
+        username, database_id = key
+        # Keep users created through the panel while they exist on the server
+        if username not in inventory.users or row.encrypted_password is None:
+            deletes.append(row.id)
+        elif database_id in database_names and _privileges(row.privileges).get(database_names[database_id]):
+            updates.append({'row_id': row.id,
+                            'new_privileges': json.dumps({database_names[database_id]: []})})
+    
+    if inserts:
+        conn.execute(database_users.insert(), inserts)
+    if updates:
+        conn.execute(
+            database_users.update().
+            where(database_users.c.id == db.bindparam('row_id')).
+            values(privileges=db.bindparam('new_privileges'), updated_at=now),
+            updates
+        )
+    if deletes:
+        conn.execute(database_users.delete().where(database_users.c.id.in_(deletes)))
+    counts.update(users_added=len(inserts), users_updated=len(updates), users_removed=len(deletes))
+    
+    conn.execute(servers.update().where(servers.c.id == server_id).
+                 values(inventory_synced_at=now, updated_at=servers.c.updated_at))
+    return counts
+
+
+def sync_server(server_id):
+    """Discover a server's inventory and reconcile its metadata."""
+    from app.project.dashboard import refresh_project_summaries
+    started = time.perf_counter()
+    server = db.session.get(DatabaseServer, server_id)
+    if server is None:
+        return {'server_id': server_id, 'success': False, 'message': 'Server not found'}
+    
+    try:
+        inventory = fetch_inventory(server)
+    except Exception as e:
+        logging.error(f"Inventory discovery error on server {server_id}: {str(e)}")
+        return {'server_id': server_id, 'success': False,
+                'message': f"Discovery failed: {str(e)}"}
+    # Release the metadata connection while nothing is being written
+    project_id = server.project_id
+    db.session.rollback()
+    
+    try:
+        with db.engine.begin() as conn:
+            counts = reconcile(conn, server_id, inventory)
+            if project_id is not None and (counts['databases_added'] or counts['databases_removed']):
+                refresh_project_summaries([project_id], conn)
+    except Exception as e:
+        logging.error(f"Inventory reconcile error on server {server_id}: {str(e)}")
+        return {'server_id': server_id, 'success': False,
+                'message': f"Reconcile failed: {str(e)}"}
+    if counts['firewall_rules_removed']:
+        # Core deletes bypass the session hooks that normally sync the firewall
+        from app.firewall.sync import sync_firewall
+        sync_firewall()
+    
+    return dict(counts, server_id=server_id, success=True,
+                databases=len(inventory.databases), users=len(inventory.users),
+                seconds=round(time.perf_counter() - started, 3))
+
+
+def sync_fleet(app, server_ids=None, max_workers=None):
+    """Sync every server (or the given ones) concurrently; one result per server."""
+    with app.app_context():
+        if server_ids is None:
+            server_ids = db.session.execute(db.select(servers.c.id).order_by(servers.c.id)).scalars().all()
+        max_workers = max_workers or app.config.get('INVENTORY_SYNC_WORKERS', 8)
+    
+    def run(server_id):
+        with app.app_context():
+            try:
+                return sync_server(server_id)
+            finally:
+                db.session.remove()
+    
+    if not server_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(server_ids)),
+                            thread_name_prefix='nexdb-inventory') as pool:
+        return list(pool.map(run, server_ids))
+
+
+def init_inventory_sync(app):
+    """Schedule periodic fleet syncs when INVENTORY_SYNC_INTERVAL is set."""
+    interval = app.config.get('INVENTORY_SYNC_INTERVAL', 0)
+    if interval:
+        from app.profiling.triggers import profiled_job
+        from app.tracing.sql import traced_job
+        scheduler.add_job(
+            id='sync_inventory',
+            func=traced_job(app, 'sync_inventory',
+                            profiled_job(app, 'sync_inventory', sync_fleet, ('nexdb-inventory',))),
+            args=[app],
+            trigger='interval',
+            seconds=interval,
+            replace_existing=True
+        )
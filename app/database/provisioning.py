@@ -0,0 +1,437 @@
+"""
+NEXDB - Bulk database and user provisioning
+
+Creates a batch of databases, users and grants on one server over a single
+connection. The statements of each phase are pipelined: MySQL receives them
+as multi-statement batches, PostgreSQL receives roles and grants as one DO
+block with every statement in its own subtransaction, so a failing statement
+does not undo the others. Metadata rows for everything the server accepted
+are written in one transaction, and every requested item gets a result.
+"""
+
+import collections
+import json
+import logging
+import re
+import secrets
+from app import db
+from app.models.database_server import Database, DatabaseUser
+
+MYSQL_PRIVILEGES = {
+    'ALL PRIVILEGES', 'ALTER', 'ALTER ROUTINE', 'CREATE', 'CREATE ROUTINE',
+    'CREATE TEMPORARY TABLES', 'CREATE VIEW', 'DELETE', 'DROP', 'EVENT', 'EXECUTE',
+    'INDEX', 'INSERT', 'LOCK TABLES', 'REFERENCES', 'SELECT', 'SHOW VIEW', 'TRIGGER',
+    'UPDATE',
+}
+
+# PostgreSQL grants are issued at database level over the server connection
+POSTGRESQL_PRIVILEGES = {'ALL PRIVILEGES', 'CONNECT', 'CREATE', 'TEMPORARY'}
+
+PRIVILEGE_ALIASES = {'ALL': 'ALL PRIVILEGES', 'TEMP': 'TEMPORARY'}
+
+# Database that PostgreSQL connections open when no database is involved
+POSTGRESQL_MAINTENANCE_DB = 'postgres'
+
+# Statements sent per round trip
+PIPELINE_SIZE = 200
+
+# Item statuses that count as a failed request
+FAILED_STATUSES = ('invalid', 'failed', 'skipped')
+
+_HOST_PATTERN = re.compile(r'^[A-Za-z0-9_.%:-]+$')
+_NOTICE_PATTERN = re.compile(r'nexdb:(\d+):(.*)', re.S)
+
+
+def normalize_privileges(server_type, privileges):
+    """Return a sorted list of valid privileges, raising ValueError otherwise."""
+    if isinstance(privileges, str):
+        privileges = privileges.split(',')
+    allowed = MYSQL_PRIVILEGES if server_type == 'mysql' else POSTGRESQL_PRIVILEGES
+    normalized = set()
+    for privilege in privileges or ():
+        privilege = ' '.join(str(privilege).upper().split())
+        privilege = PRIVILEGE_ALIASES.get(privilege, privilege)
+        if privilege not in allowed:
+            raise ValueError(f"Unsupported privilege: {privilege}")
+        normalized.add(privilege)
+    if not normalized:
+        raise ValueError("At least one privilege is required")
+    return sorted(normalized)
+
+
+def _validate_host(host):
+    host = host or '%'
+    if not _HOST_PATTERN.match(host):
+        raise ValueError(f"Invalid host: {host}")
+    return host
+
+
+class _Item:
+    """One requested database, user or grant, and its result."""
+    
+    def __init__(self, kind, **fields):
+        self.kind = kind
+        self.result = dict(type=kind, status='pending', **fields)
+        self.requires = []
+    
+    @property
+    def pending(self):
+        return self.result['status'] == 'pending'
+    
+    def finish(self, status, message=None):
+        self.result['status'] = status
+        if message:
+            self.result['message'] = message
+
+
+class Pipeline:
+    """Send statements over one connection and report an error per statement."""
+    
+    def __init__(self, server_type, conn):
+        self.server_type = server_type
+        self.conn = conn
+        self.round_trips = 0
+    
+    def literal(self, value):
+        """Quote a string literal for this server."""
+        if self.server_type == 'mysql':
+            return self.conn.escape(value)
+        with self.conn.cursor() as cursor:
+            return cursor.mogrify('%s', (value,)).decode()
+    
+    def run(self, statements, transactional=True):
+        """Execute statements and return an error message (or None) for each.
+        
+        PostgreSQL refuses some statements (CREATE DATABASE) inside a block;
+        pass transactional=False to send those one per round trip.
+        """
+        errors = []
+        for start in range(0, len(statements), PIPELINE_SIZE):
+            chunk = statements[start:start + PIPELINE_SIZE]
+            if self.server_type == 'mysql':
+                errors.extend(self._run_mysql(chunk))
+            elif transactional:
+                errors.extend(self._run_postgresql_block(chunk))
+            else:
+                errors.extend(self._run_postgresql_each(chunk))
+        return errors
+    
+    def _run_mysql(self, statements):
+        """Send the statements as one multi-statement batch, resuming after errors.
+        
+        The server stops at the first failing statement, so the ones after it
+        are sent again in another round trip.
+        """
+        import pymysql
+        errors = [None] * len(statements)
+        start = 0
+        with self.conn.cursor() as cursor:
+            while start < len(statements):
+                done = 0
+                self.round_trips += 1
+                try:
+                    cursor.execute(';\n'.join(statements[start:]))
+                    done = 1
+                    while cursor.nextset():
+                        done += 1
+                except pymysql.MySQLError as e:
+                    errors[start + done] = str(e.args[-1]) if e.args else str(e)
+                    done += 1
+                start += done
+        return errors
+    
+    def _run_postgresql_block(self, statements):
+        """Run the statements in one DO block, each in its own subtransaction."""
+        import psycopg2
+        lines = ['BEGIN']
+        for index, statement in enumerate(statements):
+            lines.append(f"BEGIN EXECUTE {self.literal(statement)}; "
+                         f"EXCEPTION WHEN OTHERS THEN RAISE NOTICE 'nexdb:{index}:%', SQLERRM; END;")
+        lines.append('END;')
+        body = '\n'.join(lines)
+        tag = '$nexdb$'
+        while tag in body:
+            tag = f'$nexdb_{secrets.token_hex(4)}$'
+        
+        # Failures come back as notices; a deque keeps all of them
+        self.conn.notices = collections.deque()
+        self.round_trips += 1
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute(f'DO {tag}\n{body}\n{tag}')
+        except psycopg2.Error as e:
+            return [str(e).strip()] * len(statements)
+        
+        errors = [None] * len(statements)
+        for notice in self.conn.notices:
+            match = _NOTICE_PATTERN.search(notice)
+            if match:
+                errors[int(match.group(1))] = match.group(2).strip()
+        return errors
+    
+    def _run_postgresql_each(self, statements):
+        import psycopg2
+        errors = []
+        with self.conn.cursor() as cursor:
+            for statement in statements:
+                self.round_trips += 1
+                try:
+                    cursor.execute(statement)
+                    errors.append(None)
+                except psycopg2.Error as e:
+                    errors.append(str(e).strip())
+        return errors
+
+
+def _connect(server):
+    """Open one autocommit connection to the server for the whole batch."""
+    from app.api.utils import connect_to_server
+    if server.server_type == 'mysql':
+        from pymysql.constants import CLIENT
+        return connect_to_server(server, client_flag=CLIENT.MULTI_STATEMENTS,
+                                 autocommit=True, connect_timeout=10)
+    conn = connect_to_server(server, POSTGRESQL_MAINTENANCE_DB, connect_timeout=10)
+    conn.autocommit = True
+    return conn
+
+
+def _plan(server, databases, users, grants):
+    """Validate the request against the registered metadata and build the items."""
+    from app.database.utils import quote_identifier
+    server_type = server.server_type
+    existing_databases = {database.name: database for database in
+                          Database.query.filter_by(server_id=server.id)}
+    existing_users = {}
+    for user in DatabaseUser.query.join(Database).filter(Database.server_id == server.id):
+        existing_users.setdefault(user.username, []).append(user)
+    
+    database_items, by_database = [], {}
+    for spec in databases:
+        spec = {'name': spec} if isinstance(spec, str) else dict(spec or {})
+        name = spec.get('name')
+        item = _Item('database', name=name)
+        database_items.append(item)
+        try:
+            item.quoted = quote_identifier(server_type, name or '')
+        except ValueError as e:
+            item.finish('invalid', str(e))
+            continue
+        if name in by_database:
+            item.finish('invalid', "Duplicate database in request")
+            continue
+        by_database[name] = item
+        if name in existing_databases:
+            item.result['id'] = existing_databases[name].id
+            item.finish('exists', "Database is already registered")
+            continue
+        item.description = spec.get('description') or ''
+        item.statement = f'CREATE DATABASE {item.quoted}'
+    
+    def known_database(name):
+        return name in existing_databases or name in by_database
+    
+    user_items, by_user = [], {}
+    for spec in users:
+        spec = dict(spec or {})
+        username, database_name = spec.get('username'), spec.get('database')
+        item = _Item('user', username=username, database=database_name)
+        user_items.append(item)
+        try:
+            item.quoted = quote_identifier(server_type, username or '')
+            item.host = _validate_host(spec.get('host'))
+            if not spec.get('password'):
+                raise ValueError("Password is required")
+        except ValueError as e:
+            item.finish('invalid', str(e))
+            continue
+        if not known_database(database_name):
+            item.finish('invalid', f"Unknown database: {database_name}")
+            continue
+        if username in by_user:
+            item.finish('invalid', "Duplicate user in request")
+            continue
+        by_user[username] = item
+        if username in existing_users:
+            item.result['id'] = existing_users[username][0].id
+            item.finish('exists', "User is already registered on this server")
+            continue
+        item.username, item.database, item.password = username, database_name, spec['password']
+        item.requires = [by_database.get(database_name)]
+    
+    grant_items = []
+    for spec in grants:
+        spec = dict(spec or {})
+        username, database_name = spec.get('username'), spec.get('database')
+        item = _Item('grant', username=username, database=database_name)
+        grant_items.append(item)
+        try:
+            item.result['privileges'] = normalize_privileges(server_type, spec.get('privileges'))
+            item.quoted_user = quote_identifier(server_type, username or '')
+            item.quoted_database = quote_identifier(server_type, database_name or '')
+            item.host = _validate_host(spec.get('host') or getattr(by_user.get(username), 'host', None))
+        except ValueError as e:
+            item.finish('invalid', str(e))
+            continue
+        if username not in by_user and username not in existing_users:
+            item.finish('invalid', f"Unknown user: {username}")
+            continue
+        if not known_database(database_name):
+            item.finish('invalid', f"Unknown database: {database_name}")
+            continue
+        item.username, item.database = username, database_name
+        item.requires = [by_user.get(username), by_database.get(database_name)]
+    
+    return database_items, user_items, grant_items, existing_databases, existing_users
+
+
+def _user_statement(server_type, item, literal):
+    if server_type == 'mysql':
+        return (f"CREATE USER {literal(item.username)}@{literal(item.host)} "
+                f"IDENTIFIED BY {literal(item.password)}")
+    return f"CREATE ROLE {item.quoted} LOGIN PASSWORD {literal(item.password)}"
+
+
+def _grant_statement(server_type, item, literal):
+    privileges = ', '.join(item.result['privileges'])
+    if server_type == 'mysql':
+        return (f"GRANT {privileges} ON {item.quoted_database}.* "
+                f"TO {literal(item.username)}@{literal(item.host)}")
+    return f"GRANT {privileges} ON DATABASE {item.quoted_database} TO {item.quoted_user}"
+
+
+def _execute(pipeline, items, done_status, transactional=True):
+    """Run the statements of pending items whose requirements succeeded."""
+    runnable = []
+    for item in items:
+        if not item.pending:
+            continue
+        if any(required is not None and required.result['status'] in FAILED_STATUSES
+               for required in item.requires):
+            item.finish('skipped', "A database or user it depends on was not created")
+            continue
+        runnable.append(item)
+    errors = pipeline.run([item.statement for item in runnable], transactional)
+    for item, error in zip(runnable, errors):
+        if error:
+            item.finish('failed', error)
+        else:
+            item.finish(done_status)
+
+
+def _save_metadata(server, database_items, user_items, grant_items,
+                   existing_databases, existing_users):
+    """Record everything the server accepted in one transaction."""
+    created_databases = {}
+    for item in database_items:
+        if item.result['status'] == 'created':
+            created_databases[item.result['name']] = Database(
+                name=item.result['name'], description=item.description, server_id=server.id
+            )
+    db.session.add_all(created_databases.values())
+    db.session.flush()
+    database_ids = {name: database.id for name, database in existing_databases.items()}
+    database_ids.update((name, database.id) for name, database in created_databases.items())
+    
+    # One registration per user and database, keyed like the inventory sync
+    registrations = {(user.username, user.database_id): user
+                     for candidates in existing_users.values() for user in candidates}
+    created_users = {}
+    for item in user_items:
+        if item.result['status'] == 'created':
+            user = DatabaseUser(
+                username=item.username, password=item.password,
+                database_id=database_ids[item.database], privileges='{}'
+            )
+            created_users[item.username] = registrations[(item.username, user.database_id)] = user
+    
+    for item in grant_items:
+        if item.result['status'] != 'granted':
+            continue
+        key = (item.username, database_ids[item.database])
+        user = registrations.get(key)
+        if user is None:
+            # Access to another database gets its own registration
+            template = created_users.get(item.username) or existing_users[item.username][0]
+            user = registrations[key] = DatabaseUser(
+                username=item.username, encrypted_password=template.encrypted_password,
+                database_id=key[1], privileges='{}'
+            )
+        try:
+            privileges = json.loads(user.privileges) if user.privileges else {}
+        except ValueError:
+            privileges = {}
+        if not isinstance(privileges, dict):
+            privileges = {}
+        privileges[item.database] = sorted(set(privileges.get(item.database, [])) |
+                                           set(item.result['privileges']))
+        user.privileges = json.dumps(privileges)
+    db.session.add_all(user for user in registrations.values() if user.id is None)
+    
+    db.session.commit()
+    for name, database in created_databases.items():
+        next(item for item in database_items if item.result['name'] == name).result['id'] = database.id
+    for username, user in created_users.items():
+        next(item for item in user_items if item.result['username'] == username).result['id'] = user.id
+
+
+def provision(server, databases=(), users=(), grants=()):
+    """Create databases, users and grants on a server in one batch.
+    
+    databases are names or {'name', 'description'} dicts; users are
+    {'username', 'password', 'database', 'host'} dicts, registered under the
+    given database; grants are {'username', 'database', 'privileges', 'host'}
+    dicts, recorded on the user's registration for that database (created if
+    needed). ``host`` only applies to MySQL and defaults to '%'. Users and grants
+    may refer to items in the same batch. Items whose dependencies failed are
+    skipped.
+    """
+    if server.server_type not in ('mysql', 'postgresql'):
+        return {'success': False, 'message': f"Unsupported database type: {server.server_type}",
+                'results': []}
+    
+    database_items, user_items, grant_items, existing_databases, existing_users = \
+        _plan(server, databases, users, grants)
+    items = database_items + user_items + grant_items
+    round_trips = 0
+    
+    if any(item.pending for item in items):
+        conn = None
+        try:
+            conn = _connect(server)
+            pipeline = Pipeline(server.server_type, conn)
+            _execute(pipeline, database_items, 'created', transactional=False)
+            for item in user_items:
+                if item.pending:
+                    item.statement = _user_statement(server.server_type, item, pipeline.literal)
+            _execute(pipeline, user_items, 'created')
+            for item in grant_items:
+                if item.pending:
+                    item.statement = _grant_statement(server.server_type, item, pipeline.literal)
+            _execute(pipeline, grant_items, 'granted')
+            round_trips = pipeline.round_trips
+        except Exception as e:
+            logging.error(f"Provisioning error on server {server.id}: {str(e)}")
+            for item in items:
+                if item.pending:
+                    item.finish('failed', f"Provisioning failed: {str(e)}")
+        finally:
+            if conn is not None:
+                conn.close()
+    
+    message = None
+    try:
+        _save_metadata(server, database_items, user_items, grant_items,
+                       existing_databases, existing_users)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Provisioning metadata error on server {server.id}: {str(e)}")
+        message = f"Objects were created on the server but could not be registered: {str(e)}"
+    
+    counts = collections.Counter(item.result['status'] for item in items)
+    return {
+        'success': message is None and not any(counts[status] for status in FAILED_STATUSES),
+        'message': message,
+        'results': [item.result for item in items],
+        'counts': dict(counts),
+        'round_trips': round_trips
+    }
@@ -0,0 +1,172 @@
+"""
+NEXDB - Database routes
+"""
+
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app
+from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload, selectinload
+from app import db
+from app.models import DatabaseServer, Database, FirewallRule
+from app.database.forms import ProvisionForm, FirewallForm
+from app.database.inventory import sync_server
+from app.database.provisioning import provision
+from app.firewall.sync import replace_server_rules, last_sync_result
+from app.project.permissions import get_access_map
+from app.project.utils import can_access_project, can_manage_servers
+
+# Create Blueprint
+database_bp = Blueprint('database', __name__)
+
+
+def _parse_lines(text, fields, required):
+    """Split each non-empty line into a dict of the given fields."""
+    items = []
+    for number, line in enumerate((text or '').splitlines(), 1):
+        parts = line.split()
+        if not parts:
+            continue
+        if not required <= len(parts) <= len(fields):
+            raise ValueError(f"Line {number}: expected {' '.join(fields)}")
+        items.append(dict(zip(fields, parts)))
+    return items
+
+
+@database_bp.route('/')
+@login_required
+def index():
+    """List the database servers of every project the user can access."""
+    project_ids = list(get_access_map(current_user))
+    servers = DatabaseServer.query.options(
+        joinedload(DatabaseServer.project),
+        selectinload(DatabaseServer.databases)
+    ).filter(DatabaseServer.project_id.in_(project_ids)).order_by(DatabaseServer.name).all()
+    
+    return render_template('database/index.html', title='Databases', servers=servers)
+
+
+@database_bp.route('/servers/<int:server_id>')
+@login_required
+def view_server(server_id):
+    """View a database server with its databases and users."""
+    server = DatabaseServer.query.options(
+        joinedload(DatabaseServer.project),
+        selectinload(DatabaseServer.databases).selectinload(Database.database_users)
+    ).filter_by(id=server_id).first_or_404()
+    
+    # Check if user has access
+    if server.project is None or not can_access_project(server.project, current_user):
+        flash('You do not have access to this server.', 'danger')
+        return redirect(url_for('database.index'))
+    
+    return render_template(
+        'database/server.html',
+        title=server.name,
+        server=server,
+        can_manage=can_manage_servers(server.project, current_user)
+    )
+
+
+@database_bp.route('/servers/<int:server_id>/provision', methods=['GET', 'POST'])
+@login_required
+def provision_server(server_id):
+    """Create databases, users and grants on a server in one batch."""
+    server = DatabaseServer.query.get_or_404(server_id)
+    
+    # Check if user has permission to manage the server
+    if server.project is None or not can_manage_servers(server.project, current_user):
+        flash('You do not have permission to manage this server.', 'danger')
+        return redirect(url_for('database.index'))
+    
+    form = ProvisionForm()
+    result = None
+    
+    if form.validate_on_submit():
+        try:
+            databases = _parse_lines(form.databases.data, ('name',), 1)
+            users = _parse_lines(form.users.data, ('username', 'database', 'password', 'host'), 3)
+            grants = _parse_lines(form.grants.data, ('username', 'database', 'privileges', 'host'), 3)
+        except ValueError as e:
+            flash(str(e), 'danger')
+        else:
+            result = provision(server, databases, users, grants)
+            if result['success']:
+                flash(f"Provisioned {len(result['results'])} items.", 'success')
+            else:
+                flash(result['message'] or 'Some items could not be provisioned.', 'danger')
+    
+    return render_template(
+        'database/provision.html',
+        title=f'Provision {server.name}',
+        server=server,
+        form=form,
+        result=result
+    )
+
+
+@database_bp.route('/servers/<int:server_id>/sync', methods=['POST'])
+@login_required
+def sync_server_inventory(server_id):
+    """Discover a server's databases, users and grants."""
+    server = DatabaseServer.query.get_or_404(server_id)
+    
+    # Check if user has permission to manage the server
+    if server.project is None or not can_manage_servers(server.project, current_user):
+        flash('You do not have permission to manage this server.', 'danger')
+        return redirect(url_for('database.index'))
+    
+    result = sync_server(server_id)
+    if result['success']:
+        flash(f"Inventory synced: {result['databases']} databases and {result['users']} users found.", 'success')
+        if result['databases_missing']:
+            flash(f"{result['databases_missing']} databases no longer exist on the server "
+                  f"but were kept because they have backups.", 'warning')
+    else:
+        flash(result['message'], 'danger')
+    
+    return redirect(url_for('database.view_server', server_id=server_id))
+
+
+@database_bp.route('/servers/<int:server_id>/firewall', methods=['GET', 'POST'])
+@login_required
+def server_firewall(server_id):
+    """Edit the addresses allowed to reach a server and apply them to UFW.
+    
+    Admins only: the rules open ports in the UFW of the panel's own host.
+    """
+    server = DatabaseServer.query.get_or_404(server_id)
+    
+    if not current_user.has_role('admin'):
+        flash('Only administrators can manage the firewall.', 'danger')
+        return redirect(url_for('database.index'))
+    
+    form = FirewallForm()
+    
+    if form.validate_on_submit():
+        try:
+            rules = _parse_lines(form.rules.data, ('source', 'database'), 1)
+            added, removed = replace_server_rules(server, rules, created_by=current_user.id)
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        else:
+            db.session.commit()
+            result = last_sync_result()
+            flash(f"Firewall rules saved: {added} added, {removed} removed.", 'success')
+            if result is not None and not result['success']:
+                flash(result['message'], 'danger')
+            return redirect(url_for('database.server_firewall', server_id=server.id))
+    elif not form.is_submitted():
+        rules = FirewallRule.query.options(joinedload(FirewallRule.database)).\
+            filter_by(server_id=server.id).order_by(FirewallRule.source).all()
+        form.rules.data = '\n'.join(
+            f"{rule.source} {rule.database.name}" if rule.database else rule.source
+            for rule in rules
+        )
+    
+    return render_template(
+        'database/firewall.html',
+        title=f'Firewall for {server.name}',
+        server=server,
+        form=form,
+        firewall_enabled=current_app.config.get('FIREWALL_ENABLED', False)
+    )
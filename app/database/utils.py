@@ -0,0 +1,459 @@
+"""
+NEXDB - Database utilities
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import zlib
+import pymysql.cursors
+from flask import current_app
+from app.api.utils import connect_to_server, sanitize_sql_identifier
+from app.database.columnar import columnar_available, iter_columnar, iter_record_batches
+
+
+class _CountingReader(io.RawIOBase):
+    """Raw stream wrapper that counts the bytes read from an upload."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        if not data:
+            return 0
+        size = len(data)
+        buffer[:size] = data
+        self.bytes_read += size
+        return size
+
+
+def quote_identifier(server_type, identifier):
+    """Sanitize and quote an SQL identifier for the given server type."""
+    identifier = sanitize_sql_identifier(identifier)
+    if server_type == 'mysql':
+        return f'`{identifier}`'
+    return f'"{identifier}"'
+
+
+def quote_table_name(server_type, table):
+    """Quote a table name, allowing an optional schema prefix."""
+    return '.'.join(quote_identifier(server_type, part) for part in table.split('.', 1))
+
+
+def iter_csv_batches(reader, batch_size):
+    """Yield lists of at most batch_size rows from a CSV reader."""
+    batch = []
+    for row in reader:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_batch(batch, target):
+    """Serialize a batch of rows as CSV into a text file object."""
+    writer = csv.writer(target, lineterminator='\n')
+    writer.writerows(batch)
+
+
+def _copy_batch_postgresql(cursor, copy_sql, batch):
+    """Stream one batch into PostgreSQL through COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    _write_batch(batch, buffer)
+    buffer.seek(0)
+    cursor.copy_expert(copy_sql, buffer)
+
+
+def _insert_batch_mysql(cursor, insert_sql, batch):
+    """Insert one batch into MySQL with a multi-row INSERT.
+
+    LOAD DATA LOCAL INFILE is not used: the client sends whichever file the
+    server asks for, so a hostile server could read files off this machine.
+    """
+    width = len(batch[0])
+    if any(len(row) != width for row in batch):
+        raise ValueError('Every CSV row must have the same number of fields')
+    placeholders = ', '.join(['%s'] * width)
+    cursor.executemany(f"{insert_sql} VALUES ({placeholders})", batch)
+
+
+def import_csv(server, database_name, table, stream, columns=None, header=True,
+               compression=None, batch_size=None, progress=None):
+    """Stream a CSV upload into a table using COPY FROM STDIN or multi-row INSERTs.
+
+    The upload is read incrementally and committed every batch_size rows, so only
+    one batch is held in memory at a time. ``progress`` is called after each commit
+    with the number of rows loaded so far and the number of upload bytes consumed.
+    """
+    batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 50000)
+    counter = _CountingReader(stream)
+    raw = io.BufferedReader(counter)
+    if compression == 'gzip':
+        raw = gzip.GzipFile(fileobj=raw, mode='rb')
+    elif compression:
+        return {'success': False, 'message': f"Unsupported compression: {compression}"}
+
+    text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    reader = csv.reader(text)
+    rows_loaded = 0
+    batches = 0
+    conn = None
+
+    try:
+        if header:
+            header_row = next(reader, None)
+            if header_row is None:
+                return {'success': True, 'rows': 0, 'batches': 0, 'bytes_read': counter.bytes_read}
+            columns = columns or header_row
+
+        table_sql = quote_table_name(server.server_type, table)
+        column_sql = ''
+        if columns:
+            column_sql = ' (' + ', '.join(quote_identifier(server.server_type, c.strip())
+                                          for c in columns) + ')'
+
+        if server.server_type == 'postgresql':
+            conn = connect_to_server(server, database_name)
+            load_batch = _copy_batch_postgresql
+            statement = f"COPY {table_sql}{column_sql} FROM STDIN WITH (FORMAT csv)"
+        elif server.server_type == 'mysql':
+            conn = connect_to_server(server, database_name)
+            load_batch = _insert_batch_mysql
+            statement = f"INSERT INTO {table_sql}{column_sql}"
+        else:
+            return {'success': False, 'message': f"Unsupported database type: {server.server_type}"}
+
+        cursor = conn.cursor()
+        for batch in iter_csv_batches(reader, batch_size):
+            load_batch(cursor, statement, batch)
+            conn.commit()
+            rows_loaded += len(batch)
+            batches += 1
+            if progress:
+                progress(rows_loaded, counter.bytes_read)
+        cursor.close()
+
+        return {
+            'success': True,
+            'rows': rows_loaded,
+            'batches': batches,
+            'bytes_read': counter.bytes_read
+        }
+
+    except (ValueError, csv.Error, OSError) as e:
+        return {'success': False, 'message': str(e), 'rows': rows_loaded}
+    except Exception as e:
+        logging.error(f"CSV import error: {str(e)}")
+        return {'success': False, 'message': f"Import failed: {str(e)}", 'rows': rows_loaded}
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def guess_compression(filename):
+    """Guess the compression of an uploaded file from its name."""
+    if filename and os.path.splitext(filename)[1].lower() in ('.gz', '.gzip'):
+        return 'gzip'
+    return None
+
+
+# Export formats and their response content types
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+# Formats encoded through pyarrow
+COLUMNAR_FORMATS = ('arrow', 'parquet')
+
+_COPY_CHUNK_SIZE = 64 * 1024
+_COPY_DONE = object()
+
+
+# String literals and quoted identifiers, removed before an ad-hoc query is
+# checked. Whether a backslash escapes a quote depends on the server's
+# NO_BACKSLASH_ESCAPES (MySQL) or standard_conforming_strings (PostgreSQL),
+# so a query is checked under both readings
+_SINGLE_QUOTED = r"'(?:[^']|'')*'"
+_SINGLE_QUOTED_ESCAPES = r"'(?:[^'\\]|\\.|'')*'"
+_DOUBLE_QUOTED = r'"(?:[^"]|"")*"'
+_DOUBLE_QUOTED_ESCAPES = r'"(?:[^"\\]|\\.|"")*"'
+_BACKTICK_QUOTED = r'`(?:[^`]|``)*`'
+_DOLLAR_QUOTED = r'\$([A-Za-z_][A-Za-z0-9_]*)?\$.*?\$\1\$'
+_QUOTED = {
+    'mysql': [
+        re.compile('|'.join([_SINGLE_QUOTED_ESCAPES, _DOUBLE_QUOTED_ESCAPES, _BACKTICK_QUOTED]), re.S),
+        re.compile('|'.join([_SINGLE_QUOTED, _DOUBLE_QUOTED, _BACKTICK_QUOTED]), re.S),
+    ],
+    'postgresql': [
+        re.compile('|'.join([r'(?<![\w$])[Ee]' + _SINGLE_QUOTED_ESCAPES, _SINGLE_QUOTED,
+                             _DOUBLE_QUOTED, _DOLLAR_QUOTED]), re.S),
+        re.compile('|'.join([_SINGLE_QUOTED_ESCAPES, _DOUBLE_QUOTED, _DOLLAR_QUOTED]), re.S),
+    ],
+}
+
+# Keywords an exported query has no use for: writes, SELECT ... INTO a table
+# or file, and COPY
+_EXPORT_FORBIDDEN = re.compile(r'\b(INSERT|UPDATE|DELETE|MERGE|INTO|COPY)\b', re.I)
+
+
+def _check_export_query(server_type, statement):
+    """Raise ValueError unless statement is a single query without writes or comments.
+    
+    This only rejects the obvious; iter_export also runs ad-hoc queries in a
+    read-only transaction, which is what keeps them from changing anything.
+    """
+    for quoted in _QUOTED[server_type]:
+        _check_export_code(server_type, quoted.sub(' ', statement))
+
+
+def _check_export_code(server_type, code):
+    """Check a query whose strings and quoted identifiers have been blanked out."""
+    if any(mark in code for mark in ("'", '"', '`', '$$')):
+        raise ValueError('The query has an unterminated string or identifier')
+    if ';' in code:
+        raise ValueError('Only a single SELECT query can be exported')
+    if '--' in code or '/*' in code or (server_type == 'mysql' and '#' in code):
+        raise ValueError('Comments are not allowed in an exported query')
+    
+    depth = 0
+    for char in code:
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        if depth < 0:
+            break
+    if depth != 0:
+        raise ValueError('The query has unbalanced parentheses')
+    
+    match = _EXPORT_FORBIDDEN.search(code)
+    if match:
+        raise ValueError(f"{match.group(1).upper()} is not allowed in an exported query")
+
+
+def build_export_query(server_type, table=None, query=None):
+    """Build the SELECT statement for a table or ad-hoc query export."""
+    if table:
+        return f"SELECT * FROM {quote_table_name(server_type, table)}"
+    
+    statement = (query or '').strip().rstrip(';').strip()
+    if not statement.upper().startswith(('SELECT', 'WITH')):
+        raise ValueError('Only a single SELECT query can be exported')
+    _check_export_query(server_type, statement)
+    return statement
+
+
+def _start_read_only(conn, server_type):
+    """Make the connection's current transaction read-only."""
+    cursor = conn.cursor()
+    if server_type == 'postgresql':
+        # psycopg2 opens the transaction with this statement, so the export's
+        # queries, COPY included, run in it
+        cursor.execute('SET TRANSACTION READ ONLY')
+    else:
+        cursor.execute('START TRANSACTION READ ONLY')
+    cursor.close()
+
+
+class _RowEncoder:
+    """Encode batches of result rows as CSV or NDJSON text."""
+    
+    def __init__(self, fmt, columns):
+        self.fmt = fmt
+        self.columns = columns
+        self.header_written = False
+    
+    def encode(self, rows):
+        if self.fmt == 'ndjson':
+            return ''.join(
+                json.dumps(dict(zip(self.columns, row)), default=str) + '\n' for row in rows
+            )
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if not self.header_written:
+            writer.writerow(self.columns)
+            self.header_written = True
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+
+class _QueueWriter:
+    """File-like sink that hands COPY output to a bounded queue in chunks."""
+    
+    def __init__(self, chunks, stop):
+        self.chunks = chunks
+        self.stop = stop
+        self.buffer = bytearray()
+    
+    def put(self, item):
+        while True:
+            if self.stop.is_set():
+                raise IOError('Export cancelled')
+            try:
+                self.chunks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+    
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.buffer.extend(data)
+        if len(self.buffer) >= _COPY_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+    
+    def flush(self):
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+
+
+def _iter_copy_to_stdout(conn, sql):
+    """Yield the output of a PostgreSQL COPY ... TO STDOUT as byte chunks.
+    
+    psycopg2 pushes COPY data into a file object, so the copy runs in a helper
+    thread feeding a bounded queue; memory use is capped by the queue size.
+    """
+    chunks = queue.Queue(maxsize=16)
+    stop = threading.Event()
+    writer = _QueueWriter(chunks, stop)
+    
+    def run():
+        try:
+            cursor = conn.cursor()
+            cursor.copy_expert(sql, writer)
+            writer.flush()
+            cursor.close()
+            writer.put(_COPY_DONE)
+        except Exception as e:
+            if not stop.is_set():
+                writer.put(e)
+    
+    thread = threading.Thread(target=run, name='nexdb-copy-export', daemon=True)
+    thread.start()
+    
+    try:
+        while True:
+            item = chunks.get()
+            if item is _COPY_DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        if thread.is_alive():
+            # The client went away: stop the query on the server so the copy
+            # ends now rather than after the whole result has been read
+            try:
+                conn.cancel()
+            except Exception as e:
+                logging.error(f"Error cancelling export query: {str(e)}")
+        thread.join()
+
+
+def _iter_cursor_batches(cursor, batch_size):
+    """Yield batches of rows from a streaming cursor."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def _iter_encoded(cursor, fmt, batch_size, columns_from):
+    """Yield encoded row batches from a streaming cursor."""
+    encoder = None
+    for rows in _iter_cursor_batches(cursor, batch_size):
+        if encoder is None:
+            encoder = _RowEncoder(fmt, columns_from(cursor))
+        yield encoder.encode(rows).encode('utf-8')
+    
+    # An empty result still gets its header row, as PostgreSQL's COPY gives
+    if encoder is None and fmt == 'csv' and cursor.description is not None:
+        yield _RowEncoder(fmt, columns_from(cursor)).encode([]).encode('utf-8')
+
+
+def compress_chunks(chunks, compression=None):
+    """Optionally gzip-compress a stream of byte chunks."""
+    if not compression:
+        yield from chunks
+        return
+    
+    if compression != 'gzip':
+        raise ValueError(f"Unsupported compression: {compression}")
+    
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_export(server, database_name, table=None, query=None, fmt='csv', compression=None,
+                batch_size=None):
+    """Stream a table or the result of a SELECT query as CSV, NDJSON, Arrow or Parquet bytes.
+    
+    PostgreSQL CSV exports of a table use COPY ... TO STDOUT; other exports read
+    from a server-side (PostgreSQL) or unbuffered (MySQL) cursor in batches, so
+    memory use stays constant regardless of the result size. Arrow and Parquet
+    exports are written one record batch (row group) at a time. Every export
+    runs in a read-only transaction, and an ad-hoc query is never put inside a
+    COPY statement.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        raise ValueError(f"The {fmt} format requires pyarrow to be installed")
+    if server.server_type not in ('postgresql', 'mysql'):
+        raise ValueError(f"Unsupported database type: {server.server_type}")
+    sql = build_export_query(server.server_type, table=table, query=query)
+    
+    if fmt in COLUMNAR_FORMATS:
+        batch_size = batch_size or current_app.config.get('COLUMNAR_BATCH_SIZE', 65536)
+    else:
+        batch_size = batch_size or current_app.config.get('EXPORT_BATCH_SIZE', 5000)
+    
+    if server.server_type == 'postgresql':
+        conn = connect_to_server(server, database_name)
+    else:
+        conn = connect_to_server(server, database_name, cursorclass=pymysql.cursors.SSCursor)
+    
+    try:
+        _start_read_only(conn, server.server_type)
+        if server.server_type == 'postgresql' and fmt == 'csv' and table:
+            chunks = _iter_copy_to_stdout(conn, f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)")
+        else:
+            if server.server_type == 'postgresql':
+                cursor = conn.cursor(name='nexdb_export')
+                cursor.itersize = batch_size
+            else:
+                cursor = conn.cursor()
+            cursor.execute(sql)
+            
+            if fmt in COLUMNAR_FORMATS:
+                batches = iter_record_batches(cursor, server.server_type, batch_size)
+                chunks = iter_columnar(batches, fmt)
+            else:
+                chunks = _iter_encoded(cursor, fmt, batch_size,
+                                       lambda c: [col[0] for col in c.description])
+        
+        yield from compress_chunks(chunks, compression)
+    finally:
+        conn.close()
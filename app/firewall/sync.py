@@ -0,0 +1,257 @@
+"""
+NEXDB - Firewall reconciliation
+
+The desired state is the set of (source, port, protocol) tuples opened by
+the FirewallRule rows, where the port is the server's. Only servers running
+on this host are opened, and never a protected port (ssh, the panel, the
+introspection API); see firewall_policy. A sync reads
+`ufw status numbered` once, compares the rules tagged with
+FIREWALL_RULE_COMMENT against the desired set, and applies only the
+difference in one pass: deletions by rule number from the highest number
+down, so the remaining numbers stay valid without reading the status again,
+then additions. Rules without the tag (ssh, the panel port, anything added
+by hand) are never touched.
+
+Committing a change to rules, a server's port or a deletion that cascades
+to rules syncs the firewall through the session hooks below. Syncs are
+serialized across worker processes by FIREWALL_LOCK_FILE.
+"""
+
+import logging
+import os
+import socket
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.utils import import_string
+from app import db
+from app.models.database_server import DatabaseServer, Database
+from app.models.firewall import FirewallRule
+from app.firewall.ufw import (UfwRunner, parse_status, rule_key, normalize_source,
+                              allow_args, delete_args)
+
+FIREWALL_SYNC_KEY = 'nexdb_firewall_sync'
+FIREWALL_RESULT_KEY = 'nexdb_firewall_result'
+
+Plan = namedtuple('Plan', ['add', 'delete', 'unchanged'])
+
+firewall_rules = FirewallRule.__table__
+servers = DatabaseServer.__table__
+
+
+def firewall_policy(app=None):
+    """Return the local host names and the protected ports of the firewall."""
+    app = app or current_app._get_current_object()
+    local_hosts = set(app.config.get('FIREWALL_LOCAL_HOSTS') or ())
+    local_hosts.add(socket.gethostname().lower())
+    return local_hosts, set(app.config.get('FIREWALL_PROTECTED_PORTS') or ())
+
+
+def server_rule_error(server, app=None):
+    """Return why the firewall must not open a server's port, or None."""
+    local_hosts, protected_ports = firewall_policy(app)
+    if (server.host or '').lower() not in local_hosts:
+        return f"{server.host} is not this host, so its port cannot be opened here"
+    if server.port in protected_ports:
+        return f"Port {server.port} is reserved and cannot be opened"
+    return None
+
+
+def desired_rules(conn, local_hosts, protected_ports):
+    """Return the (source, port, protocol) tuples the stored rules open.
+    
+    Rules of servers on other hosts or on protected ports are left out, so a
+    sync removes any ufw rule NEXDB once added for them.
+    """
+    rows = conn.execute(
+        db.select(firewall_rules.c.source, servers.c.host, servers.c.port).distinct().
+        join(servers, servers.c.id == firewall_rules.c.server_id)
+    )
+    return {(source, port, 'tcp') for source, host, port in rows
+            if (host or '').lower() in local_hosts and port not in protected_ports}
+
+
+def get_runner(app=None):
+    """Return the ufw command runner configured by FIREWALL_RUNNER."""
+    app = app or current_app._get_current_object()
+    runner = app.extensions.get('nexdb_firewall_runner')
+    if runner is None:
+        setting = app.config.get('FIREWALL_RUNNER')
+        if setting is None:
+            runner = UfwRunner(app.config.get('FIREWALL_UFW_COMMAND', 'sudo -n /usr/sbin/ufw'))
+        else:
+            if isinstance(setting, str):
+                setting = import_string(setting)
+            runner = setting() if isinstance(setting, type) else setting
+        app.extensions['nexdb_firewall_runner'] = runner
+    return runner
+
+
+def plan_changes(current, desired, comment):
+    """Compute the minimal changes turning the tagged ufw rules into `desired`."""
+    add = set(desired)
+    delete = []
+    unchanged = 0
+    for rule in current:
+        key = rule_key(rule)
+        if rule.comment != comment:
+            # A matching rule added by hand already opens the port
+            add.discard(key)
+            continue
+        if key in add:
+            add.discard(key)
+            unchanged += 1
+        else:
+            # Stale, malformed or duplicate tagged rule
+            delete.append(rule)
+    delete.sort(key=lambda rule: rule.number, reverse=True)
+    return Plan(sorted(add, key=lambda key: (key[1], key[0])), delete, unchanged)
+
+
+def apply_plan(runner, plan, comment):
+    """Run the deletions and additions of a plan; returns the failed commands."""
+    errors = []
+    commands = [delete_args(rule.number) for rule in plan.delete]
+    commands += [allow_args(source, port, protocol, comment) for source, port, protocol in plan.add]
+    for args in commands:
+        result = runner.run(args)
+        if result.returncode != 0:
+            errors.append(f"ufw {' '.join(args)}: {(result.stderr or result.stdout).strip()}")
+    return errors
+
+
+@contextmanager
+def _firewall_lock(app):
+    """Hold the host-wide firewall lock, waiting for other processes."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    path = app.config.get('FIREWALL_LOCK_FILE') or os.path.join(app.instance_path, 'firewall.lock')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def sync_firewall(app=None, dry_run=False):
+    """Bring the host's UFW rules in line with the stored firewall rules."""
+    app = app or current_app._get_current_object()
+    if not app.config.get('FIREWALL_ENABLED', False):
+        return {'success': False, 'message': 'Firewall management is disabled'}
+    comment = app.config.get('FIREWALL_RULE_COMMENT', 'nexdb')
+    runner = get_runner(app)
+    started = time.perf_counter()
+    
+    try:
+        with _firewall_lock(app):
+            with db.engine.connect() as conn:
+                desired = desired_rules(conn, *firewall_policy(app))
+            status = runner.run(['status', 'numbered'])
+            if status.returncode != 0:
+                return {'success': False,
+                        'message': f"ufw status failed: {(status.stderr or status.stdout).strip()}"}
+            active, current = parse_status(status.stdout)
+            if not active:
+                return {'success': False, 'message': 'UFW is inactive'}
+            plan = plan_changes(current, desired, comment)
+            errors = [] if dry_run else apply_plan(runner, plan, comment)
+    except Exception as e:
+        logging.error(f"Firewall sync error: {str(e)}")
+        return {'success': False, 'message': f"Firewall sync failed: {str(e)}"}
+    
+    if errors:
+        logging.error(f"Firewall sync errors: {'; '.join(errors)}")
+    return {
+        'success': not errors,
+        'message': '; '.join(errors),
+        'dry_run': dry_run,
+        'added': [{'source': source, 'port': port, 'protocol': protocol}
+                  for source, port, protocol in plan.add],
+        'deleted': [{'number': rule.number, 'to': rule.to, 'source': rule.source}
+                    for rule in plan.delete],
+        'unchanged': plan.unchanged,
+        'commands': len(plan.add) + len(plan.delete) + 1,
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+
+
+def replace_server_rules(server, items, created_by=None):
+    """Make a server's rules exactly `items`; returns (added, removed) counts.
+    
+    Each item has a source, and optionally a database name and description.
+    Raises ValueError for invalid sources, unknown databases, or a server
+    whose port the firewall must not open. The caller commits, which syncs
+    the firewall.
+    """
+    if items:
+        error = server_rule_error(server)
+        if error:
+            raise ValueError(error)
+    databases = {database.name: database.id for database in
+                 Database.query.filter_by(server_id=server.id)}
+    wanted = {}
+    for item in items:
+        try:
+            source = normalize_source(item.get('source', ''))
+        except ValueError as e:
+            raise ValueError(f"Invalid source {item.get('source')!r}: {str(e)}")
+        database_id = None
+        if item.get('database'):
+            if item['database'] not in databases:
+                raise ValueError(f"Unknown database {item['database']!r}")
+            database_id = databases[item['database']]
+        wanted.setdefault((source, database_id), item.get('description') or '')
+    
+    existing = {(rule.source, rule.database_id): rule
+                for rule in FirewallRule.query.filter_by(server_id=server.id)}
+    removed = [rule for key, rule in existing.items() if key not in wanted]
+    for rule in removed:
+        db.session.delete(rule)
+    added = [
+        FirewallRule(server_id=server.id, source=source, database_id=database_id,
+                     description=description, created_by=created_by)
+        for (source, database_id), description in wanted.items()
+        if (source, database_id) not in existing
+    ]
+    db.session.add_all(added)
+    return len(added), len(removed)
+
+
+def last_sync_result(session=None):
+    """Return the result of the sync run by the last commit, if any."""
+    return (session or db.session).info.pop(FIREWALL_RESULT_KEY, None)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_firewall_changes(session, flush_context, instances):
+    """Note whether the flush changes the ports opened by stored rules."""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, FirewallRule) or (
+                isinstance(obj, DatabaseServer) and
+                (obj in session.deleted or db.inspect(obj).attrs.port.history.has_changes() or
+                 db.inspect(obj).attrs.host.history.has_changes())):
+            session.info[FIREWALL_SYNC_KEY] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _sync_after_commit(session):
+    """Sync the firewall once rule changes are committed."""
+    if not session.info.pop(FIREWALL_SYNC_KEY, False):
+        return
+    if not current_app or not current_app.config.get('FIREWALL_ENABLED', False):
+        return
+    session.info[FIREWALL_RESULT_KEY] = sync_firewall()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_firewall_changes(session):
+    session.info.pop(FIREWALL_SYNC_KEY, None)
@@ -0,0 +1,159 @@
+"""
+NEXDB - UFW command line
+
+Parses `ufw status numbered`, builds the ufw arguments of allow and delete
+commands, and runs them. Commands go through a runner object with a single
+`run(args)` method returning a subprocess.CompletedProcess, chosen with the
+FIREWALL_RUNNER setting: UfwRunner calls the real ufw through sudo, FakeUfw
+keeps an in-memory rule table that behaves like ufw for tests, benchmarks and
+development machines without a firewall.
+"""
+
+import ipaddress
+import re
+import shlex
+import subprocess
+import time
+from collections import namedtuple
+
+UfwRule = namedtuple('UfwRule', ['number', 'to', 'action', 'direction', 'source', 'comment'])
+
+_RULE_PATTERN = re.compile(
+    r'^\[\s*(?P<number>\d+)\]\s+(?P<to>.+?)\s+(?P<action>ALLOW|DENY|REJECT|LIMIT)'
+    r'(?:\s+(?P<direction>IN|OUT|FWD))?\s+(?P<source>.+?)\s*(?:#\s*(?P<comment>.*?))?\s*$'
+)
+_ANYWHERE = {'Anywhere': '0.0.0.0/0', 'Anywhere (v6)': '::/0'}
+
+
+def normalize_source(value):
+    """Return an address or network the way ufw prints it; raises ValueError."""
+    network = ipaddress.ip_network(str(value).strip(), strict=False)
+    if network.prefixlen == 0:
+        raise ValueError(f"{value} would allow every address")
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+def parse_status(output):
+    """Parse `ufw status numbered` output into an active flag and its rules."""
+    active = False
+    rules = []
+    for line in output.splitlines():
+        line = line.rstrip()
+        if line.startswith('Status:'):
+            active = line.split(':', 1)[1].strip() == 'active'
+            continue
+        match = _RULE_PATTERN.match(line)
+        if match is None:
+            continue
+        source = match.group('source')
+        rules.append(UfwRule(
+            number=int(match.group('number')),
+            to=match.group('to').replace(' (v6)', ''),
+            action=match.group('action'),
+            direction=match.group('direction') or 'IN',
+            source=_ANYWHERE.get(source, source.replace(' (v6)', '')),
+            comment=match.group('comment') or ''
+        ))
+    return active, rules
+
+
+def rule_key(rule):
+    """Return the (source, port, protocol) an allow rule opens, or None."""
+    if rule.action != 'ALLOW' or rule.direction != 'IN':
+        return None
+    port, _, protocol = rule.to.partition('/')
+    if not port.isdigit():
+        return None
+    try:
+        source = normalize_source(rule.source)
+    except ValueError:
+        return None
+    return source, int(port), protocol or 'any'
+
+
+def allow_args(source, port, protocol, comment):
+    """Return the ufw arguments adding an allow rule."""
+    args = ['allow']
+    if protocol != 'any':
+        args += ['proto', protocol]
+    args += ['from', source, 'to', 'any', 'port', str(port)]
+    if comment:
+        args += ['comment', comment]
+    return args
+
+
+def delete_args(number):
+    """Return the ufw arguments deleting a rule by number without prompting."""
+    return ['--force', 'delete', str(number)]
+
+
+class UfwRunner:
+    """Run ufw commands through a command prefix such as `sudo -n /usr/sbin/ufw`."""
+    
+    def __init__(self, command='sudo -n /usr/sbin/ufw', timeout=60):
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        self.timeout = timeout
+    
+    def run(self, args):
+        """Run ufw with the given arguments."""
+        return subprocess.run(self.command + list(args), capture_output=True, text=True,
+                              timeout=self.timeout)
+
+
+class FakeUfw:
+    """An in-memory ufw accepting the commands issued by NEXDB.
+    
+    `latency` seconds are slept per command to stand in for the cost of a
+    real ufw process; every command run is recorded in `calls`.
+    """
+    
+    def __init__(self, rules=(), active=True, latency=0.0):
+        # Each rule is a (to, action, source, comment) tuple
+        self.rules = list(rules)
+        self.active = active
+        self.latency = latency
+        self.calls = []
+    
+    def _result(self, args, returncode=0, stdout='', stderr=''):
+        return subprocess.CompletedProcess(['ufw'] + list(args), returncode, stdout, stderr)
+    
+    def status(self):
+        """Render the rule table like `ufw status numbered`."""
+        if not self.active:
+            return 'Status: inactive\n'
+        lines = ['Status: active', '',
+                 '     To                         Action      From',
+                 '     --                         ------      ----']
+        for number, (to, action, source, comment) in enumerate(self.rules, 1):
+            line = f"[{number:2d}] {to:<26} {action:<11} {source:<25}"
+            if comment:
+                line += f" # {comment}"
+            lines.append(line)
+        return '\n'.join(lines) + '\n\n'
+    
+    def run(self, args):
+        """Apply a status, delete or allow command to the rule table."""
+        args = list(args)
+        self.calls.append(args)
+        if self.latency:
+            time.sleep(self.latency)
+        if args == ['status', 'numbered']:
+            return self._result(args, stdout=self.status())
+        if args[:2] == ['--force', 'delete'] and len(args) == 3 and args[2].isdigit():
+            number = int(args[2])
+            if not 1 <= number <= len(self.rules):
+                return self._result(args, 1, stderr='ERROR: Could not find rule\n')
+            del self.rules[number - 1]
+            return self._result(args, stdout='Rule deleted\n')
+        if args[:1] == ['allow']:
+            options = dict(zip(args[1::2], args[2::2]))
+            protocol = options.get('proto')
+            to = options['port'] + (f"/{protocol}" if protocol else '')
+            rule = (to, 'ALLOW IN', options['from'], options.get('comment', ''))
+            if any(existing[:3] == rule[:3] for existing in self.rules):
+                return self._result(args, stdout='Skipping adding existing rule\n')
+            self.rules.append(rule)
+            return self._result(args, stdout='Rule added\n')
+        return self._result(args, 1, stderr=f"ERROR: Unsupported command: {' '.join(args)}\n")
@@ -0,0 +1,56 @@
+"""
+NEXDB - Template fragment cache
+
+Adds a ``{% cache %}`` tag for expensive template sections::
+
+    {% cache 'dashboard-servers', current_user.id, summary.refreshed_at %}
+        ...
+    {% endcache %}
+
+The rendered HTML is cached under the tuple of the given values. Include a
+version of the underlying data in the key (an updated_at or refreshed_at
+stamp) so a change produces a new key in every worker; invalidate_fragment
+drops a key explicitly in the current process.
+"""
+
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from app.cache import get_cache
+
+
+def _cache():
+    config = current_app.config
+    return get_cache('fragments', config.get('FRAGMENT_CACHE_TTL', 300),
+                     maxsize=config.get('FRAGMENT_CACHE_SIZE', 5000))
+
+
+def invalidate_fragment(*key):
+    """Drop one cached fragment."""
+    _cache().invalidate(tuple(key))
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension implementing the {% cache key, ... %} block."""
+    
+    tags = {'cache'}
+    
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+    
+    def _render_cached(self, key, caller):
+        if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            return caller()
+        return _cache().get_or_load(tuple(key), caller)
+
+
+def init_fragment_cache(app):
+    """Enable the {% cache %} template tag."""
+    app.jinja_env.add_extension(FragmentCacheExtension)
@@ -0,0 +1,3 @@
+"""
+NEXDB - Introspection package
+"""
@@ -0,0 +1,214 @@
+"""
+NEXDB - Async introspection API
+
+An ASGI application serving the read-only introspection endpoints:
+
+    GET /api/introspection/servers/<id>/status
+    GET /api/introspection/servers/<id>/catalog
+    GET /api/introspection/servers/<id>/processes
+    GET /api/introspection/servers/<id>/metrics
+
+These calls spend nearly all their time waiting on the managed server, so
+they are answered from an event loop over the async pools of
+app.introspection.pools instead of each holding a sync worker: one process
+can keep hundreds of them outstanding. Only the short metadata work (the
+JWT, the user, the server row and the project check) runs on the Flask
+application, in a worker thread. Every other path is handed to the Flask
+application through asgiref when it is installed, so the existing sync
+blueprints are served unchanged; see asgi.py at the top of the tree.
+"""
+
+import asyncio
+import datetime
+import decimal
+import json
+import logging
+import re
+import uuid
+from app.introspection.pools import PoolRegistry, IntrospectionUnavailable, server_target
+from app.introspection.queries import KINDS, query_for, shape_result
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+
+_ROUTE = re.compile(r'^/api/introspection/servers/(\d+)/({})/?$'.format('|'.join(KINDS)))
+
+
+class _Refused(Exception):
+    """A request answered with an error before any query was sent."""
+    
+    def __init__(self, status, error, message):
+        super().__init__(message)
+        self.status = status
+        self.error = error
+        self.message = message
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode('utf-8', 'replace')
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return str(value)
+
+
+async def _send_json(send, status, body, headers=()):
+    payload = json.dumps(body, default=_json_default).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode('ascii')),
+            (b'cache-control', b'no-store'),
+            (b'x-content-type-options', b'nosniff'),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+def _bearer_token(scope):
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            scheme, _, token = value.decode('latin-1').partition(' ')
+            if scheme.lower() == 'bearer' and token.strip():
+                return token.strip()
+    return None
+
+
+class IntrospectionApp:
+    """ASGI application for the introspection endpoints of a Flask application."""
+    
+    def __init__(self, flask_app, fallback=None):
+        self.flask_app = flask_app
+        self.fallback = fallback
+        self.timeout = float(flask_app.config.get('INTROSPECTION_QUERY_TIMEOUT', 10))
+        self._pools = None
+    
+    @property
+    def pools(self):
+        # Created on first use so that it belongs to the serving event loop
+        if self._pools is None:
+            from app.api.utils import get_server_connector
+            self._pools = PoolRegistry(self.flask_app.config, get_server_connector(self.flask_app))
+        return self._pools
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == 'http':
+            match = _ROUTE.match(scope['path'])
+            if match:
+                await self._introspect(scope, send, int(match.group(1)), match.group(2))
+                return
+        if self.fallback is not None:
+            await self.fallback(scope, receive, send)
+        elif scope['type'] == 'http':
+            await _send_json(send, 404, {'error': 'Not found',
+                                         'message': 'The requested resource was not found'})
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def close(self):
+        """Close the pools of every server."""
+        if self._pools is not None:
+            await self._pools.close()
+    
+    async def _introspect(self, scope, send, server_id, kind):
+        if scope['method'] not in ('GET', 'HEAD'):
+            await _send_json(send, 405, {'error': 'Method not allowed',
+                                         'message': 'Introspection endpoints only accept GET'},
+                             headers=[(b'allow', b'GET, HEAD')])
+            return
+        
+        try:
+            target = await asyncio.to_thread(self._load_target, _bearer_token(scope), server_id, kind)
+            sql = query_for(target.server_type, kind)
+        except _Refused as e:
+            await _send_json(send, e.status, {'error': e.error, 'message': e.message})
+            return
+        except ValueError as e:
+            await _send_json(send, 400, {'error': 'Bad request', 'message': str(e)})
+            return
+        
+        try:
+            columns, rows = await asyncio.wait_for(self.pools.fetch(target, sql), self.timeout)
+        except asyncio.TimeoutError:
+            await _send_json(send, 504, {'error': 'Gateway timeout',
+                                         'message': f"The server did not answer within {self.timeout:g} seconds"})
+            return
+        except IntrospectionUnavailable as e:
+            await _send_json(send, 503, {'error': 'Service unavailable', 'message': str(e)})
+            return
+        except Exception as e:
+            logging.error(f"Introspection of server {server_id} ({kind}) failed: {str(e)}")
+            await _send_json(send, 502, {'error': 'Bad gateway',
+                                         'message': 'The database server could not be queried'})
+            return
+        
+        await _send_json(send, 200, {'server_id': server_id, kind: shape_result(kind, columns, rows)})
+    
+    def _load_target(self, token, server_id, kind):
+        """Authenticate the request and load the server; runs in a worker thread.
+        
+        Access follows the sync API: members of the server's project may read
+        its status, catalog and metrics. processes shows the query text of
+        every session on the server, so it needs write access, like managing
+        the server does.
+        """
+        from flask_jwt_extended import decode_token
+        from flask_jwt_extended.exceptions import JWTExtendedException
+        from jwt.exceptions import PyJWTError
+        from app import db
+        from app.auth.identity import get_user_snapshot
+        from app.models.database_server import DatabaseServer
+        from app.project.utils import can_access_project, can_manage_servers
+        
+        if token is None:
+            raise _Refused(401, 'Unauthorized', 'Authentication required')
+        
+        with self.flask_app.app_context():
+            try:
+                claims = decode_token(token)
+            except (JWTExtendedException, PyJWTError):
+                raise _Refused(401, 'Unauthorized', 'Invalid or expired token')
+            if claims.get('type') != 'access':
+                raise _Refused(401, 'Unauthorized', 'An access token is required')
+            
+            user = get_user_snapshot(claims.get(self.flask_app.config['JWT_IDENTITY_CLAIM']))
+            if not user or not user.active:
+                raise _Refused(401, 'Unauthorized', 'Authentication required')
+            
+            server = db.session.get(DatabaseServer, server_id)
+            if server is None:
+                raise _Refused(404, 'Not found', 'The requested resource was not found')
+            if server.project is None or not can_access_project(server.project, user.id):
+                raise _Refused(403, 'Forbidden', 'Access denied')
+            if kind == 'processes' and not can_manage_servers(server.project, user.id):
+                raise _Refused(403, 'Forbidden', 'Write access to the project is required')
+            
+            return server_target(server)
+
+
+def create_asgi_app(flask_app):
+    """Serve the introspection endpoints, and the rest of flask_app when asgiref is installed."""
+    fallback = WsgiToAsgi(flask_app) if WsgiToAsgi is not None else None
+    return IntrospectionApp(flask_app, fallback)
@@ -0,0 +1,186 @@
+"""
+NEXDB - Async connection pools for introspection
+
+Introspection queries run on asyncio-native drivers, asyncpg for PostgreSQL
+and aiomysql for MySQL, so that a single event loop can wait on many
+servers at once. Each server gets a small pool of INTROSPECTION_POOL_SIZE
+connections, kept until its credentials change or, once more than
+INTROSPECTION_MAX_POOLS servers have one, until it is the least recently
+used. Both drivers are optional: without one, introspection of that server
+type answers with an error and nothing else is affected.
+
+A SERVER_CONNECTOR with a create_async_pool coroutine, such as the fake
+connector, opens the pools instead of the drivers.
+"""
+
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, namedtuple
+from app.database.provisioning import POSTGRESQL_MAINTENANCE_DB
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+# What the event loop needs to know about a server, read in a worker thread
+ServerTarget = namedtuple('ServerTarget', ['id', 'server_type', 'host', 'port', 'username',
+                                           'password', 'fingerprint'])
+
+
+class IntrospectionUnavailable(RuntimeError):
+    """The driver for a server type is not installed."""
+
+
+def server_target(server):
+    """Return a ServerTarget for a DatabaseServer; needs an app context."""
+    password = server.password
+    fingerprint = hashlib.sha256('\0'.join(
+        [server.server_type, server.host, str(server.port), server.username, password]
+    ).encode('utf-8')).hexdigest()
+    return ServerTarget(server.id, server.server_type, server.host, server.port,
+                        server.username, password, fingerprint)
+
+
+class _AsyncpgPool:
+    """An asyncpg pool behind the fetch/close interface of the registry."""
+    
+    def __init__(self, pool):
+        self.pool = pool
+    
+    async def fetch(self, sql):
+        async with self.pool.acquire() as connection:
+            records = await connection.fetch(sql)
+        columns = list(records[0].keys()) if records else []
+        return columns, [tuple(record) for record in records]
+    
+    async def close(self):
+        await self.pool.close()
+
+
+class _AiomysqlPool:
+    """An aiomysql pool behind the fetch/close interface of the registry."""
+    
+    def __init__(self, pool):
+        self.pool = pool
+    
+    async def fetch(self, sql):
+        async with self.pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(sql)
+                rows = await cursor.fetchall()
+                columns = [column[0] for column in cursor.description or ()]
+        return columns, [tuple(row) for row in rows]
+    
+    async def close(self):
+        self.pool.close()
+        await self.pool.wait_closed()
+
+
+async def open_pool(target, size, timeout, connector=None):
+    """Open a pool of at most size connections to a server."""
+    if connector is not None and hasattr(connector, 'create_async_pool'):
+        return await connector.create_async_pool(target, size=size, timeout=timeout)
+    
+    if target.server_type == 'postgresql':
+        if asyncpg is None:
+            raise IntrospectionUnavailable('PostgreSQL introspection requires asyncpg')
+        pool = await asyncpg.create_pool(
+            host=target.host,
+            port=target.port,
+            user=target.username,
+            password=target.password,
+            database=POSTGRESQL_MAINTENANCE_DB,
+            min_size=0,
+            max_size=size,
+            timeout=timeout,
+            command_timeout=timeout
+        )
+        return _AsyncpgPool(pool)
+    
+    elif target.server_type == 'mysql':
+        if aiomysql is None:
+            raise IntrospectionUnavailable('MySQL introspection requires aiomysql')
+        pool = await aiomysql.create_pool(
+            host=target.host,
+            port=target.port,
+            user=target.username,
+            password=target.password,
+            minsize=0,
+            maxsize=size,
+            connect_timeout=timeout,
+            autocommit=True
+        )
+        return _AiomysqlPool(pool)
+    
+    raise ValueError(f"Unsupported database type: {target.server_type}")
+
+
+class PoolRegistry:
+    """The introspection pools of one event loop, keyed by server id."""
+    
+    def __init__(self, config, connector=None):
+        self.size = int(config.get('INTROSPECTION_POOL_SIZE', 4))
+        self.max_pools = int(config.get('INTROSPECTION_MAX_POOLS', 100))
+        self.timeout = float(config.get('INTROSPECTION_QUERY_TIMEOUT', 10))
+        self.connector = connector
+        self._pools = OrderedDict()
+        self._locks = {}
+        self._closing = set()
+    
+    def __len__(self):
+        return len(self._pools)
+    
+    async def fetch(self, target, sql):
+        """Run a statement on a server; returns (columns, rows)."""
+        pool = await self._pool(target)
+        return await pool.fetch(sql)
+    
+    async def _pool(self, target):
+        entry = self._pools.get(target.id)
+        if entry is not None and entry[0] == target.fingerprint:
+            self._pools.move_to_end(target.id)
+            return entry[1]
+        
+        # One pool is opened per server however many requests are waiting for it
+        lock = self._locks.setdefault(target.id, asyncio.Lock())
+        async with lock:
+            entry = self._pools.get(target.id)
+            if entry is not None and entry[0] == target.fingerprint:
+                self._pools.move_to_end(target.id)
+                return entry[1]
+            if entry is not None:
+                del self._pools[target.id]
+                self._close_later(entry[1])
+            pool = await open_pool(target, self.size, self.timeout, self.connector)
+            self._pools[target.id] = (target.fingerprint, pool)
+            while len(self._pools) > self.max_pools:
+                server_id, (_, evicted) = self._pools.popitem(last=False)
+                self._locks.pop(server_id, None)
+                self._close_later(evicted)
+            return pool
+    
+    def _close_later(self, pool):
+        """Close a pool once the queries still using it are done."""
+        task = asyncio.ensure_future(self._close(pool))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    async def _close(self, pool):
+        try:
+            await pool.close()
+        except Exception as e:
+            logging.error(f"Error closing an introspection pool: {str(e)}")
+    
+    async def close(self):
+        """Close every pool."""
+        pools = [pool for _, pool in self._pools.values()]
+        self._pools.clear()
+        self._locks.clear()
+        await asyncio.gather(*(self._close(pool) for pool in pools), *self._closing)
@@ -0,0 +1,121 @@
+"""
+NEXDB - Introspection queries
+
+The read-only statements behind each introspection endpoint, per server
+type, and how their results are shaped for the response. None of them take
+parameters, so they run unchanged on asyncpg, aiomysql and the fake
+connector.
+"""
+
+from app.database.inventory import MYSQL_SYSTEM_DATABASES
+
+KINDS = ('status', 'catalog', 'processes', 'metrics')
+
+# Longest query text returned for a process
+QUERY_TEXT_LIMIT = 1000
+
+_MYSQL_SYSTEM = ', '.join(f"'{name}'" for name in sorted(MYSQL_SYSTEM_DATABASES))
+
+# Global status counters reported by the MySQL metrics endpoint
+MYSQL_METRICS = (
+    'Aborted_connects', 'Bytes_received', 'Bytes_sent', 'Com_commit', 'Com_delete',
+    'Com_insert', 'Com_rollback', 'Com_select', 'Com_update', 'Innodb_buffer_pool_read_requests',
+    'Innodb_buffer_pool_reads', 'Innodb_row_lock_waits', 'Queries', 'Slow_queries',
+    'Threads_connected', 'Threads_running', 'Uptime',
+)
+
+MYSQL_QUERIES = {
+    'status': """
+        SELECT VERSION() AS version, @@hostname AS hostname,
+               (SELECT VARIABLE_VALUE FROM performance_schema.global_status
+                WHERE VARIABLE_NAME = 'Uptime') AS uptime_seconds,
+               (SELECT COUNT(*) FROM information_schema.PROCESSLIST) AS connections,
+               @@max_connections AS max_connections, @@read_only AS read_only
+    """,
+    'catalog': f"""
+        SELECT s.SCHEMA_NAME AS name, s.DEFAULT_CHARACTER_SET_NAME AS encoding,
+               COUNT(t.TABLE_NAME) AS tables,
+               COALESCE(SUM(t.DATA_LENGTH + t.INDEX_LENGTH), 0) AS size_bytes
+        FROM information_schema.SCHEMATA s
+        LEFT JOIN information_schema.TABLES t ON t.TABLE_SCHEMA = s.SCHEMA_NAME
+        WHERE s.SCHEMA_NAME NOT IN ({_MYSQL_SYSTEM})
+        GROUP BY s.SCHEMA_NAME, s.DEFAULT_CHARACTER_SET_NAME
+        ORDER BY s.SCHEMA_NAME
+    """,
+    'processes': f"""
+        SELECT ID AS id, USER AS user, HOST AS host, DB AS database_name,
+               COMMAND AS command, STATE AS state, TIME AS seconds,
+               LEFT(INFO, {QUERY_TEXT_LIMIT}) AS query
+        FROM information_schema.PROCESSLIST
+        WHERE ID <> CONNECTION_ID()
+        ORDER BY TIME DESC
+    """,
+    'metrics': """
+        SELECT VARIABLE_NAME AS name, VARIABLE_VALUE AS value
+        FROM performance_schema.global_status
+        WHERE VARIABLE_NAME IN ({})
+    """.format(', '.join(f"'{name}'" for name in MYSQL_METRICS)),
+}
+
+POSTGRESQL_QUERIES = {
+    'status': """
+        SELECT version() AS version, inet_server_addr()::text AS hostname,
+               EXTRACT(EPOCH FROM now() - pg_postmaster_start_time())::bigint AS uptime_seconds,
+               (SELECT count(*) FROM pg_stat_activity) AS connections,
+               current_setting('max_connections')::int AS max_connections,
+               pg_is_in_recovery() AS read_only
+    """,
+    # pg_database_size fails on databases the login cannot connect to
+    'catalog': """
+        SELECT datname AS name, pg_encoding_to_char(encoding) AS encoding,
+               CASE WHEN has_database_privilege(datname, 'CONNECT')
+                    THEN pg_database_size(datname) END AS size_bytes
+        FROM pg_database
+        WHERE NOT datistemplate AND datname <> 'postgres'
+        ORDER BY datname
+    """,
+    'processes': f"""
+        SELECT pid AS id, usename AS user, client_addr::text AS host,
+               datname AS database_name, backend_type AS command, state,
+               EXTRACT(EPOCH FROM now() - query_start)::bigint AS seconds,
+               left(query, {QUERY_TEXT_LIMIT}) AS query
+        FROM pg_stat_activity
+        WHERE pid <> pg_backend_pid()
+        ORDER BY query_start NULLS LAST
+    """,
+    'metrics': """
+        SELECT sum(numbackends) AS connections, sum(xact_commit) AS xact_commit,
+               sum(xact_rollback) AS xact_rollback, sum(blks_read) AS blks_read,
+               sum(blks_hit) AS blks_hit, sum(tup_returned) AS tup_returned,
+               sum(tup_fetched) AS tup_fetched, sum(tup_inserted) AS tup_inserted,
+               sum(tup_updated) AS tup_updated, sum(tup_deleted) AS tup_deleted,
+               sum(conflicts) AS conflicts, sum(deadlocks) AS deadlocks,
+               sum(temp_bytes) AS temp_bytes
+        FROM pg_stat_database
+    """,
+}
+
+
+def query_for(server_type, kind):
+    """Return the statement for an introspection kind, raising ValueError otherwise."""
+    queries = {'mysql': MYSQL_QUERIES, 'postgresql': POSTGRESQL_QUERIES}.get(server_type)
+    if queries is None:
+        raise ValueError(f"Unsupported database type: {server_type}")
+    if kind not in queries:
+        raise ValueError(f"Unknown introspection kind: {kind}")
+    return queries[kind]
+
+
+def shape_result(kind, columns, rows):
+    """Turn columns and rows into the response body for an introspection kind.
+    
+    status is one row as a dictionary, catalog and processes are lists of
+    row dictionaries, and metrics is one dictionary built from name/value
+    rows (MySQL) or from the single summary row (PostgreSQL).
+    """
+    records = [dict(zip(columns, row)) for row in rows]
+    if kind in ('catalog', 'processes'):
+        return records
+    if kind == 'metrics' and list(columns) == ['name', 'value']:
+        return {record['name']: record['value'] for record in records}
+    return records[0] if records else {}
@@ -0,0 +1,171 @@
+"""
+NEXDB - Application lifecycle
+
+create_app only wires the application together. Work with side effects is
+deferred until the first request: creating missing tables and starting the
+background services (the APScheduler thread and the last-seen flush thread).
+CLI commands therefore start quickly and never spawn scheduler threads.
+
+Under ``gunicorn --preload`` the application is built once in the master and
+the workers are forked from it, sharing its memory copy-on-write. The master
+calls prepare_for_fork before the first fork and every worker calls
+after_fork right after it (see gunicorn.conf.py). The master never handles
+requests, so no threads or pooled connections exist when the workers fork.
+The last-seen flush thread runs in every worker, since each keeps its own
+pending timestamps; the scheduler runs only in the worker holding the
+scheduler lock file.
+"""
+
+import gc
+import importlib
+import logging
+import os
+import threading
+import time
+from app import db, scheduler
+
+_lock = threading.Lock()
+
+
+def _state(app):
+    return app.extensions.setdefault('nexdb_lifecycle', {
+        'schema_ready': False,
+        'services_started': False,
+        'scheduler_started': False,
+        'scheduler_lock': None,
+        'scheduler_checked_at': 0.0,
+    })
+
+
+def ensure_schema(app):
+    """Create missing tables once per process when AUTO_CREATE_SCHEMA is on."""
+    state = _state(app)
+    if state['schema_ready']:
+        return False
+    with _lock:
+        if state['schema_ready']:
+            return False
+        if app.config.get('AUTO_CREATE_SCHEMA', True):
+            with app.app_context():
+                db.create_all()
+        state['schema_ready'] = True
+    return True
+
+
+def _acquire_scheduler_lock(app):
+    """Try to become the process that runs the scheduler on this host.
+    
+    The lock is an flock on SCHEDULER_LOCK_FILE, held until the process exits,
+    so it passes to another worker when the scheduling worker dies.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # No flock (Windows): a single process is assumed
+        return True
+    path = app.config.get('SCHEDULER_LOCK_FILE') or os.path.join(app.instance_path, 'scheduler.lock')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _state(app)['scheduler_lock'] = lock_file
+    return True
+
+
+def start_scheduler(app):
+    """Start the scheduler if this process can take the scheduler lock."""
+    state = _state(app)
+    if state['scheduler_started']:
+        return False
+    state['scheduler_checked_at'] = time.monotonic()
+    if not _acquire_scheduler_lock(app):
+        return False
+    from app.database.inventory import init_inventory_sync
+    init_inventory_sync(app)
+    scheduler.start()
+    state['scheduler_started'] = True
+    logging.info(f"Scheduler started in process {os.getpid()}")
+    return True
+
+
+def start_background_services(app):
+    """Start this process's last-seen flushes and, if designated, the scheduler."""
+    state = _state(app)
+    if state['services_started']:
+        return False
+    with _lock:
+        if state['services_started']:
+            return False
+        from app.auth.activity import init_activity_tracking
+        init_activity_tracking(app)
+        start_scheduler(app)
+        state['services_started'] = True
+    return True
+
+
+def prepare_for_fork(app):
+    """Warm the preloaded master up so workers share as much memory as possible.
+    
+    Creates the schema, imports PRELOAD_MODULES, compiles the templates, then
+    closes every pooled connection and moves the surviving objects out of the
+    garbage collector's reach so the workers do not touch (and copy) their pages.
+    """
+    ensure_schema(app)
+    for name in app.config.get('PRELOAD_MODULES', ()):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    """Reset process-local state inherited from the master in a new worker."""
+    global _lock
+    _lock = threading.Lock()
+    
+    # The inherited pools may hold the master's connections; drop them without
+    # closing, which would also close them for the master
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    
+    from app.cache import reset_caches_after_fork
+    from app.auth.activity import activity_tracker
+    reset_caches_after_fork()
+    activity_tracker.reset()
+    
+    state = _state(app)
+    state.update(services_started=False, scheduler_started=False,
+                 scheduler_lock=None, scheduler_checked_at=0.0)
+
+
+def init_lifecycle(app):
+    """Run the deferred startup work before the first request is handled."""
+    state = _state(app)
+    retry = app.config.get('SCHEDULER_LOCK_RETRY', 30)
+    
+    @app.before_request
+    def _before_first_request():
+        if not app.config.get('START_BACKGROUND_SERVICES', True):
+            if not state['schema_ready']:
+                ensure_schema(app)
+            return
+        if state['services_started']:
+            # Take over the scheduler if the worker running it has exited
+            if not state['scheduler_started'] and \
+                    time.monotonic() - state['scheduler_checked_at'] >= retry:
+                with _lock:
+                    start_scheduler(app)
+            return
+        ensure_schema(app)
+        start_background_services(app)
@@ -0,0 +1,250 @@
+"""
+NEXDB - Prometheus metrics
+
+Serves /metrics in the Prometheus text format when prometheus_client is
+installed and METRICS_ENABLED is on. Outside debug and testing, /metrics is
+only served with a METRICS_TOKEN that scrapes must present, since the
+panel's port is usually reachable from outside. Covered are request latency per
+blueprint and endpoint, ORM query counts and durations, backup durations and
+bytes by stage, scheduler job lag and outcomes, S3 transfer bytes and time,
+and the hit/miss counters of the in-process caches.
+
+Under gunicorn, gunicorn.conf.py points PROMETHEUS_MULTIPROC_DIR at a
+directory where every worker keeps its values in memory-mapped files, and a
+scrape served by any worker aggregates all of them. Recording a value is a
+dictionary lookup and an in-memory write; the cache counters, which are hit
+far more often than anything else, are copied into Prometheus counters at
+most once per CACHE_SYNC_INTERVAL per worker instead of on every lookup.
+"""
+
+import hmac
+import logging
+import os
+import re
+import time
+from types import SimpleNamespace
+from flask import request, g, Response
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:
+    prometheus_client = None
+
+CACHE_SYNC_INTERVAL = 1.0
+
+QUERY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 10.0)
+BACKUP_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600)
+LAG_BUCKETS = (.01, .05, .1, .25, .5, 1, 2.5, 5, 15, 60, 300)
+
+_STATEMENTS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'BEGIN', 'COMMIT', 'ROLLBACK'}
+_JOB_SUFFIX = re.compile(r'_\d+$')
+
+metrics = None
+# Labelled children by label values; labels() itself costs a lock and a few
+# string conversions per call
+_request_children = {}
+_query_children = {}
+_cache_exported = {}
+_cache_synced_at = 0.0
+
+
+def _create_metrics():
+    return SimpleNamespace(
+        request_duration=Histogram(
+            'nexdb_http_request_duration_seconds', 'Time spent handling requests.',
+            ['blueprint', 'endpoint', 'method']),
+        requests=Counter(
+            'nexdb_http_requests_total', 'Requests handled, by response status.',
+            ['blueprint', 'endpoint', 'method', 'status']),
+        query_duration=Histogram(
+            'nexdb_db_query_duration_seconds', 'Metadata store query time by statement type.',
+            ['statement'], buckets=QUERY_BUCKETS),
+        backup_stage_duration=Histogram(
+            'nexdb_backup_stage_duration_seconds', 'Time spent in each backup stage.',
+            ['stage', 'server_type'], buckets=BACKUP_BUCKETS),
+        backup_stage_bytes=Counter(
+            'nexdb_backup_stage_bytes_total', 'Bytes produced or moved by each backup stage.',
+            ['stage', 'server_type']),
+        backups=Counter(
+            'nexdb_backups_total', 'Backups finished, by status.',
+            ['server_type', 'status']),
+        job_lag=Histogram(
+            'nexdb_scheduler_job_lag_seconds', 'Delay between a job run\'s scheduled and actual start.',
+            ['job'], buckets=LAG_BUCKETS),
+        jobs=Counter(
+            'nexdb_scheduler_jobs_total', 'Scheduled job runs, by outcome.',
+            ['job', 'outcome']),
+        s3_bytes=Counter(
+            'nexdb_s3_transfer_bytes_total', 'Bytes transferred to or from S3.',
+            ['operation']),
+        s3_seconds=Counter(
+            'nexdb_s3_transfer_seconds_total', 'Time spent transferring to or from S3.',
+            ['operation']),
+        cache_requests=Counter(
+            'nexdb_cache_requests_total', 'In-process cache lookups, by result.',
+            ['cache', 'result']),
+        cache_entries=Gauge(
+            'nexdb_cache_entries', 'Entries held by the in-process caches.',
+            ['cache'], multiprocess_mode='livesum'),
+    )
+
+
+def observe_backup_stage(stage, seconds, size_bytes=None, server_type='unknown'):
+    """Record the duration, and optionally the bytes, of one backup stage."""
+    if metrics is None:
+        return
+    metrics.backup_stage_duration.labels(stage, server_type).observe(seconds)
+    if size_bytes is not None:
+        metrics.backup_stage_bytes.labels(stage, server_type).inc(size_bytes)
+
+
+def count_backup(status, server_type='unknown'):
+    """Count a finished backup."""
+    if metrics is not None:
+        metrics.backups.labels(server_type, status).inc()
+
+
+def observe_s3_transfer(operation, size_bytes, seconds):
+    """Record one S3 transfer; throughput is the ratio of the two counters' rates."""
+    if metrics is None:
+        return
+    metrics.s3_bytes.labels(operation).inc(size_bytes)
+    metrics.s3_seconds.labels(operation).inc(seconds)
+
+
+def sync_cache_metrics(force=False):
+    """Copy the cache counters gathered since the last sync into Prometheus."""
+    global _cache_synced_at
+    now = time.monotonic()
+    if metrics is None or (not force and now - _cache_synced_at < CACHE_SYNC_INTERVAL):
+        return
+    _cache_synced_at = now
+    from app.cache import cache_stats
+    for stats in cache_stats():
+        name = stats['name']
+        for key, result in (('hits', 'hit'), ('misses', 'miss')):
+            # Counters start over in a forked worker; count from zero then
+            previous = _cache_exported.get((name, key), 0)
+            if stats[key] < previous:
+                previous = 0
+            if stats[key] > previous:
+                metrics.cache_requests.labels(name, result).inc(stats[key] - previous)
+            _cache_exported[(name, key)] = stats[key]
+        metrics.cache_entries.labels(name).set(stats['size'])
+
+
+def _start_timer():
+    g._metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is not None:
+        rule = request.url_rule
+        key = (rule.endpoint if rule is not None else 'unmatched', request.method, response.status_code)
+        children = _request_children.get(key)
+        if children is None:
+            labels = (request.blueprint or 'app', key[0], key[1])
+            children = _request_children.setdefault(key, (
+                metrics.request_duration.labels(*labels),
+                metrics.requests.labels(*labels, key[2])
+            ))
+        children[0].observe(time.perf_counter() - started)
+        children[1].inc()
+    sync_cache_metrics()
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    words = statement[:32].split(None, 1)
+    verb = words[0].upper() if words else ''
+    child = _query_children.get(verb)
+    if child is None:
+        child = _query_children.setdefault(
+            verb, metrics.query_duration.labels(verb if verb in _STATEMENTS else 'OTHER'))
+    child.observe(time.perf_counter() - started)
+
+
+def _job_name(job_id):
+    # backup_12 and backup_13 are the same kind of job
+    return _JOB_SUFFIX.sub('', job_id or 'unknown')
+
+
+def _scheduler_listener(event):
+    from apscheduler import events
+    job = _job_name(event.job_id)
+    if event.code == events.EVENT_JOB_SUBMITTED:
+        now = time.time()
+        for run_time in event.scheduled_run_times:
+            metrics.job_lag.labels(job).observe(max(0.0, now - run_time.timestamp()))
+    elif event.code == events.EVENT_JOB_EXECUTED:
+        metrics.jobs.labels(job, 'executed').inc()
+    elif event.code == events.EVENT_JOB_ERROR:
+        metrics.jobs.labels(job, 'error').inc()
+    elif event.code == events.EVENT_JOB_MISSED:
+        metrics.jobs.labels(job, 'missed').inc()
+    elif event.code == events.EVENT_JOB_MAX_INSTANCES:
+        metrics.jobs.labels(job, 'skipped').inc()
+
+
+def metrics_view():
+    """Serve every worker's metrics in the Prometheus text format."""
+    from flask import current_app
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            # Plain text for the scraper rather than the HTML error page
+            return Response('Unauthorized\n', 401, {'WWW-Authenticate': 'Bearer'},
+                            mimetype='text/plain')
+    sync_cache_metrics(force=True)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry),
+                    content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """Register the metric hooks and the /metrics endpoint."""
+    global metrics
+    if prometheus_client is None or not app.config.get('METRICS_ENABLED', False):
+        return False
+    if not app.config.get('METRICS_TOKEN') and not (app.debug or app.testing):
+        logging.error("Metrics are disabled: set METRICS_TOKEN to serve /metrics outside debug and testing")
+        return False
+    if metrics is None:
+        metrics = _create_metrics()
+    
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    
+    from sqlalchemy import event
+    from app import db, limiter, scheduler
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'after_cursor_execute', _after_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    
+    from apscheduler import events
+    if not getattr(scheduler, '_nexdb_metrics_listener', False):
+        scheduler._nexdb_metrics_listener = True
+        scheduler.add_listener(_scheduler_listener,
+                               events.EVENT_JOB_SUBMITTED | events.EVENT_JOB_EXECUTED |
+                               events.EVENT_JOB_ERROR | events.EVENT_JOB_MISSED |
+                               events.EVENT_JOB_MAX_INSTANCES)
+    
+    app.add_url_rule('/metrics', 'metrics', limiter.exempt(metrics_view))
+    return True
@@ -5,4 +5,6 @@ NEXDB - Models package
 from app.models.user import User, Role
 from app.models.project import Project
 from app.models.database_server import DatabaseServer, Database, DatabaseUser
-from app.models.backup import Backup, BackupSchedule 
\ No newline at end of file
+from app.models.backup import Backup, BackupSchedule
+from app.models.dashboard import DashboardSummary
+from app.models.firewall import FirewallRule
\ No newline at end of file
@@ -9,6 +9,10 @@ from app import db
 class Backup(db.Model):
     """Backup model for database backups."""
     __tablename__ = 'backups'
+    __table_args__ = (
+        # Serves both lookups by database and "latest backups" listings
+        db.Index('ix_backups_database_id_created_at', 'database_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -18,19 +22,20 @@ class Backup(db.Model):
     location = db.Column(db.String(20), default='local')  # local, s3
     s3_path = db.Column(db.String(255))
     database_id = db.Column(db.Integer, db.ForeignKey('databases.id'), nullable=False)
-    metadata = db.Column(db.Text)  # JSON-encoded metadata
+    # 'metadata' is reserved on declarative models, so the attribute is renamed
+    metadata_json = db.Column('metadata', db.Text)  # JSON-encoded metadata
     
     @property
     def metadata_dict(self):
         """Return metadata as a dictionary."""
-        if not self.metadata:
+        if not self.metadata_json:
             return {}
-        return json.loads(self.metadata)
+        return json.loads(self.metadata_json)
     
     @metadata_dict.setter
     def metadata_dict(self, metadata_dict):
         """Store metadata dictionary as JSON."""
-        self.metadata = json.dumps(metadata_dict)
+        self.metadata_json = json.dumps(metadata_dict)
     
     def __repr__(self):
         return f'<Backup {self.filename}>'
@@ -41,7 +46,7 @@ class BackupSchedule(db.Model):
     __tablename__ = 'backup_schedules'
     
     id = db.Column(db.Integer, primary_key=True)
-    database_id = db.Column(db.Integer, db.ForeignKey('databases.id'), nullable=False)
+    database_id = db.Column(db.Integer, db.ForeignKey('databases.id'), nullable=False, index=True)
     frequency = db.Column(db.String(20), nullable=False)  # daily, weekly, monthly
     time = db.Column(db.Time, nullable=False)  # Time of day to run backup
     day_of_week = db.Column(db.Integer)  # 0=Monday, 6=Sunday (for weekly backups)
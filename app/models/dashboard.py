@@ -0,0 +1,40 @@
+"""
+NEXDB - Dashboard summary model
+"""
+
+from datetime import datetime
+import json
+from app import db
+
+class DashboardSummary(db.Model):
+    """Precomputed dashboard figures for one user.
+    
+    Rows are refreshed by app.project.dashboard whenever projects, servers,
+    databases, backups or memberships that the user can see change.
+    """
+    __tablename__ = 'dashboard_summaries'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    project_count = db.Column(db.Integer, nullable=False, default=0)
+    server_count = db.Column(db.Integer, nullable=False, default=0)
+    database_count = db.Column(db.Integer, nullable=False, default=0)
+    backup_count = db.Column(db.Integer, nullable=False, default=0)
+    backup_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    last_backup_status = db.Column(db.String(20))
+    last_backup_at = db.Column(db.DateTime)
+    recent_projects_json = db.Column('recent_projects', db.Text)  # JSON-encoded list
+    recent_servers_json = db.Column('recent_servers', db.Text)  # JSON-encoded list
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def recent_projects(self):
+        """Return the most recently created projects as dictionaries."""
+        return json.loads(self.recent_projects_json) if self.recent_projects_json else []
+    
+    @property
+    def recent_servers(self):
+        """Return the most recently updated servers as dictionaries."""
+        return json.loads(self.recent_servers_json) if self.recent_servers_json else []
+    
+    def __repr__(self):
+        return f'<DashboardSummary for User ID {self.user_id}>'
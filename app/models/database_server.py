@@ -4,8 +4,7 @@ NEXDB - Database Server model
 
 from datetime import datetime
 from app import db
-from cryptography.fernet import Fernet
-from flask import current_app
+from app.credentials import encrypt_secret, decrypt_secret
 
 class DatabaseServer(db.Model):
     """DatabaseServer model for MySQL and PostgreSQL servers."""
@@ -21,26 +20,24 @@ class DatabaseServer(db.Model):
     encrypted_password = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'))
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), index=True)
+    inventory_synced_at = db.Column(db.DateTime)
     
     # Relationships
     databases = db.relationship('Database', backref='server', lazy=True, 
                               cascade='all, delete-orphan')
+    firewall_rules = db.relationship('FirewallRule', backref='server', lazy=True,
+                                     cascade='all, delete-orphan')
     
     @property
     def password(self):
         """Decrypt and return the password."""
-        if not self.encrypted_password:
-            return None
-        
-        cipher_suite = Fernet(current_app.config['ENCRYPTION_KEY'].encode())
-        return cipher_suite.decrypt(self.encrypted_password.encode()).decode()
+        return decrypt_secret(self.encrypted_password)
     
     @password.setter
     def password(self, password):
         """Encrypt and store the password."""
-        cipher_suite = Fernet(current_app.config['ENCRYPTION_KEY'].encode())
-        self.encrypted_password = cipher_suite.encrypt(password.encode()).decode()
+        self.encrypted_password = encrypt_secret(password)
     
     def get_connection_details(self):
         """Return database connection details."""
@@ -65,13 +62,15 @@ class Database(db.Model):
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    server_id = db.Column(db.Integer, db.ForeignKey('database_servers.id'), nullable=False)
+    server_id = db.Column(db.Integer, db.ForeignKey('database_servers.id'), nullable=False, index=True)
     
     # Relationships
     database_users = db.relationship('DatabaseUser', backref='database', lazy=True,
                                    cascade='all, delete-orphan')
     backups = db.relationship('Backup', backref='database', lazy=True,
                             cascade='all, delete-orphan')
+    firewall_rules = db.relationship('FirewallRule', backref='database', lazy=True,
+                                     cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Database {self.name}>'
@@ -83,26 +82,22 @@ class DatabaseUser(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100), nullable=False)
-    encrypted_password = db.Column(db.Text, nullable=False)
-    privileges = db.Column(db.Text)  # JSON-encoded privileges
+    # Empty for users discovered on the server, whose passwords are unknown
+    encrypted_password = db.Column(db.Text)
+    privileges = db.Column(db.Text)  # JSON: {database name: [privileges]}
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    database_id = db.Column(db.Integer, db.ForeignKey('databases.id'), nullable=False)
+    database_id = db.Column(db.Integer, db.ForeignKey('databases.id'), nullable=False, index=True)
     
     @property
     def password(self):
         """Decrypt and return the password."""
-        if not self.encrypted_password:
-            return None
-        
-        cipher_suite = Fernet(current_app.config['ENCRYPTION_KEY'].encode())
-        return cipher_suite.decrypt(self.encrypted_password.encode()).decode()
+        return decrypt_secret(self.encrypted_password)
     
     @password.setter
     def password(self, password):
         """Encrypt and store the password."""
-        cipher_suite = Fernet(current_app.config['ENCRYPTION_KEY'].encode())
-        self.encrypted_password = cipher_suite.encrypt(password.encode()).decode()
+        self.encrypted_password = encrypt_secret(password)
     
     def __repr__(self):
         return f'<DatabaseUser {self.username}>' 
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""
+NEXDB - Firewall rule model
+"""
+
+from datetime import datetime
+from app import db
+
+class FirewallRule(db.Model):
+    """An address or network allowed to reach a database server's port.
+    
+    Rules attached to a database record which client needs it; UFW cannot
+    filter by database, so they open the whole server port like server rules.
+    """
+    __tablename__ = 'firewall_rules'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('database_servers.id'), nullable=False, index=True)
+    database_id = db.Column(db.Integer, db.ForeignKey('databases.id'), index=True)
+    source = db.Column(db.String(64), nullable=False)  # Address or CIDR network
+    description = db.Column(db.String(255))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FirewallRule {self.source} on Server ID {self.server_id}>'
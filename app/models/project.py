@@ -10,9 +10,20 @@ from sqlalchemy.ext.associationproxy import association_proxy
 project_users = db.Table('project_users',
     db.Column('project_id', db.Integer, db.ForeignKey('projects.id'), primary_key=True),
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
-    db.Column('access_level', db.String(20), default='read')  # read, write, admin
+    db.Column('access_level', db.String(20), default='read'),  # read, write, admin
+    # The primary key leads with project_id; lookups by user need their own index
+    db.Index('ix_project_users_user_id', 'user_id')
 )
 
+# Session.info key collecting users whose project access changed in a transaction
+MEMBERSHIP_CHANGES_KEY = 'project_membership_changes'
+
+
+def mark_membership_changed(user_id):
+    """Record a membership change made outside the ORM for cache invalidation."""
+    db.session.info.setdefault(MEMBERSHIP_CHANGES_KEY, set()).add(user_id)
+
+
 class Project(db.Model):
     """Project model for organizing database servers and databases."""
     __tablename__ = 'projects'
@@ -22,17 +33,38 @@ class Project(db.Model):
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     
     # Relationships
     database_servers = db.relationship('DatabaseServer', backref='project', lazy=True)
     members = db.relationship(
         'User',
         secondary=project_users,
-        lazy='subquery',
+        lazy='select',
         backref=db.backref('member_projects', lazy=True)
     )
     
+    @classmethod
+    def for_user(cls, user_id, *options):
+        """Return (project, access_level) pairs for every project a user can access.
+        
+        Owned and shared projects are resolved in a single query by outer-joining
+        the user's project_users row; owners get the 'owner' access level.
+        """
+        membership = db.and_(
+            project_users.c.project_id == cls.id,
+            project_users.c.user_id == user_id
+        )
+        rows = db.session.execute(
+            db.select(cls, project_users.c.access_level).
+            outerjoin(project_users, membership).
+            where(db.or_(cls.created_by == user_id, project_users.c.user_id.isnot(None))).
+            options(*options).
+            order_by(cls.created_at.desc())
+        ).all()
+        return [(project, 'owner' if project.created_by == user_id else access_level)
+                for project, access_level in rows]
+    
     def add_member(self, user, access_level='read'):
         """Add a user to the project with specified access level."""
         if not any(member.id == user.id for member in self.members):
@@ -43,6 +75,7 @@ class Project(db.Model):
                 where(project_users.c.user_id == user.id).
                 values(access_level=access_level)
             )
+            mark_membership_changed(user.id)
     
     def remove_member(self, user):
         """Remove a user from the project."""
@@ -52,11 +85,21 @@ class Project(db.Model):
     def get_member_access_level(self, user_id):
         """Get the access level of a project member."""
         result = db.session.execute(
-            db.select([project_users.c.access_level]).
+            db.select(project_users.c.access_level).
             where(project_users.c.project_id == self.id).
             where(project_users.c.user_id == user_id)
         ).fetchone()
         return result[0] if result else None
     
+    def get_members_with_access_levels(self):
+        """Return (user, access_level) pairs for all members in a single query."""
+        from app.models.user import User
+        return db.session.execute(
+            db.select(User, project_users.c.access_level).
+            join(project_users, project_users.c.user_id == User.id).
+            where(project_users.c.project_id == self.id).
+            order_by(User.username)
+        ).all()
+    
     def __repr__(self):
         return f'<Project {self.name}>' 
\ No newline at end of file
@@ -26,7 +26,7 @@ class User(UserMixin, db.Model):
     last_login_at = db.Column(db.DateTime)
     
     # Relationships
-    roles = db.relationship('Role', secondary=user_roles, lazy='subquery',
+    roles = db.relationship('Role', secondary=user_roles, lazy='select',
                            backref=db.backref('users', lazy=True))
     projects = db.relationship('Project', backref='creator', lazy=True, 
                               foreign_keys='Project.created_by')
@@ -67,5 +67,7 @@ class Role(db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login."""
-    return User.query.get(int(user_id)) 
\ No newline at end of file
+    """Load user by ID for Flask-Login, served from the identity cache."""
+    from app.auth.identity import get_user_snapshot, CachedUser
+    snapshot = get_user_snapshot(int(user_id))
+    return CachedUser(snapshot) if snapshot else None 
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+NEXDB - Profiling package
+"""
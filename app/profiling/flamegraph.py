@@ -0,0 +1,79 @@
+"""
+NEXDB - Flamegraph rendering
+
+Draws collapsed stacks as a standalone SVG flamegraph: the root at the
+bottom, every frame as wide as its share of the samples, and frames sharing
+a parent merged. Hovering a frame shows its sample count through the SVG
+title element, so the file needs no script and opens in any browser.
+"""
+
+import zlib
+from html import escape
+
+WIDTH = 1200
+FRAME_HEIGHT = 16
+PADDING = 10
+HEADER = 34
+CHAR_WIDTH = 7
+MIN_WIDTH = 0.1
+
+
+def _build_tree(stacks):
+    root = {'name': 'all', 'count': 0, 'children': {}}
+    for stack, count in stacks.items():
+        root['count'] += count
+        node = root
+        for name in stack:
+            child = node['children'].get(name)
+            if child is None:
+                child = node['children'][name] = {'name': name, 'count': 0, 'children': {}}
+            child['count'] += count
+            node = child
+    return root
+
+
+def _color(name):
+    # The same function gets the same warm color in every flamegraph
+    value = zlib.crc32(name.encode())
+    return f"rgb({205 + value % 50},{(value >> 8) % 230},{(value >> 16) % 55})"
+
+
+def render_svg(stacks, title='Flamegraph', subtitle=''):
+    """Render stacks (sample counts by tuple of labels) as an SVG document."""
+    root = _build_tree(stacks)
+    depth = 1 + max((len(stack) for stack in stacks), default=0)
+    height = HEADER + depth * FRAME_HEIGHT + PADDING * 2
+    scale = (WIDTH - PADDING * 2) / root['count'] if root['count'] else 0
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{height}" '
+        f'viewBox="0 0 {WIDTH} {height}" font-family="monospace" font-size="12">',
+        '<rect width="100%" height="100%" fill="#f8f8f8"/>',
+        f'<text x="{WIDTH / 2}" y="20" text-anchor="middle" font-size="16">{escape(title)}</text>',
+        f'<text x="{PADDING}" y="{HEADER - 4}" fill="#555">{escape(subtitle)}</text>',
+    ]
+    
+    pending = [(root, PADDING, 0)]
+    while pending:
+        node, x, level = pending.pop()
+        width = node['count'] * scale
+        if width < MIN_WIDTH:
+            continue
+        y = height - PADDING - (level + 1) * FRAME_HEIGHT
+        share = node['count'] / root['count']
+        parts.append(
+            f'<g><title>{escape(node["name"])} ({node["count"]} samples, {share:.2%})</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{width:.2f}" height="{FRAME_HEIGHT - 1}" '
+            f'fill="{_color(node["name"])}" rx="2"/>'
+        )
+        chars = int((width - 6) // CHAR_WIDTH)
+        if chars >= 3:
+            label = node['name'] if len(node['name']) <= chars else node['name'][:chars - 2] + '..'
+            parts.append(f'<text x="{x + 3:.2f}" y="{y + FRAME_HEIGHT - 4}">{escape(label)}</text>')
+        parts.append('</g>')
+        child_x = x
+        for child in sorted(node['children'].values(), key=lambda child: child['name']):
+            pending.append((child, child_x, level + 1))
+            child_x += child['count'] * scale
+    
+    parts.append('</svg>')
+    return '\n'.join(parts) + '\n'
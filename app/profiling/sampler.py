@@ -0,0 +1,155 @@
+"""
+NEXDB - Sampling profiler
+
+A background thread looks at the stack of one thread every `interval`
+seconds and counts how often each distinct stack is seen. Nothing is hooked
+into the profiled code, so its cost is the sampler thread taking the GIL for
+a few microseconds per sample. Samples are taken on the wall clock: time
+spent waiting for mysqldump, S3 or the database shows up in the frames doing
+the waiting, which is what matters for backups and slow requests.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+
+_THREAD_SUFFIX = re.compile(r'_\d+$')
+
+_labels = {}
+
+
+def _short_path(filename):
+    """Return a path relative to the sys.path entry it was imported from."""
+    best = ''
+    for entry in sys.path:
+        if entry and filename.startswith(entry) and len(entry) > len(best):
+            best = entry
+    return os.path.relpath(filename, best) if best else filename
+
+
+def frame_label(code):
+    """Return the flamegraph label of a code object."""
+    label = _labels.get(code)
+    if label is None:
+        name = getattr(code, 'co_qualname', code.co_name)
+        # ';' separates frames in collapsed stacks
+        label = f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+        _labels[code] = label
+    return label
+
+
+class Sampler:
+    """Sample the stack of one thread until stopped.
+    
+    Threads whose names start with one of `thread_prefixes`, such as the
+    workers of a pool the profiled code hands its work to, are sampled too,
+    under a root frame named after the thread.
+    """
+    
+    def __init__(self, thread_id=None, interval=0.005, max_seconds=600, thread_prefixes=()):
+        self.thread_id = thread_id or threading.get_ident()
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.counts = {}
+        self.samples = 0
+        self.truncated = False
+        self.started_at = None
+        self.seconds = 0.0
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start sampling in a daemon thread."""
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='nexdb-profiler', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._started is not None:
+            self.seconds = time.perf_counter() - self._started
+        return self
+    
+    def _threads(self):
+        threads = {self.thread_id: None}
+        if self.thread_prefixes:
+            for thread in threading.enumerate():
+                if thread.name.startswith(self.thread_prefixes):
+                    # pool_0 and pool_1 are merged under one root
+                    threads.setdefault(thread.ident, _THREAD_SUFFIX.sub('', thread.name))
+        return threads
+    
+    def _run(self):
+        counts = self.counts
+        deadline = self._started + self.max_seconds
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id not in frames:
+                break
+            for thread_id, thread_name in self._threads().items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                if stack:
+                    key = (thread_name, tuple(stack))
+                    counts[key] = counts.get(key, 0) + 1
+            self.samples += 1
+            if time.perf_counter() > deadline:
+                self.truncated = True
+                break
+    
+    def stacks(self):
+        """Return sample counts by stack, each a tuple of labels from the root down."""
+        stacks = {}
+        for (thread_name, codes), count in self.counts.items():
+            key = tuple(frame_label(code) for code in reversed(codes))
+            if thread_name is not None:
+                key = (f"[{thread_name}]",) + key
+            stacks[key] = stacks.get(key, 0) + count
+        return stacks
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def collapse(stacks):
+    """Render stacks in the collapsed format read by flamegraph tools."""
+    lines = [f"{';'.join(stack)} {count}"
+             for stack, count in sorted(stacks.items(), key=lambda item: -item[1])]
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def parse_collapsed(text):
+    """Read collapsed stacks back into counts by stack."""
+    stacks = {}
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack and count.isdigit():
+            key = tuple(stack.split(';'))
+            stacks[key] = stacks.get(key, 0) + int(count)
+    return stacks
+
+
+def top_functions(stacks, limit=10):
+    """Return the functions with the most samples on top of the stack."""
+    own = {}
+    for stack, count in stacks.items():
+        own[stack[-1]] = own.get(stack[-1], 0) + count
+    total = sum(own.values()) or 1
+    return [{'function': name, 'samples': count, 'share': round(count / total, 4)}
+            for name, count in sorted(own.items(), key=lambda item: -item[1])[:limit]]
@@ -0,0 +1,119 @@
+"""
+NEXDB - Profile storage
+
+Each profile is three files in PROFILE_DIR (the instance folder's profiles
+directory by default), shared by every worker on the host: <id>.json with
+what was profiled, <id>.collapsed with the collapsed stacks and <id>.svg
+with the flamegraph. Only the newest PROFILE_KEEP profiles are kept.
+"""
+
+import json
+import logging
+import os
+import re
+import secrets
+from datetime import datetime
+from app.profiling.sampler import collapse, top_functions
+from app.profiling.flamegraph import render_svg
+
+PROFILE_FORMATS = {'svg': 'image/svg+xml', 'collapsed': 'text/plain'}
+
+_PROFILE_ID = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+
+def profile_dir(app):
+    """Return the directory holding the profiles, creating it if needed."""
+    path = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def new_profile_id():
+    """Return a new profile id; ids sort by creation time."""
+    return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{secrets.token_hex(4)}"
+
+
+def profile_path(app, profile_id, fmt='json'):
+    """Return the path of one file of a profile, or None for an invalid id."""
+    if not _PROFILE_ID.match(profile_id or ''):
+        return None
+    return os.path.join(profile_dir(app), f"{profile_id}.{fmt}")
+
+
+def save_profile(app, profile_id, sampler, kind, name, **details):
+    """Write a finished sampler's stacks, flamegraph and metadata."""
+    stacks = sampler.stacks()
+    metadata = {
+        'id': profile_id,
+        'kind': kind,
+        'name': name,
+        'started_at': datetime.utcfromtimestamp(sampler.started_at).isoformat(),
+        'seconds': round(sampler.seconds, 3),
+        'samples': sampler.samples,
+        'interval': sampler.interval,
+        'truncated': sampler.truncated,
+        'pid': os.getpid(),
+        'top_functions': top_functions(stacks),
+        **details
+    }
+    subtitle = (f"{metadata['started_at']}Z, {sampler.samples} samples every "
+                f"{sampler.interval * 1000:g}ms over {metadata['seconds']}s")
+    files = {
+        'collapsed': collapse(stacks),
+        'svg': render_svg(stacks, f"{kind} {name}", subtitle),
+        'json': json.dumps(metadata, indent=2),
+    }
+    for fmt, content in files.items():
+        path = profile_path(app, profile_id, fmt)
+        # Written under a temporary name so readers never see a partial file
+        with open(f"{path}.tmp", 'w') as f:
+            f.write(content)
+        os.replace(f"{path}.tmp", path)
+    prune_profiles(app)
+    return metadata
+
+
+def load_profile(app, profile_id):
+    """Return the metadata of a profile, or None."""
+    path = profile_path(app, profile_id)
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_profiles(app):
+    """Return the metadata of every stored profile, newest first."""
+    profiles = []
+    for filename in sorted(os.listdir(profile_dir(app)), reverse=True):
+        if filename.endswith('.json'):
+            profile = load_profile(app, filename[:-5])
+            if profile is not None:
+                profiles.append(profile)
+    return profiles
+
+
+def delete_profile(app, profile_id):
+    """Delete the files of a profile; returns False if it does not exist."""
+    if profile_path(app, profile_id) is None:
+        return False
+    deleted = False
+    for fmt in ('json', *PROFILE_FORMATS):
+        try:
+            os.remove(profile_path(app, profile_id, fmt))
+            deleted = True
+        except FileNotFoundError:
+            pass
+    return deleted
+
+
+def prune_profiles(app):
+    """Delete all but the newest PROFILE_KEEP profiles."""
+    keep = app.config.get('PROFILE_KEEP', 50)
+    ids = sorted({filename.split('.', 1)[0] for filename in os.listdir(profile_dir(app))
+                  if _PROFILE_ID.match(filename.split('.', 1)[0])}, reverse=True)
+    for profile_id in ids[keep:]:
+        try:
+            delete_profile(app, profile_id)
+        except OSError as e:
+            logging.error(f"Profile cleanup error: {str(e)}")
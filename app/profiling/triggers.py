@@ -0,0 +1,175 @@
+"""
+NEXDB - Profiling triggers
+
+Profiles are taken on demand, for one of:
+
+- a request sending an X-NexDB-Profile header with a token issued to an
+  admin (POST /api/admin/profiles/token or `flask profile token`); the
+  response carries the new profile's id in X-NexDB-Profile-Id;
+- the next run of a scheduled job, armed through the API by its job id;
+- any call made through profile_call, such as `flask profile backup-all`.
+
+With PROFILING_ENABLED off nothing is installed. With it on, a request
+without the header costs one lookup in the WSGI environ and a scheduled job
+one failed unlink of its arming file; the sampler thread only exists while
+a profile is being taken.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from functools import wraps
+import jwt
+from werkzeug.wsgi import ClosingIterator
+from app.profiling.sampler import Sampler
+from app.profiling.store import profile_dir, new_profile_id, save_profile
+
+PROFILE_HEADER = 'X-NexDB-Profile'
+PROFILE_ID_HEADER = 'X-NexDB-Profile-Id'
+
+_ENVIRON_KEY = 'HTTP_' + PROFILE_HEADER.upper().replace('-', '_')
+_JOB_ID = re.compile(r'^[A-Za-z0-9_.-]{1,100}$')
+
+
+def _sampler(app, thread_id=None, thread_prefixes=()):
+    return Sampler(thread_id,
+                   interval=app.config.get('PROFILE_SAMPLE_INTERVAL', 0.005),
+                   max_seconds=app.config.get('PROFILE_MAX_SECONDS', 3600),
+                   thread_prefixes=thread_prefixes)
+
+
+def issue_profile_token(app, user_id):
+    """Return a token letting an admin profile their own requests."""
+    max_age = app.config.get('PROFILE_TOKEN_MAX_AGE', 3600)
+    return jwt.encode(
+        {'profile': user_id, 'exp': time.time() + max_age},
+        app.config['SECRET_KEY'],
+        algorithm='HS256'
+    )
+
+
+def verify_profile_token(app, token):
+    """Return the user id of a valid token whose user is still an admin, or None."""
+    try:
+        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+    except jwt.PyJWTError as e:
+        # Any client can send the header, so a bad token is not an error here
+        logging.debug(f"Profile token rejected: {e}")
+        return None
+    from app.auth.identity import get_user_snapshot
+    with app.app_context():
+        user = get_user_snapshot(data.get('profile'))
+    if not user or not user.active or 'admin' not in user.roles:
+        return None
+    return user.id
+
+
+def profile_call(app, kind, name, func, args=(), kwargs=None, thread_prefixes=()):
+    """Call func under the profiler; returns its result and the profile metadata."""
+    profile_id = new_profile_id()
+    sampler = _sampler(app, thread_prefixes=thread_prefixes).start()
+    outcome = 'error'
+    try:
+        result = func(*args, **(kwargs or {}))
+        outcome = 'completed'
+    finally:
+        sampler.stop()
+        metadata = save_profile(app, profile_id, sampler, kind, name, outcome=outcome)
+    return result, metadata
+
+
+def _armed_path(app, job_id):
+    return os.path.join(profile_dir(app), 'armed', job_id)
+
+
+def arm_job(app, job_id):
+    """Profile the next run of a scheduled job, in whichever worker runs it."""
+    if not _JOB_ID.match(job_id or ''):
+        raise ValueError(f"Invalid job id {job_id!r}")
+    path = _armed_path(app, job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a'):
+        pass
+    return path
+
+
+def armed_jobs(app):
+    """Return the ids of the jobs whose next run will be profiled."""
+    try:
+        return sorted(os.listdir(os.path.dirname(_armed_path(app, 'x'))))
+    except FileNotFoundError:
+        return []
+
+
+def _take_arming(app, job_id):
+    try:
+        os.remove(_armed_path(app, job_id))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def profiled_job(app, job_id, func, thread_prefixes=()):
+    """Wrap a scheduled job's function so that arming the job profiles its next run."""
+    if not app.config.get('PROFILING_ENABLED', True):
+        return func
+    
+    @wraps(func)
+    def run(*args, **kwargs):
+        if not _take_arming(app, job_id):
+            return func(*args, **kwargs)
+        return profile_call(app, 'job', job_id, func, args, kwargs, thread_prefixes)[0]
+    return run
+
+
+class ProfilingMiddleware:
+    """Profile the requests that carry a valid profile token."""
+    
+    def __init__(self, app, wsgi_app):
+        self.app = app
+        self.wsgi_app = wsgi_app
+    
+    def __call__(self, environ, start_response):
+        token = environ.get(_ENVIRON_KEY)
+        if not token:
+            return self.wsgi_app(environ, start_response)
+        user_id = verify_profile_token(self.app, token)
+        if user_id is None:
+            return self.wsgi_app(environ, start_response)
+        
+        profile_id = new_profile_id()
+        status = {}
+        
+        def profiled_start_response(status_line, headers, exc_info=None):
+            status['code'] = int(status_line.split(None, 1)[0])
+            headers.append((PROFILE_ID_HEADER, profile_id))
+            return start_response(status_line, headers, exc_info)
+        
+        def finish():
+            sampler.stop()
+            name = f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}"
+            try:
+                save_profile(self.app, profile_id, sampler, 'request', name,
+                             status=status.get('code'), user_id=user_id)
+            except Exception as e:
+                logging.error(f"Profile save error: {str(e)}")
+        
+        # Streamed responses are produced while the body is iterated, so the
+        # profile ends when the server closes the response
+        sampler = _sampler(self.app, threading.get_ident()).start()
+        try:
+            app_iter = self.wsgi_app(environ, profiled_start_response)
+        except BaseException:
+            finish()
+            raise
+        return ClosingIterator(app_iter, [finish])
+
+
+def init_profiling(app):
+    """Install the request profiler when PROFILING_ENABLED is on."""
+    if not app.config.get('PROFILING_ENABLED', True):
+        return False
+    app.wsgi_app = ProfilingMiddleware(app, app.wsgi_app)
+    return True
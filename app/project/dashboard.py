@@ -0,0 +1,377 @@
+"""
+NEXDB - Dashboard summaries
+
+Keeps one DashboardSummary row per user up to date so the dashboard renders
+from a single primary-key lookup. Changes to projects, servers, databases
+and memberships are collected during flush; after the transaction commits,
+the summaries of the affected users are recomputed together with a handful
+of set-based queries. Backups change far more often, so new, updated and
+deleted backups are applied as deltas instead: the backup count and bytes
+are adjusted in place and the last backup status is replaced when the
+backup is the newest one. Only deleting a user's newest backup recomputes
+that user's summary.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, or_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import db
+from app.models.project import Project, project_users
+from app.models.database_server import DatabaseServer, Database
+from app.models.backup import Backup
+from app.models.dashboard import DashboardSummary
+
+# Session.info keys collecting what changed in a transaction
+SUMMARY_PROJECTS_KEY = 'dashboard_projects'
+SUMMARY_USERS_KEY = 'dashboard_users'
+SUMMARY_BACKUPS_KEY = 'dashboard_backups'
+
+# Number of entries kept in the recent lists
+RECENT_PROJECTS = 6
+RECENT_SERVERS = 5
+
+projects = Project.__table__
+servers = DatabaseServer.__table__
+databases = Database.__table__
+backups = Backup.__table__
+summaries = DashboardSummary.__table__
+
+
+def _access(user_ids):
+    """Subquery of (user_id, project_id) pairs the users can access."""
+    owned = db.select(projects.c.created_by.label('user_id'), projects.c.id.label('project_id')).\
+        where(projects.c.created_by.in_(user_ids))
+    shared = db.select(project_users.c.user_id, project_users.c.project_id).\
+        where(project_users.c.user_id.in_(user_ids))
+    return db.union(owned, shared).subquery('access')
+
+
+def _ranked(access, columns, order_by, joins):
+    """Subquery of columns per user, numbered by order_by within each user."""
+    query = db.select(access.c.user_id, *columns,
+                      func.row_number().over(partition_by=access.c.user_id,
+                                             order_by=order_by).label('rank'))
+    for table, on in joins:
+        query = query.join(table, on)
+    return query.subquery()
+
+
+def compute_summaries(conn, user_ids):
+    """Compute summary rows for the given users from the current data."""
+    access = _access(user_ids)
+    to_servers = (servers, servers.c.project_id == access.c.project_id)
+    to_databases = (databases, databases.c.server_id == servers.c.id)
+    to_backups = (backups, backups.c.database_id == databases.c.id)
+    rows = {user_id: {
+        'user_id': user_id, 'project_count': 0, 'server_count': 0, 'database_count': 0,
+        'backup_count': 0, 'backup_bytes': 0, 'last_backup_status': None,
+        'last_backup_at': None, 'recent_projects': [], 'recent_servers': []
+    } for user_id in user_ids}
+    
+    def grouped(*columns, joins=()):
+        query = db.select(access.c.user_id, *columns)
+        for table, on in joins:
+            query = query.join(table, on)
+        return conn.execute(query.group_by(access.c.user_id)).all()
+    
+    for user_id, count in grouped(func.count()):
+        rows[user_id]['project_count'] = count
+    for user_id, count in grouped(func.count(servers.c.id), joins=[to_servers]):
+        rows[user_id]['server_count'] = count
+    for user_id, count in grouped(func.count(databases.c.id), joins=[to_servers, to_databases]):
+        rows[user_id]['database_count'] = count
+    for user_id, count, size in grouped(func.count(backups.c.id),
+                                        func.coalesce(func.sum(backups.c.size_bytes), 0),
+                                        joins=[to_servers, to_databases, to_backups]):
+        rows[user_id]['backup_count'] = count
+        rows[user_id]['backup_bytes'] = size
+    
+    last_backup = _ranked(access, [backups.c.status, backups.c.created_at],
+                          backups.c.created_at.desc(), [to_servers, to_databases, to_backups])
+    for user_id, status, created_at in conn.execute(
+        db.select(last_backup.c.user_id, last_backup.c.status, last_backup.c.created_at).
+        where(last_backup.c.rank == 1)
+    ):
+        rows[user_id]['last_backup_status'] = status
+        rows[user_id]['last_backup_at'] = created_at
+    
+    recent_projects = _ranked(access, [projects.c.id, projects.c.name, projects.c.description,
+                                       projects.c.created_by, projects.c.created_at],
+                              projects.c.created_at.desc(),
+                              [(projects, projects.c.id == access.c.project_id)])
+    for row in conn.execute(
+        db.select(recent_projects).
+        where(recent_projects.c.rank <= RECENT_PROJECTS).
+        order_by(recent_projects.c.user_id, recent_projects.c.rank)
+    ).mappings():
+        rows[row['user_id']]['recent_projects'].append({
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'created_by': row['created_by'],
+            'created_at': row['created_at'].isoformat() if row['created_at'] else None
+        })
+    
+    recent_servers = _ranked(access, [servers.c.id, servers.c.name, servers.c.server_type,
+                                      servers.c.host, servers.c.port, servers.c.project_id,
+                                      projects.c.name.label('project_name')],
+                             servers.c.updated_at.desc(),
+                             [to_servers, (projects, projects.c.id == servers.c.project_id)])
+    for row in conn.execute(
+        db.select(recent_servers).
+        where(recent_servers.c.rank <= RECENT_SERVERS).
+        order_by(recent_servers.c.user_id, recent_servers.c.rank)
+    ).mappings():
+        rows[row['user_id']]['recent_servers'].append({
+            key: row[key] for key in ('id', 'name', 'server_type', 'host', 'port',
+                                      'project_id', 'project_name')
+        })
+    
+    now = datetime.utcnow()
+    for row in rows.values():
+        row['recent_projects'] = json.dumps(row['recent_projects'])
+        row['recent_servers'] = json.dumps(row['recent_servers'])
+        row['refreshed_at'] = now
+    return list(rows.values())
+
+
+def refresh_summaries(user_ids, conn=None):
+    """Recompute and store the summaries of the given users."""
+    user_ids = sorted(set(user_id for user_id in user_ids if user_id is not None))
+    if not user_ids:
+        return 0
+    if conn is None:
+        with db.engine.begin() as conn:
+            return refresh_summaries(user_ids, conn)
+    
+    rows = compute_summaries(conn, user_ids)
+    _upsert_summaries(conn, rows)
+    return len(rows)
+
+
+def _upsert_summaries(conn, rows):
+    """Insert summary rows, replacing existing rows of the same users.
+    
+    An upsert rather than a delete and insert, so that concurrent refreshes
+    of the same user, such as two first views of the dashboard, both succeed.
+    """
+    columns = [column.name for column in summaries.columns if column.name != 'user_id']
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite if dialect == 'sqlite' else postgresql).insert(summaries)
+        statement = insert.on_conflict_do_update(
+            index_elements=[summaries.c.user_id],
+            set_={name: insert.excluded[name] for name in columns}
+        )
+    elif dialect in ('mysql', 'mariadb'):
+        insert = mysql.insert(summaries)
+        statement = insert.on_duplicate_key_update(
+            {name: insert.inserted[name] for name in columns}
+        )
+    else:
+        conn.execute(summaries.delete().where(
+            summaries.c.user_id.in_([row['user_id'] for row in rows])
+        ))
+        statement = summaries.insert()
+    conn.execute(statement, rows)
+
+
+def apply_backup_deltas(conn, deltas, skip_user_ids=()):
+    """Apply per-project backup deltas to the summaries of the projects' users.
+    
+    deltas maps project ids to the count and bytes added, the newest backup
+    written as (created_at, status) and the creation time of the newest
+    deleted backup. Users in skip_user_ids are being recomputed anyway.
+    Users without a summary row are left to compute theirs on first view.
+    Returns the number of users recomputed.
+    """
+    recomputed = 0
+    for project_id, delta in deltas.items():
+        user_ids = sorted(_project_users(conn, [project_id]) - set(skip_user_ids))
+        if not user_ids:
+            continue
+        users = summaries.c.user_id.in_(user_ids)
+        if delta['count'] or delta['bytes']:
+            conn.execute(summaries.update().where(users).values(
+                backup_count=summaries.c.backup_count + delta['count'],
+                backup_bytes=summaries.c.backup_bytes + delta['bytes']
+            ))
+        if delta['latest'] is not None:
+            created_at, status = delta['latest']
+            conn.execute(summaries.update().where(
+                users,
+                or_(summaries.c.last_backup_at.is_(None), summaries.c.last_backup_at <= created_at)
+            ).values(last_backup_status=status, last_backup_at=created_at))
+        if delta['deleted_at'] is not None:
+            # The newest backup is gone, so the one before it has to be found
+            stale = conn.execute(db.select(summaries.c.user_id).where(
+                users, summaries.c.last_backup_at <= delta['deleted_at']
+            )).scalars().all()
+            recomputed += refresh_summaries(stale, conn)
+    return recomputed
+
+
+def refresh_project_summaries(project_ids, conn=None):
+    """Refresh the summaries of everyone with access to the given projects.
+    
+    For writes made outside the ORM session, which the session hooks miss.
+    """
+    project_ids = [project_id for project_id in project_ids if project_id is not None]
+    if not project_ids:
+        return 0
+    if conn is None:
+        with db.engine.begin() as conn:
+            return refresh_project_summaries(project_ids, conn)
+    return refresh_summaries(_project_users(conn, project_ids), conn)
+
+
+def get_dashboard_summary(user_id):
+    """Return a user's summary, computing it if it is missing or too old.
+    
+    The age limit is a safety net for changes made outside the ORM session.
+    """
+    summary = db.session.get(DashboardSummary, user_id)
+    max_age = current_app.config.get('DASHBOARD_SUMMARY_MAX_AGE', 3600)
+    if summary is None or summary.refreshed_at < datetime.utcnow() - timedelta(seconds=max_age):
+        # Write through the session's connection so the new row is visible to it
+        refresh_summaries([user_id], db.session.connection())
+        db.session.commit()
+        summary = db.session.get(DashboardSummary, user_id)
+    return summary
+
+
+def _project_users(conn, project_ids):
+    """Return the owners and members of the given projects."""
+    owners = db.select(projects.c.created_by).where(projects.c.id.in_(project_ids))
+    members = db.select(project_users.c.user_id).where(project_users.c.project_id.in_(project_ids))
+    return {user_id for user_id, in conn.execute(db.union(owners, members))}
+
+
+def _history_values(obj, attribute):
+    """Return the current and previous values of a column attribute."""
+    return [value for value in db.inspect(obj).attrs[attribute].history.sum() if value is not None]
+
+
+def _backup_change(session, obj):
+    """Return (database_id, count, bytes, latest, deleted_at) for a changed backup.
+    
+    Returns None when the backup moved to another database or changed its
+    creation time, which the deltas cannot express.
+    """
+    attrs = db.inspect(obj).attrs
+    if obj in session.new:
+        created_at = obj.created_at or datetime.utcnow()
+        status = obj.status or backups.c.status.default.arg
+        return obj.database_id, 1, obj.size_bytes or 0, (created_at, status), None
+    
+    def committed(attribute):
+        history = attrs[attribute].history
+        return history.deleted[0] if history.deleted else getattr(obj, attribute)
+    
+    if obj in session.deleted:
+        return committed('database_id'), -1, -(committed('size_bytes') or 0), None, \
+            committed('created_at')
+    if attrs.database_id.history.deleted or attrs.created_at.history.deleted:
+        return None
+    size = attrs.size_bytes.history
+    size_delta = sum(value or 0 for value in size.added) - sum(value or 0 for value in size.deleted)
+    latest = (obj.created_at, obj.status) if attrs.status.history.has_changes() else None
+    return obj.database_id, 0, size_delta, latest, None
+
+
+def _collect_backup_deltas(session, changes):
+    """Fold backup changes into the per-project deltas of the session."""
+    database_ids = {change[0] for change in changes if change[0] is not None}
+    if not database_ids:
+        return
+    owners = dict(session.execute(
+        db.select(databases.c.id, servers.c.project_id).
+        join(servers, servers.c.id == databases.c.server_id).
+        where(databases.c.id.in_(database_ids))
+    ).all())
+    deltas = session.info.setdefault(SUMMARY_BACKUPS_KEY, {})
+    for database_id, count, size, latest, deleted_at in changes:
+        project_id = owners.get(database_id)
+        if project_id is None:
+            continue
+        delta = deltas.setdefault(project_id, {'count': 0, 'bytes': 0, 'latest': None,
+                                               'deleted_at': None})
+        delta['count'] += count
+        delta['bytes'] += size
+        if latest is not None and (delta['latest'] is None or latest[0] >= delta['latest'][0]):
+            delta['latest'] = latest
+        if deleted_at is not None and (delta['deleted_at'] is None or deleted_at > delta['deleted_at']):
+            delta['deleted_at'] = deleted_at
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_summary_changes(session, flush_context, instances):
+    """Record projects and users whose dashboard figures are about to change."""
+    project_ids = session.info.setdefault(SUMMARY_PROJECTS_KEY, set())
+    user_ids = session.info.setdefault(SUMMARY_USERS_KEY, set())
+    database_ids = set()
+    server_ids = set()
+    backup_changes = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Project):
+            if obj.id is not None:
+                project_ids.add(obj.id)
+            user_ids.update(_history_values(obj, 'created_by'))
+            if obj in session.deleted:
+                # The membership rows are gone once the deletion commits
+                user_ids.update(member.id for member in obj.members)
+            else:
+                members = db.inspect(obj).attrs.members.history
+                user_ids.update(member.id for member in members.added + members.deleted)
+        elif isinstance(obj, DatabaseServer):
+            project_ids.update(_history_values(obj, 'project_id'))
+        elif isinstance(obj, Database):
+            server_ids.update(_history_values(obj, 'server_id'))
+        elif isinstance(obj, Backup):
+            change = _backup_change(session, obj)
+            if change is None:
+                database_ids.update(_history_values(obj, 'database_id'))
+            elif change[1:] != (0, 0, None, None):
+                backup_changes.append(change)
+    # Resolve backups and databases to projects while their rows still exist
+    if database_ids:
+        server_ids.update(session.execute(
+            db.select(databases.c.server_id).where(databases.c.id.in_(database_ids))
+        ).scalars())
+    if server_ids:
+        project_ids.update(project_id for project_id in session.execute(
+            db.select(servers.c.project_id).where(servers.c.id.in_(server_ids))
+        ).scalars() if project_id is not None)
+    if backup_changes:
+        _collect_backup_deltas(session, backup_changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_after_commit(session):
+    """Refresh the summaries of affected users once their changes are committed."""
+    project_ids = session.info.pop(SUMMARY_PROJECTS_KEY, None) or set()
+    user_ids = session.info.pop(SUMMARY_USERS_KEY, None) or set()
+    deltas = session.info.pop(SUMMARY_BACKUPS_KEY, None) or {}
+    if not project_ids and not user_ids and not deltas:
+        return
+    try:
+        with db.engine.begin() as conn:
+            if project_ids:
+                user_ids |= _project_users(conn, project_ids)
+            refresh_summaries(user_ids, conn)
+            apply_backup_deltas(conn, {project_id: delta for project_id, delta in deltas.items()
+                                       if project_id not in project_ids}, user_ids)
+    except Exception as e:
+        # Summaries older than DASHBOARD_SUMMARY_MAX_AGE are recomputed on view
+        logging.error(f"Dashboard summary refresh error: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(SUMMARY_PROJECTS_KEY, None)
+    session.info.pop(SUMMARY_USERS_KEY, None)
+    session.info.pop(SUMMARY_BACKUPS_KEY, None)
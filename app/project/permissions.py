@@ -0,0 +1,150 @@
+"""
+NEXDB - Project permission resolver
+
+Resolves a user's access level for every project they can see in a single
+query, keeps the resulting map for the rest of the request and caches it across
+requests. Permission checks are then dictionary lookups.
+"""
+
+import os
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.cache import get_cache, SharedGeneration
+from app.models.project import Project, project_users, MEMBERSHIP_CHANGES_KEY
+
+# Access levels that grant each capability
+READ_LEVELS = ('read', 'write', 'admin', 'owner')
+WRITE_LEVELS = ('write', 'admin', 'owner')
+ADMIN_LEVELS = ('admin', 'owner')
+
+_generation = None
+
+
+def _user_id(user):
+    """Accept either a user object or a user id."""
+    return user if isinstance(user, int) else user.id
+
+
+def _cache():
+    return get_cache('permissions', current_app.config.get('PERMISSION_CACHE_TTL', 60))
+
+
+def _shared_generation():
+    global _generation
+    if _generation is None:
+        _generation = SharedGeneration(os.path.join(
+            current_app.config.get('CACHE_GENERATION_DIR') or current_app.instance_path,
+            'permissions.generation'
+        ))
+    return _generation
+
+
+def _sync_with_other_workers():
+    """Drop the cross-request cache if another process changed memberships."""
+    if has_request_context():
+        if g.get('_permissions_synced'):
+            return
+        g._permissions_synced = True
+    if _shared_generation().changed():
+        _cache().clear()
+
+
+def load_access_map(user_id):
+    """Query a user's {project_id: access_level} map in one round trip."""
+    membership = db.and_(
+        project_users.c.project_id == Project.id,
+        project_users.c.user_id == user_id
+    )
+    rows = db.session.execute(
+        db.select(Project.id, Project.created_by, project_users.c.access_level).
+        outerjoin(project_users, membership).
+        where(db.or_(Project.created_by == user_id, project_users.c.user_id.isnot(None)))
+    ).all()
+    return {
+        project_id: 'owner' if created_by == user_id else (access_level or 'read')
+        for project_id, created_by, access_level in rows
+    }
+
+
+def get_access_map(user):
+    """Return the user's {project_id: access_level} map.
+    
+    The map is computed at most once per request and is shared across requests
+    until the TTL expires or project membership changes.
+    """
+    user_id = _user_id(user)
+    request_maps = g.setdefault('_access_maps', {}) if has_request_context() else {}
+    access_map = request_maps.get(user_id)
+    if access_map is None:
+        _sync_with_other_workers()
+        access_map = _cache().get_or_load(user_id, lambda: load_access_map(user_id))
+        request_maps[user_id] = access_map
+    return access_map
+
+
+def get_access_level(project, user):
+    """Return the user's access level for a project, or None without access."""
+    user_id = _user_id(user)
+    if project.created_by == user_id:
+        return 'owner'
+    return get_access_map(user_id).get(project.id)
+
+
+def has_access_level(project, user, levels):
+    """Check whether the user's access level for a project is one of levels."""
+    return get_access_level(project, user) in levels
+
+
+def invalidate_permissions(*user_ids):
+    """Forget cached access maps, for the given users or for everyone.
+    
+    Other worker processes are notified through the shared generation stamp.
+    """
+    cache = _cache()
+    if user_ids:
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+    else:
+        cache.clear()
+    if has_app_context():
+        g.pop('_access_maps', None)
+    _shared_generation().bump()
+
+
+def _affected_users(project, deleted):
+    """Return ids of users whose access to a project may have changed."""
+    state = db.inspect(project)
+    user_ids = set(uid for uid in state.attrs.created_by.history.sum() if uid is not None)
+    if deleted:
+        user_ids.update(member.id for member in project.members)
+    else:
+        members = state.attrs.members.history
+        user_ids.update(member.id for member in members.added + members.deleted)
+    return user_ids
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_membership_changes(session, flush_context, instances):
+    """Record users whose project access is about to change in this flush."""
+    changed = session.info.setdefault(MEMBERSHIP_CHANGES_KEY, set())
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Project):
+            changed.update(_affected_users(obj, deleted=False))
+    for obj in session.deleted:
+        if isinstance(obj, Project):
+            changed.update(_affected_users(obj, deleted=True))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    """Invalidate cached access maps once membership changes are committed."""
+    changed = session.info.pop(MEMBERSHIP_CHANGES_KEY, None)
+    if changed:
+        invalidate_permissions(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop(MEMBERSHIP_CHANGES_KEY, None)
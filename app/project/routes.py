@@ -7,37 +7,28 @@ from flask_login import login_required, current_user
 from app import db
 from app.models import Project, DatabaseServer
 from app.project.forms import ProjectForm, ProjectMemberForm
-from app.project.utils import can_access_project, can_edit_project, can_delete_project
-from sqlalchemy import or_
+from app.project.utils import can_access_project, can_edit_project, can_delete_project, get_access_level
+from app.project.dashboard import get_dashboard_summary
+from app.tracing.sql import declare_query_budget
 
 # Create Blueprint
 project_bp = Blueprint('project', __name__)
 
 
 @project_bp.route('/dashboard')
+@declare_query_budget(12)
 @login_required
 def dashboard():
     """Dashboard route."""
-    # Get all projects the user has access to
-    user_created_projects = Project.query.filter_by(created_by=current_user.id).all()
-    user_member_projects = current_user.member_projects
-    
-    # Combine projects (removing duplicates)
-    all_projects = list(set(user_created_projects + user_member_projects))
-    
-    # Get recent database servers
-    recent_servers = DatabaseServer.query.join(Project).filter(
-        or_(
-            Project.created_by == current_user.id,
-            Project.members.contains(current_user)
-        )
-    ).order_by(DatabaseServer.updated_at.desc()).limit(5).all()
+    # Counts and recent items come precomputed from the user's summary row
+    summary = get_dashboard_summary(current_user.id)
     
     return render_template(
         'project/dashboard.html',
         title='Dashboard',
-        projects=all_projects,
-        recent_servers=recent_servers
+        summary=summary,
+        projects=summary.recent_projects,
+        recent_servers=summary.recent_servers
     )
 
 
@@ -45,16 +36,14 @@ def dashboard():
 @login_required
 def index():
     """List all projects."""
-    # Get all projects the user has access to
-    user_created_projects = Project.query.filter_by(created_by=current_user.id).all()
-    user_member_projects = current_user.member_projects
-    
-    # Combine projects (removing duplicates)
-    all_projects = list(set(user_created_projects + user_member_projects))
-    
-    # Separate owned and shared projects
-    owned_projects = user_created_projects
-    shared_projects = [p for p in user_member_projects if p not in owned_projects]
+    # Get all projects the user has access to, split into owned and shared
+    owned_projects = []
+    shared_projects = []
+    for project, access_level in Project.for_user(current_user.id):
+        if access_level == 'owner':
+            owned_projects.append(project)
+        else:
+            shared_projects.append(project)
     
     return render_template(
         'project/index.html',
@@ -102,7 +91,7 @@ def view(project_id):
     
     # Check user's access level
     is_owner = project.created_by == current_user.id
-    access_level = project.get_member_access_level(current_user.id) or 'owner' if is_owner else 'read'
+    access_level = get_access_level(project, current_user)
     
     return render_template(
         'project/view.html',
@@ -2,60 +2,29 @@
 NEXDB - Project utilities
 """
 
+from app.project.permissions import (get_access_level, has_access_level,
+                                     READ_LEVELS, WRITE_LEVELS, ADMIN_LEVELS)
+
 def can_access_project(project, user):
     """Check if a user can access a project."""
-    if project.created_by == user.id:
-        return True
-    
-    if user in project.members:
-        return True
-    
-    return False
+    return has_access_level(project, user, READ_LEVELS)
 
 
 def can_edit_project(project, user):
     """Check if a user can edit a project."""
-    if project.created_by == user.id:
-        return True
-    
-    if user in project.members:
-        access_level = project.get_member_access_level(user.id)
-        return access_level in ['write', 'admin']
-    
-    return False
+    return has_access_level(project, user, WRITE_LEVELS)
 
 
 def can_delete_project(project, user):
     """Check if a user can delete a project."""
-    if project.created_by == user.id:
-        return True
-    
-    if user in project.members:
-        access_level = project.get_member_access_level(user.id)
-        return access_level == 'admin'
-    
-    return False
+    return has_access_level(project, user, ADMIN_LEVELS)
 
 
 def can_manage_members(project, user):
     """Check if a user can manage project members."""
-    if project.created_by == user.id:
-        return True
-    
-    if user in project.members:
-        access_level = project.get_member_access_level(user.id)
-        return access_level == 'admin'
-    
-    return False
+    return has_access_level(project, user, ADMIN_LEVELS)
 
 
 def can_manage_servers(project, user):
     """Check if a user can manage database servers in a project."""
-    if project.created_by == user.id:
-        return True
-    
-    if user in project.members:
-        access_level = project.get_member_access_level(user.id)
-        return access_level in ['write', 'admin']
-    
-    return False 
\ No newline at end of file
+    return has_access_level(project, user, WRITE_LEVELS)
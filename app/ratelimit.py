@@ -0,0 +1,170 @@
+"""
+NEXDB - Shared rate limit storage
+
+A storage backend for the limits library that keeps counters in a SQLite
+database in WAL mode. Every worker process on the host opens the same file,
+so configured limits hold across gunicorn workers without running Redis.
+
+Use it with ``RATELIMIT_STORAGE_URI = 'sqlite-shared:////path/to/ratelimit.db'``.
+Importing this module registers the ``sqlite-shared`` scheme.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from limits.storage import Storage, MovingWindowSupport
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS window_entries (
+    key TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_window_entries_key_ts ON window_entries (key, ts);
+"""
+
+# Fixed-window hit: a single atomic upsert that also restarts expired windows
+INCR_SQL = """
+INSERT INTO counters (key, count, expires_at) VALUES (:key, :amount, :expires_at)
+ON CONFLICT (key) DO UPDATE SET
+    count = CASE WHEN counters.expires_at <= :now THEN excluded.count
+                 ELSE counters.count + excluded.count END,
+    expires_at = CASE WHEN counters.expires_at <= :now OR :elastic THEN excluded.expires_at
+                      ELSE counters.expires_at END
+RETURNING count
+"""
+
+# Expired rows are swept once every this many writes per connection
+PURGE_EVERY = 1000
+
+
+class SQLiteSharedStorage(Storage, MovingWindowSupport):
+    """Rate limit counters shared by all processes through a SQLite WAL file."""
+    
+    STORAGE_SCHEME = ['sqlite-shared']
+    
+    def __init__(self, uri, wrap_exceptions=False, busy_timeout=5000, **options):
+        # Like SQLAlchemy URLs: three slashes for a relative path, four for absolute
+        location = uri.split('://', 1)[-1]
+        self.path = location[1:] if location.startswith('/') else location
+        if not self.path:
+            raise ValueError(f'No database path in rate limit storage URI: {uri}')
+        self.busy_timeout = int(busy_timeout)
+        self._local = threading.local()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._connection()
+    
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+    
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute(f'PRAGMA busy_timeout = {self.busy_timeout}')
+            conn.execute('PRAGMA journal_mode = WAL')
+            # Counters may lose the last writes on power failure, never consistency
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.executescript(SCHEMA)
+            local.conn = conn
+            local.pid = os.getpid()
+            local.writes = 0
+        return local.conn
+    
+    def _wrote(self, conn, now):
+        """Count a write and sweep expired rows every PURGE_EVERY writes."""
+        self._local.writes += 1
+        if self._local.writes % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM counters WHERE expires_at <= ?', (now,))
+            # Moving windows are never longer than a day
+            conn.execute('DELETE FROM window_entries WHERE ts <= ?', (now - 86400,))
+    
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        """Increment the fixed-window counter for key and return its new value."""
+        conn = self._connection()
+        now = time.time()
+        count = conn.execute(INCR_SQL, {
+            'key': key,
+            'amount': amount,
+            'expires_at': now + expiry,
+            'now': now,
+            'elastic': int(bool(elastic_expiry))
+        }).fetchone()[0]
+        self._wrote(conn, now)
+        return count
+    
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT count FROM counters WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+    
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT expires_at FROM counters WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+    
+    def acquire_entry(self, key, limit, expiry, amount=1):
+        """Take amount entries from the moving window for key if it has room."""
+        if amount > limit:
+            return False
+        conn = self._connection()
+        now = time.time()
+        # Reserve the write lock up front so the count and insert are atomic
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM window_entries WHERE key = ? AND ts <= ?', (key, now - expiry))
+            count = conn.execute(
+                'SELECT COUNT(*) FROM window_entries WHERE key = ?', (key,)
+            ).fetchone()[0]
+            acquired = count + amount <= limit
+            if acquired:
+                conn.executemany('INSERT INTO window_entries (key, ts) VALUES (?, ?)',
+                                 [(key, now)] * amount)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if acquired:
+            self._wrote(conn, now)
+        return acquired
+    
+    def get_moving_window(self, key, limit, expiry):
+        """Return (start of window, entries in window) for key."""
+        now = time.time()
+        oldest, count = self._connection().execute(
+            'SELECT MIN(ts), COUNT(*) FROM window_entries WHERE key = ? AND ts > ?',
+            (key, now - expiry)
+        ).fetchone()
+        return (oldest if count else now, count)
+    
+    def check(self):
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def reset(self):
+        conn = self._connection()
+        deleted = conn.execute('DELETE FROM counters').rowcount
+        deleted += conn.execute('DELETE FROM window_entries').rowcount
+        return deleted
+    
+    def clear(self, key):
+        conn = self._connection()
+        conn.execute('DELETE FROM counters WHERE key = ?', (key,))
+        conn.execute('DELETE FROM window_entries WHERE key = ?', (key,))
@@ -0,0 +1,79 @@
+"""
+NEXDB - SQLite metadata store tuning
+
+When the application database is a SQLite file, connections are opened with
+WAL journaling, a busy timeout and the other pragmas in ``SQLITE_PRAGMAS`` so
+that several gunicorn workers and the scheduler threads can read while one of
+them writes, instead of failing with "database is locked". The pragmas and
+pool settings are read from the application config (config/config.py).
+"""
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+def is_sqlite_file(uri):
+    """Check whether a database URI points at an on-disk SQLite database."""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def sqlite_engine_options(config):
+    """Return SQLAlchemy engine options for a SQLite file database."""
+    connect_args = {
+        # Pooled connections move between request and scheduler threads
+        'check_same_thread': False,
+    }
+    busy_timeout = config['SQLITE_PRAGMAS'].get('busy_timeout')
+    if busy_timeout is not None:
+        # The driver-level timeout is what pysqlite waits on a locked database
+        connect_args['timeout'] = busy_timeout / 1000
+    return {
+        'pool_size': config['SQLITE_POOL_SIZE'],
+        'max_overflow': config['SQLITE_MAX_OVERFLOW'],
+        'pool_timeout': config['SQLITE_POOL_TIMEOUT'],
+        'connect_args': connect_args,
+    }
+
+
+def install_pragmas(engine, pragmas):
+    """Run the pragmas on every new connection the engine opens, in order."""
+    pragmas = dict(pragmas)
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+    
+    return engine
+
+
+def configure_sqlite(app):
+    """Merge tuned engine options into the app config before the engine is built."""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri or not app.config.get('SQLITE_TUNING', True) or not is_sqlite_file(uri):
+        return False
+    options = sqlite_engine_options(app.config)
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS win over the tuned defaults
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    return True
+
+
+def init_sqlite(app, engine):
+    """Install the connection pragmas if configure_sqlite tuned this app."""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if uri and app.config.get('SQLITE_TUNING', True) and is_sqlite_file(uri):
+        install_pragmas(engine, app.config['SQLITE_PRAGMAS'])
+
+
+def create_sqlite_engine(uri, config, tuned=True):
+    """Create an engine for a SQLite file, with or without the tuned profile.
+    
+    config is the application config, or a copy of it.
+    """
+    if not tuned:
+        return create_engine(uri)
+    engine = create_engine(uri, **sqlite_engine_options(config))
+    return install_pragmas(engine, config['SQLITE_PRAGMAS'])
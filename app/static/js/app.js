@@ -0,0 +1,14 @@
+// Toggle user menu
+document.getElementById('user-menu-button')?.addEventListener('click', function() {
+    const menu = document.getElementById('user-menu');
+    menu.classList.toggle('hidden');
+});
+
+// Close menu when clicking outside
+document.addEventListener('click', function(event) {
+    const menu = document.getElementById('user-menu');
+    const button = document.getElementById('user-menu-button');
+    if (menu && !menu.classList.contains('hidden') && !button.contains(event.target) && !menu.contains(event.target)) {
+        menu.classList.add('hidden');
+    }
+});
@@ -0,0 +1,3 @@
+"""
+NEXDB - Tracing package
+"""
@@ -0,0 +1,67 @@
+"""
+NEXDB - Query budget pytest plugin
+
+Enable with `pytest -p app.tracing.pytest_plugin`, or with
+`pytest_plugins = ['app.tracing.pytest_plugin']` in a conftest.py. Then:
+
+- a test marked `@pytest.mark.query_budget(8)` fails if it runs more than
+  8 statements in total;
+- any request a test makes to a view declared with
+  declare_query_budget(n) fails the test if it runs more than n statements
+  (the application must be created with SQL_TRACE_ENABLED on, as
+  TestingConfig does);
+- the `query_trace` fixture traces the block it is used in:
+  `with query_trace('listing') as trace: ...`, then assert on
+  `trace.queries` or `trace.suspects()`.
+
+Failures list the statement shapes by frequency, with the code location of
+repeated shapes, so an N+1 regression points at the loop causing it.
+"""
+
+import pytest
+from app.tracing.sql import trace_queries, trace_listeners
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(max_queries): fail the test if it runs more than max_queries SQL statements'
+    )
+
+
+@pytest.fixture
+def query_trace():
+    """Return trace_queries, to trace a block of a test."""
+    return trace_queries
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker('query_budget')
+    request_traces = []
+    trace_listeners.append(request_traces.append)
+    try:
+        if marker is None:
+            outcome = yield
+            trace = None
+        else:
+            with trace_queries(item.name) as trace:
+                outcome = yield
+    finally:
+        trace_listeners.remove(request_traces.append)
+    
+    # A test that already failed keeps its own error
+    if outcome.excinfo is not None:
+        return
+    failures = []
+    if trace is not None:
+        max_queries = marker.args[0] if marker.args else marker.kwargs['max_queries']
+        if trace.queries > max_queries:
+            failures.append(f"{item.name} ran {trace.queries} queries, budget {max_queries}:\n"
+                            f"{trace.report()}")
+    for request_trace in request_traces:
+        if request_trace.over_budget:
+            failures.append(f"{request_trace.name} ran {request_trace.queries} queries, "
+                            f"budget {request_trace.budget}:\n{request_trace.report()}")
+    if failures:
+        outcome.force_exception(pytest.fail.Exception('\n\n'.join(failures), pytrace=False))
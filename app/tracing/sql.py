@@ -0,0 +1,305 @@
+"""
+NEXDB - SQL tracing
+
+Records the statements run while a trace is active: each with its duration
+and its shape, the statement with literals and placeholder lists collapsed,
+so that the same query with other parameters has the same shape. A shape
+run SQL_TRACE_REPEAT_THRESHOLD times or more in one trace is an N+1
+suspect: usually a lazy load or a query inside a loop.
+
+With SQL_TRACE_ENABLED every request is traced. N+1 suspects and routes
+exceeding the budget declared with declare_query_budget are logged, and with
+SQL_TRACE_SERVER_TIMING the totals are sent in a Server-Timing header that
+browser developer tools display. Scheduled jobs are traced through
+traced_job, and any block of code through trace_queries or query_budget.
+
+The engine hooks are installed on the Engine class, so statements sent to
+managed servers are traced as well as those of the metadata store. With no
+active trace they cost one context variable lookup per statement. Only
+statements run by the thread (or task) that started a trace are recorded.
+"""
+
+import logging
+import os
+import re
+import sys
+import sysconfig
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_active = ContextVar('nexdb_sql_traces', default=())
+
+_shapes = {}
+_SHAPE_CACHE_SIZE = 2048
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\$\d+|(?<!:):\w+|\?')
+_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+_ROWS = re.compile(r'\(\?(?:, \.\.\.)?\)(?:\s*,\s*\(\?(?:, \.\.\.)?\))+')
+
+_LIBRARY_PATHS = tuple({sysconfig.get_path(name) for name in ('stdlib', 'purelib', 'platlib')})
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget when a block runs more statements than allowed."""
+    
+    def __init__(self, trace, max_queries):
+        self.trace = trace
+        self.max_queries = max_queries
+        super().__init__(f"{trace.name}: {trace.queries} queries, budget {max_queries}\n"
+                         f"{trace.report()}")
+
+
+def normalize_statement(statement):
+    """Return the shape of a statement, the same for any parameter values."""
+    shape = _shapes.get(statement)
+    if shape is None:
+        shape = _WHITESPACE.sub(' ', statement).strip()
+        shape = _STRING.sub('?', shape)
+        shape = _PLACEHOLDER.sub('?', shape)
+        shape = _NUMBER.sub('?', shape)
+        # IN (?, ?, ?) and multi-row VALUES lists vary in length only
+        shape = _LIST.sub('?, ...', shape)
+        shape = _ROWS.sub('(?), ...', shape)
+        if len(_shapes) >= _SHAPE_CACHE_SIZE:
+            _shapes.clear()
+        _shapes[statement] = shape
+    return shape
+
+
+def _caller():
+    """Return the innermost frame outside libraries and this module as path:line."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename != __file__ and not filename.startswith(_LIBRARY_PATHS) and \
+                not filename.startswith('<'):
+            return f"{os.path.relpath(filename)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+class QueryTrace:
+    """The statements run while a trace is active, grouped by shape."""
+    
+    def __init__(self, name, repeat_threshold=5, max_statements=500):
+        self.name = name
+        self.repeat_threshold = repeat_threshold
+        self.max_statements = max_statements
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements = []
+        self.shapes = {}
+        self.budget = None
+        self.started = time.perf_counter()
+        self.finished = None
+    
+    def record(self, statement, seconds):
+        """Add one statement and its duration."""
+        shape = normalize_statement(statement)
+        self.queries += 1
+        self.seconds += seconds
+        if len(self.statements) < self.max_statements:
+            self.statements.append((shape, seconds))
+        stats = self.shapes.get(shape)
+        if stats is None:
+            stats = self.shapes[shape] = {'count': 0, 'seconds': 0.0, 'location': None}
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        if stats['count'] == self.repeat_threshold:
+            # Only looked up once a shape becomes a suspect
+            stats['location'] = _caller()
+    
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+        return self
+    
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+    
+    def suspects(self):
+        """Return the N+1 suspects: shapes repeated at least repeat_threshold times."""
+        return [
+            {'shape': shape, 'count': stats['count'], 'seconds': round(stats['seconds'], 6),
+             'location': stats['location']}
+            for shape, stats in sorted(self.shapes.items(), key=lambda item: -item[1]['count'])
+            if stats['count'] >= self.repeat_threshold
+        ]
+    
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+    
+    def summary(self):
+        """Return the totals of the trace as a dict."""
+        return {
+            'name': self.name,
+            'queries': self.queries,
+            'shapes': len(self.shapes),
+            'sql_seconds': round(self.seconds, 6),
+            'seconds': round(self.elapsed, 6),
+            'budget': self.budget,
+            'suspects': self.suspects()
+        }
+    
+    def report(self, limit=10):
+        """Describe the most frequent shapes, one per line."""
+        lines = []
+        for shape, stats in sorted(self.shapes.items(), key=lambda item: -item[1]['count'])[:limit]:
+            location = f" at {stats['location']}" if stats['location'] else ''
+            lines.append(f"{stats['count']:5d}x {stats['seconds'] * 1000:8.2f}ms  {shape[:200]}{location}")
+        return '\n'.join(lines)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get():
+        context._trace_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    traces = _active.get()
+    started = getattr(context, '_trace_started', None)
+    if not traces or started is None:
+        return
+    seconds = time.perf_counter() - started
+    for trace in traces:
+        trace.record(statement, seconds)
+
+
+def install_engine_hooks():
+    """Listen to every SQLAlchemy engine's statements; safe to call repeatedly."""
+    if not event.contains(Engine, 'after_cursor_execute', _after_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def start_trace(trace):
+    """Make a trace active in this context; returns the token for stop_trace."""
+    return _active.set(_active.get() + (trace,))
+
+
+def stop_trace(token):
+    """Deactivate the trace started with the token."""
+    _active.reset(token)
+
+
+@contextmanager
+def trace_queries(name='trace', repeat_threshold=5, max_statements=500):
+    """Trace the statements run inside the block; nested traces all record."""
+    install_engine_hooks()
+    trace = QueryTrace(name, repeat_threshold, max_statements)
+    token = start_trace(trace)
+    try:
+        yield trace
+    finally:
+        stop_trace(token)
+        trace.finish()
+
+
+@contextmanager
+def query_budget(max_queries, name='block'):
+    """Raise QueryBudgetExceeded if the block runs more than max_queries statements."""
+    with trace_queries(name) as trace:
+        trace.budget = max_queries
+        yield trace
+    if trace.over_budget:
+        raise QueryBudgetExceeded(trace, max_queries)
+
+
+def declare_query_budget(max_queries):
+    """Declare how many statements a view may run; exceeding it is logged.
+    
+    Under the pytest plugin (app.tracing.pytest_plugin) a request exceeding
+    its route's budget fails the test.
+    """
+    def decorator(fn):
+        fn.query_budget = max_queries
+        return fn
+    return decorator
+
+
+# Called with every finished request trace; used by the pytest plugin
+trace_listeners = []
+
+
+def _log_trace(trace):
+    for suspect in trace.suspects():
+        location = f" at {suspect['location']}" if suspect['location'] else ''
+        logging.warning(f"N+1 suspect in {trace.name}: {suspect['count']}x "
+                        f"{suspect['shape'][:200]}{location}")
+    if trace.over_budget:
+        logging.warning(f"Query budget exceeded in {trace.name}: "
+                        f"{trace.queries} queries, budget {trace.budget}")
+
+
+def traced_job(app, job_id, func):
+    """Wrap a scheduled job's function so that each run is traced and logged."""
+    if not app.config.get('SQL_TRACE_ENABLED', False):
+        return func
+    
+    @wraps(func)
+    def run(*args, **kwargs):
+        with trace_queries(f"job {job_id}", app.config.get('SQL_TRACE_REPEAT_THRESHOLD', 5),
+                           app.config.get('SQL_TRACE_MAX_STATEMENTS', 500)) as trace:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                trace.finish()
+                logging.info(f"Job {job_id}: {trace.queries} queries in {trace.seconds * 1000:.1f}ms")
+                _log_trace(trace)
+    return run
+
+
+def init_sql_tracing(app):
+    """Trace every request's statements when SQL_TRACE_ENABLED is on."""
+    if not app.config.get('SQL_TRACE_ENABLED', False):
+        return False
+    install_engine_hooks()
+    threshold = app.config.get('SQL_TRACE_REPEAT_THRESHOLD', 5)
+    max_statements = app.config.get('SQL_TRACE_MAX_STATEMENTS', 500)
+    server_timing = app.config.get('SQL_TRACE_SERVER_TIMING', False)
+    
+    @app.before_request
+    def _start_request_trace():
+        trace = QueryTrace(f"{request.method} {request.path}", threshold, max_statements)
+        view = app.view_functions.get(request.endpoint)
+        trace.budget = getattr(view, 'query_budget', None)
+        g.sql_trace = trace
+        g._sql_trace_token = start_trace(trace)
+    
+    @app.after_request
+    def _finish_request_trace(response):
+        trace = g.get('sql_trace')
+        if trace is None:
+            return response
+        trace.finish()
+        if server_timing:
+            response.headers.add(
+                'Server-Timing',
+                f'sql;dur={trace.seconds * 1000:.2f};desc="{trace.queries} queries, '
+                f'{len(trace.suspects())} N+1 suspects"'
+            )
+            response.headers.add('Server-Timing', f'app;dur={trace.elapsed * 1000:.2f}')
+        return response
+    
+    @app.teardown_request
+    def _stop_request_trace(exc):
+        token = g.pop('_sql_trace_token', None)
+        if token is None:
+            return
+        stop_trace(token)
+        trace = g.sql_trace.finish()
+        _log_trace(trace)
+        for listener in trace_listeners:
+            listener(trace)
+    
+    return True
@@ -0,0 +1,10 @@
+"""
+NEXDB - ASGI entry point for the async introspection API
+Run with: gunicorn -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:5001 asgi:app
+"""
+
+import os
+from app import create_app
+from app.introspection.asgi import create_asgi_app
+
+app = create_asgi_app(create_app(os.getenv('FLASK_CONFIG', 'default')))
@@ -24,6 +24,21 @@ class Config:
     # SQLAlchemy settings
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # SQLite tuning, applied only when the database URI is a SQLite file
+    # (pragmas run on every new connection; see app/sqlite.py)
+    SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'true').lower() == 'true'
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+    }
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 10))
+    SQLITE_MAX_OVERFLOW = int(os.getenv('SQLITE_MAX_OVERFLOW', 20))
+    SQLITE_POOL_TIMEOUT = int(os.getenv('SQLITE_POOL_TIMEOUT', 30))
+    
     # JWT settings
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', secrets.token_hex(32))
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
@@ -41,9 +56,18 @@ class Config:
     S3_ACCESS_KEY = os.getenv('S3_ACCESS_KEY', '')
     S3_SECRET_KEY = os.getenv('S3_SECRET_KEY', '')
     S3_REGION = os.getenv('S3_REGION', 'us-east-1')
+    S3_MULTIPART_PART_SIZE = int(os.getenv('S3_MULTIPART_PART_SIZE', 8 * 1024 * 1024))
+    # Parts of a streamed upload sent to S3 at once (one more is being filled)
+    S3_UPLOAD_CONCURRENCY = int(os.getenv('S3_UPLOAD_CONCURRENCY', 1))
+    # Endpoint of an S3-compatible service (MinIO, a local stand-in); AWS when unset
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
     
     # Database credentials storage (encrypted in the database)
     ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY', secrets.token_hex(16))
+    # Comma-separated Fernet keys, newest first; the first one encrypts
+    ENCRYPTION_KEYS = [key.strip() for key in os.getenv('ENCRYPTION_KEYS', '').split(',')
+                       if key.strip()] or [ENCRYPTION_KEY]
+    CREDENTIAL_CACHE_TTL = int(os.getenv('CREDENTIAL_CACHE_TTL', 300))
     
     # MySQL default settings
     MYSQL_DEFAULT_HOST = os.getenv('MYSQL_DEFAULT_HOST', 'localhost')
@@ -53,9 +77,124 @@ class Config:
     POSTGRES_DEFAULT_HOST = os.getenv('POSTGRES_DEFAULT_HOST', 'localhost')
     POSTGRES_DEFAULT_PORT = os.getenv('POSTGRES_DEFAULT_PORT', 5432)
     
-    # Rate limiting
-    RATELIMIT_STORAGE_URL = 'memory://'
+    # Bulk data import and export
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 50000))
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 5000))
+    COLUMNAR_BATCH_SIZE = int(os.getenv('COLUMNAR_BATCH_SIZE', 65536))
+    
+    # Caching (per-process caches; CACHE_GENERATION_DIR holds the cross-worker
+    # invalidation stamps and defaults to the instance folder)
+    PERMISSION_CACHE_TTL = int(os.getenv('PERMISSION_CACHE_TTL', 60))
+    IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', 30))
+    CACHE_GENERATION_DIR = os.getenv('CACHE_GENERATION_DIR')
+    
+    # Dashboard summaries are refreshed on change; older rows are recomputed on view
+    DASHBOARD_SUMMARY_MAX_AGE = int(os.getenv('DASHBOARD_SUMMARY_MAX_AGE', 3600))
+    
+    # Web UI delivery: response compression, static caching, template fragments
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+    STATIC_MAX_AGE = 31536000  # fingerprinted assets only
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 300))
+    
+    # Seconds between batched last-seen writes (also the per-user write cap)
+    LAST_SEEN_FLUSH_INTERVAL = int(os.getenv('LAST_SEEN_FLUSH_INTERVAL', 60))
+    
+    # Rate limiting (counters are shared by every worker process on the host);
+    # moving windows keep a client from spending two limits across a boundary
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI',
+                                      f'sqlite-shared:///{os.path.join(basedir, "instance", "ratelimit.sqlite")}')
+    RATELIMIT_STRATEGY = os.getenv('RATELIMIT_STRATEGY', 'moving-window')
     RATELIMIT_HEADERS_ENABLED = True
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    
+    # Startup: tables are created and background services started on the first
+    # request, never for CLI commands
+    AUTO_CREATE_SCHEMA = os.getenv('AUTO_CREATE_SCHEMA', 'true').lower() == 'true'
+    START_BACKGROUND_SERVICES = os.getenv('START_BACKGROUND_SERVICES', 'true').lower() == 'true'
+    STARTUP_BUDGET_MS = int(os.getenv('STARTUP_BUDGET_MS', 3000))
+    
+    # Forked workers: only the process holding SCHEDULER_LOCK_FILE (defaults to
+    # the instance folder) runs the scheduler; the others retry every
+    # SCHEDULER_LOCK_RETRY seconds. PRELOAD_MODULES are imported in a preloaded
+    # gunicorn master so that workers share them. app.database.utils is left
+    # out on purpose: it loads pyarrow, which starts native threads that do not
+    # survive a fork.
+    SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE')
+    SCHEDULER_LOCK_RETRY = int(os.getenv('SCHEDULER_LOCK_RETRY', 30))
+    PRELOAD_MODULES = [
+        'cryptography.fernet',
+        'pymysql',
+        'psycopg2',
+        'app.backup.utils',
+    ]
+    
+    # Inventory sync: servers synced concurrently, and the interval in seconds
+    # of the scheduled fleet sync (0 disables it)
+    INVENTORY_SYNC_WORKERS = int(os.getenv('INVENTORY_SYNC_WORKERS', 8))
+    INVENTORY_SYNC_INTERVAL = int(os.getenv('INVENTORY_SYNC_INTERVAL', 0))
+    
+    # Firewall: stored rules are applied to this host's UFW when enabled.
+    # FIREWALL_RUNNER optionally names a runner class such as
+    # 'app.firewall.ufw.FakeUfw'; rules added by NEXDB carry
+    # FIREWALL_RULE_COMMENT so that no other rule is ever changed. Only ports
+    # of servers whose host is in FIREWALL_LOCAL_HOSTS (or is this machine's
+    # hostname) are opened, never FIREWALL_PROTECTED_PORTS (ssh, the panel and
+    # the introspection API)
+    FIREWALL_ENABLED = os.getenv('FIREWALL_ENABLED', 'false').lower() == 'true'
+    FIREWALL_LOCAL_HOSTS = [host.strip().lower() for host in
+                            os.getenv('FIREWALL_LOCAL_HOSTS', 'localhost,127.0.0.1,::1').split(',')
+                            if host.strip()]
+    FIREWALL_PROTECTED_PORTS = [int(port) for port in
+                                os.getenv('FIREWALL_PROTECTED_PORTS', '22,5000,5001').split(',')
+                                if port.strip()]
+    FIREWALL_RUNNER = os.getenv('FIREWALL_RUNNER')
+    FIREWALL_UFW_COMMAND = os.getenv('FIREWALL_UFW_COMMAND', 'sudo -n /usr/sbin/ufw')
+    FIREWALL_RULE_COMMENT = os.getenv('FIREWALL_RULE_COMMENT', 'nexdb')
+    FIREWALL_LOCK_FILE = os.getenv('FIREWALL_LOCK_FILE')
+    
+    # Managed servers: SERVER_CONNECTOR optionally names a connector class such
+    # as 'app.database.fake.FakeServerConnector', used instead of the MySQL and
+    # PostgreSQL drivers; the fake answers with FAKE_SERVER_ROWS rows after
+    # FAKE_SERVER_LATENCY seconds
+    SERVER_CONNECTOR = os.getenv('SERVER_CONNECTOR')
+    FAKE_SERVER_ROWS = int(os.getenv('FAKE_SERVER_ROWS', 1000))
+    FAKE_SERVER_LATENCY = float(os.getenv('FAKE_SERVER_LATENCY', 0.0))
+    
+    # Async introspection API (asgi.py, needs asyncpg and/or aiomysql): each
+    # server gets a pool of INTROSPECTION_POOL_SIZE connections, pools beyond
+    # INTROSPECTION_MAX_POOLS are closed least recently used first, and a query
+    # not answered within INTROSPECTION_QUERY_TIMEOUT seconds gets a 504
+    INTROSPECTION_POOL_SIZE = int(os.getenv('INTROSPECTION_POOL_SIZE', 4))
+    INTROSPECTION_MAX_POOLS = int(os.getenv('INTROSPECTION_MAX_POOLS', 100))
+    INTROSPECTION_QUERY_TIMEOUT = float(os.getenv('INTROSPECTION_QUERY_TIMEOUT', 10))
+    
+    # Prometheus metrics at /metrics (needs prometheus_client), off by default;
+    # scrapes must send "Authorization: Bearer <METRICS_TOKEN>", and outside
+    # debug and testing metrics stay off unless a token is set
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    
+    # On-demand sampling profiler for admin requests (X-NexDB-Profile header)
+    # and armed scheduled jobs; profiles are kept in PROFILE_DIR (defaults to
+    # the instance folder)
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'true').lower() == 'true'
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+    PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', 3600))
+    PROFILE_TOKEN_MAX_AGE = int(os.getenv('PROFILE_TOKEN_MAX_AGE', 3600))
+    PROFILE_DIR = os.getenv('PROFILE_DIR')
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))
+    
+    # SQL tracing: the statements of each request and scheduled job are
+    # recorded, statement shapes repeated SQL_TRACE_REPEAT_THRESHOLD times are
+    # logged as N+1 suspects, and SQL_TRACE_SERVER_TIMING sends the totals in
+    # a Server-Timing header
+    SQL_TRACE_ENABLED = os.getenv('SQL_TRACE_ENABLED', 'false').lower() == 'true'
+    SQL_TRACE_SERVER_TIMING = os.getenv('SQL_TRACE_SERVER_TIMING', 'false').lower() == 'true'
+    SQL_TRACE_REPEAT_THRESHOLD = int(os.getenv('SQL_TRACE_REPEAT_THRESHOLD', 5))
+    SQL_TRACE_MAX_STATEMENTS = int(os.getenv('SQL_TRACE_MAX_STATEMENTS', 500))
     
     # APScheduler settings
     SCHEDULER_API_ENABLED = True
@@ -69,6 +208,8 @@ class DevelopmentConfig(Config):
                                         f'sqlite:///{os.path.join(basedir, "dev.sqlite")}')
     SESSION_COOKIE_SECURE = False
     REMEMBER_COOKIE_SECURE = False
+    SQL_TRACE_ENABLED = True
+    SQL_TRACE_SERVER_TIMING = True
 
 
 class TestingConfig(Config):
@@ -78,8 +219,10 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL',
                                         f'sqlite:///{os.path.join(basedir, "test.sqlite")}')
     WTF_CSRF_ENABLED = False
+    RATELIMIT_STORAGE_URI = 'memory://'
     SESSION_COOKIE_SECURE = False
     REMEMBER_COOKIE_SECURE = False
+    SQL_TRACE_ENABLED = True
 
 
 class ProductionConfig(Config):
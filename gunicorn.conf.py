@@ -0,0 +1,55 @@
+"""
+NEXDB - Gunicorn configuration
+
+The application is preloaded in the master and the workers are forked from it,
+so the code, templates and other read-only state are shared copy-on-write
+instead of being loaded once per worker. The hooks below make that fork-safe;
+see app/lifecycle.py. Set GUNICORN_PRELOAD=false to load the app per worker.
+
+Prometheus metrics are kept per worker in files under PROMETHEUS_MULTIPROC_DIR
+and summed when /metrics is scraped (see app/metrics.py). The variable has to
+be set before prometheus_client is imported, so it is set here.
+"""
+
+import glob
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics')
+)
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    """Drop the metric files of a previous run."""
+    for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+        os.remove(path)
+
+
+def when_ready(server):
+    """Warm the preloaded application up before the first worker is forked."""
+    if server.cfg.preload_app:
+        from app.lifecycle import prepare_for_fork
+        prepare_for_fork(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    """Drop connections, caches and locks the worker inherited from the master."""
+    if server.cfg.preload_app:
+        from app.lifecycle import after_fork
+        after_fork(server.app.wsgi())
+
+
+def child_exit(server, worker):
+    """Stop counting an exited worker in the live gauges."""
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -109,6 +109,10 @@ ENCRYPTION_KEY=$ENCRYPTION_KEY
 
 # Backup directory
 BACKUP_DIR=/var/backups/nexdb
+
+# Apply firewall rules to UFW (nexdb may run /usr/sbin/ufw through sudo);
+# set to true to let administrators open database ports on this host
+FIREWALL_ENABLED=false
 EOF
 
 chown nexdb:nexdb $INSTALL_DIR/.env
@@ -126,7 +130,26 @@ User=nexdb
 Group=nexdb
 WorkingDirectory=$INSTALL_DIR
 Environment="PATH=$INSTALL_DIR/venv/bin"
-ExecStart=$INSTALL_DIR/venv/bin/gunicorn --workers 3 --bind 0.0.0.0:5000 app:app
+ExecStart=$INSTALL_DIR/venv/bin/gunicorn --config gunicorn.conf.py --workers 3 --bind 0.0.0.0:5000 wsgi:app
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+# The async introspection API runs in its own process; the scheduler stays
+# with the main service
+cat > /etc/systemd/system/nexdb-introspection.service << EOF
+[Unit]
+Description=NEXDB - Async introspection API
+After=network.target nexdb.service
+
+[Service]
+User=nexdb
+Group=nexdb
+WorkingDirectory=$INSTALL_DIR
+Environment="PATH=$INSTALL_DIR/venv/bin"
+Environment="START_BACKGROUND_SERVICES=false"
+ExecStart=$INSTALL_DIR/venv/bin/gunicorn -k uvicorn.workers.UvicornWorker --workers 1 --bind 0.0.0.0:5001 asgi:app
 
 [Install]
 WantedBy=multi-user.target
@@ -135,10 +158,12 @@ EOF
 # Reload systemd and enable service
 systemctl daemon-reload
 systemctl enable nexdb.service
+systemctl enable nexdb-introspection.service
 
 # Configure UFW
 echo "Configuring firewall..."
 ufw allow 5000/tcp
+ufw allow 5001/tcp
 ufw allow ssh
 
 if ! ufw status | grep -q "Status: active"; then
@@ -163,6 +188,7 @@ sudo -u nexdb venv/bin/flask create-admin "$ADMIN_USER" "$ADMIN_EMAIL" "$ADMIN_P
 # Start the service
 echo "Starting NEXDB service..."
 systemctl start nexdb.service
+systemctl start nexdb-introspection.service
 
 # Get server IP
 SERVER_IP=$(hostname -I | awk '{print $1}')
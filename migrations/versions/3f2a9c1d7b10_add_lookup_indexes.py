@@ -0,0 +1,44 @@
+"""Add foreign-key and lookup indexes
+
+Revision ID: 3f2a9c1d7b10
+Revises: 
+Create Date: 2026-10-19 09:00:00
+
+Tables are created by db.create_all() at startup, which also creates these
+indexes on new installs, so each index is only created if it is missing.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_database_servers_project_id', 'database_servers', ['project_id']),
+    ('ix_databases_server_id', 'databases', ['server_id']),
+    ('ix_database_users_database_id', 'database_users', ['database_id']),
+    ('ix_backups_database_id_created_at', 'backups', ['database_id', 'created_at']),
+    ('ix_backup_schedules_database_id', 'backup_schedules', ['database_id']),
+    ('ix_projects_created_by', 'projects', ['created_by']),
+    ('ix_project_users_user_id', 'project_users', ['user_id']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
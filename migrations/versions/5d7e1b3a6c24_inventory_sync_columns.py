@@ -0,0 +1,36 @@
+"""Inventory sync columns
+
+Revision ID: 5d7e1b3a6c24
+Revises: 8c41d2e5a9f3
+Create Date: 2026-10-19 13:00:00
+
+Users discovered on a server have no known password, and servers record when
+their inventory was last synced.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7e1b3a6c24'
+down_revision = '8c41d2e5a9f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('database_servers')}
+    if 'inventory_synced_at' not in columns:
+        with op.batch_alter_table('database_servers') as batch_op:
+            batch_op.add_column(sa.Column('inventory_synced_at', sa.DateTime(), nullable=True))
+    with op.batch_alter_table('database_users') as batch_op:
+        batch_op.alter_column('encrypted_password', existing_type=sa.Text(), nullable=True)
+
+
+def downgrade():
+    # Discovered users have no password and cannot satisfy NOT NULL
+    op.execute("DELETE FROM database_users WHERE encrypted_password IS NULL")
+    with op.batch_alter_table('database_users') as batch_op:
+        batch_op.alter_column('encrypted_password', existing_type=sa.Text(), nullable=False)
+    with op.batch_alter_table('database_servers') as batch_op:
+        batch_op.drop_column('inventory_synced_at')
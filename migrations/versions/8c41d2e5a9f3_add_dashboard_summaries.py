@@ -0,0 +1,42 @@
+"""Add dashboard summaries
+
+Revision ID: 8c41d2e5a9f3
+Revises: 3f2a9c1d7b10
+Create Date: 2026-10-19 11:00:00
+
+Summaries are computed on first view, so the table starts empty.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2e5a9f3'
+down_revision = '3f2a9c1d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('dashboard_summaries'):
+        return
+    op.create_table(
+        'dashboard_summaries',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('project_count', sa.Integer(), nullable=False),
+        sa.Column('server_count', sa.Integer(), nullable=False),
+        sa.Column('database_count', sa.Integer(), nullable=False),
+        sa.Column('backup_count', sa.Integer(), nullable=False),
+        sa.Column('backup_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('last_backup_status', sa.String(length=20), nullable=True),
+        sa.Column('last_backup_at', sa.DateTime(), nullable=True),
+        sa.Column('recent_projects', sa.Text(), nullable=True),
+        sa.Column('recent_servers', sa.Text(), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('dashboard_summaries')
@@ -0,0 +1,44 @@
+"""Add firewall rules
+
+Revision ID: a7c3f19e2b58
+Revises: 5d7e1b3a6c24
+Create Date: 2026-10-19 15:00:00
+
+Addresses allowed through UFW to each database server.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3f19e2b58'
+down_revision = '5d7e1b3a6c24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('firewall_rules'):
+        return
+    op.create_table(
+        'firewall_rules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('server_id', sa.Integer(), nullable=False),
+        sa.Column('database_id', sa.Integer(), nullable=True),
+        sa.Column('source', sa.String(length=64), nullable=False),
+        sa.Column('description', sa.String(length=255), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['server_id'], ['database_servers.id']),
+        sa.ForeignKeyConstraint(['database_id'], ['databases.id']),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_firewall_rules_server_id', 'firewall_rules', ['server_id'])
+    op.create_index('ix_firewall_rules_database_id', 'firewall_rules', ['database_id'])
+
+
+def downgrade():
+    op.drop_index('ix_firewall_rules_database_id', table_name='firewall_rules')
+    op.drop_index('ix_firewall_rules_server_id', table_name='firewall_rules')
+    op.drop_table('firewall_rules')
@@ -0,0 +1,109 @@
+"""
+NEXDB - Test fixtures
+
+The configuration classes read the environment when config.config is
+imported, so the test database and keys are set up before the application
+is imported. Every test starts from empty tables.
+"""
+
+import os
+import tempfile
+import pytest
+from cryptography.fernet import Fernet
+
+_test_dir = tempfile.mkdtemp(prefix='nexdb-tests-')
+os.environ.setdefault('TEST_DATABASE_URL', f"sqlite:///{os.path.join(_test_dir, 'test.sqlite')}")
+os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+os.environ.setdefault('START_BACKGROUND_SERVICES', 'false')
+os.environ.setdefault('CACHE_GENERATION_DIR', _test_dir)
+os.environ.setdefault('PROFILE_DIR', _test_dir)
+
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.cache import clear_all_caches
+from app.lifecycle import ensure_schema
+from app.models import User, Role, Project, DatabaseServer, Database
+
+# Requests to views declared with declare_query_budget fail over budget
+pytest_plugins = ['app.tracing.pytest_plugin']
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The application, created once with TestingConfig."""
+    app = create_app('testing')
+    ensure_schema(app)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def app_context(app):
+    """Run each test in an application context and empty the tables after it."""
+    with app.app_context():
+        yield
+        db.session.remove()
+        with db.engine.begin() as conn:
+            for table in reversed(db.metadata.sorted_tables):
+                conn.execute(table.delete())
+    clear_all_caches()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Log a user in to the web interface of the test client."""
+    def login(user):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+    return login
+
+
+@pytest.fixture
+def make_user():
+    """Create and commit a user; role is a role name such as 'admin'."""
+    def make_user(username, role=None):
+        user = User(username=username, email=f'{username}@example.com', password='password',
+                    active=True)
+        if role:
+            user.roles = [Role.query.filter_by(name=role).first() or Role(name=role)]
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def make_project():
+    """Create and commit a project with servers and members.
+    
+    members is a list of (user, access_level) pairs; every server gets one
+    database.
+    """
+    def make_project(owner, name='Project', servers=0, members=()):
+        project = Project(name=name, description=f'{name} description', created_by=owner.id)
+        db.session.add(project)
+        db.session.flush()
+        for number in range(servers):
+            server = DatabaseServer(name=f'{name} server {number}', host='127.0.0.1', port=3306,
+                                    server_type='mysql', username='root', project_id=project.id)
+            server.password = 'secret'
+            server.databases.append(Database(name=f'db_{number}'))
+            db.session.add(server)
+        for user, access_level in members:
+            project.add_member(user, access_level)
+        db.session.commit()
+        return project
+    return make_project
+
+
+@pytest.fixture
+def auth_headers():
+    """Return the API headers of a user."""
+    def auth_headers(user):
+        return {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+    return auth_headers
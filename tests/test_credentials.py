@@ -0,0 +1,35 @@
+"""
+NEXDB - Re-encrypting stored credentials
+"""
+
+from cryptography.fernet import Fernet
+from app import db, credentials
+from app.models import DatabaseServer
+
+
+def test_rotation_skips_undecryptable_and_concurrently_changed_rows(app, monkeypatch,
+                                                                     make_user, make_project):
+    servers = make_project(make_user('owner'), servers=4).database_servers
+    table = DatabaseServer.__table__
+    ids = sorted(server.id for server in servers)
+    old_key = app.config['ENCRYPTION_KEYS'][0]
+    db.session.execute(table.update().where(table.c.id == ids[3]).
+                       values(encrypted_password=Fernet(Fernet.generate_key()).encrypt(b'x').decode()))
+    db.session.commit()
+    monkeypatch.setitem(app.config, 'ENCRYPTION_KEYS', [Fernet.generate_key().decode(), old_key])
+    changed = credentials.get_cipher((old_key,)).encrypt(b'changed').decode()
+    
+    # The password of the third server changes between the read and the update
+    is_current = credentials.is_current
+    def changing_is_current(token, keys=None):
+        db.session.execute(table.update().where(table.c.id == ids[2]).
+                           values(encrypted_password=changed))
+        return is_current(token, keys)
+    monkeypatch.setattr(credentials, 'is_current', changing_is_current)
+    
+    result = credentials.rotate_column(table, table.c.encrypted_password, batch_size=3)
+    
+    assert result == {'checked': 4, 'rotated': 2, 'failed': [ids[3]]}
+    tokens = dict(db.session.execute(db.select(table.c.id, table.c.encrypted_password)).all())
+    assert tokens[ids[2]] == changed
+    assert all(is_current(tokens[server_id]) for server_id in ids[:2])
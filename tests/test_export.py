@@ -0,0 +1,139 @@
+"""
+NEXDB - Streaming exports
+
+The managed servers are replaced by FakeConnection, whose cursors record the
+statements they run.
+"""
+
+import threading
+import pytest
+from types import SimpleNamespace
+from app.database import utils
+from app.database.fake import FakeConnection, FakeCursor
+
+
+class RecordingCursor(FakeCursor):
+    
+    def execute(self, sql, params=None):
+        self.connection.executed.append(sql)
+        super().execute(sql, params)
+    
+    def copy_expert(self, sql, file):
+        self.connection.executed.append(sql)
+        super().copy_expert(sql, file)
+
+
+class RecordingConnection(FakeConnection):
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executed = []
+    
+    def cursor(self, name=None, *args, **kwargs):
+        return RecordingCursor(self, name)
+
+
+class Connections:
+    """Opens FakeConnections of `rows` rows and keeps them."""
+    
+    def __init__(self):
+        self.rows = 1000
+        self.opened = []
+    
+    def connect(self, server, database=None, **options):
+        conn = RecordingConnection(server, database, rows=self.rows)
+        self.opened.append(conn)
+        return conn
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    connections = Connections()
+    monkeypatch.setattr(utils, 'connect_to_server', connections.connect)
+    return connections
+
+
+@pytest.mark.parametrize('server_type', ['mysql', 'postgresql'])
+def test_empty_csv_export_has_a_header(connections, server_type):
+    connections.rows = 0
+    server = SimpleNamespace(server_type=server_type)
+    
+    output = b''.join(utils.iter_export(server, 'db', table='t', fmt='csv'))
+    
+    assert output == b'id,name,created_at\n'
+
+
+def test_closing_a_copy_export_cancels_the_query(connections):
+    connections.rows = 2000000
+    server = SimpleNamespace(server_type='postgresql')
+    threads = threading.active_count()
+    
+    export = utils.iter_export(server, 'db', table='t', fmt='csv')
+    assert next(export).startswith(b'id,name,created_at\n')
+    export.close()
+    
+    conn, = connections.opened
+    assert conn.cancelled
+    assert conn.closed
+    assert threading.active_count() == threads
+
+
+@pytest.mark.parametrize('server_type, query', [
+    ('postgresql', "SELECT 1) TO PROGRAM 'sh -c id' --"),
+    ('postgresql', "SELECT 1) TO PROGRAM 'sh -c id' WITH (FORMAT csv"),
+    ('postgresql', "SELECT 1) TO '/tmp/out' WITH (FORMAT csv"),
+    ('postgresql', 'WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d'),
+    ('postgresql', 'WITH u AS (UPDATE t SET x = 1 RETURNING *) SELECT * FROM u'),
+    ('postgresql', 'SELECT * INTO copied FROM t'),
+    ('postgresql', "SELECT $$ ') $$ FROM t; DROP TABLE t"),
+    ('postgresql', "SELECT E'\\'' ) TO PROGRAM ''id'' --'"),
+    ('mysql', "SELECT * FROM t INTO OUTFILE '/tmp/out.csv'"),
+    ('mysql', "SELECT * FROM t INTO DUMPFILE '/tmp/out'"),
+    ('mysql', 'SELECT * FROM t; DELETE FROM t'),
+    ('mysql', 'SELECT * FROM t /*!50000 INTO OUTFILE "/tmp/out" */'),
+    ('mysql', "SELECT 'a\\' INTO OUTFILE '/tmp/out' #'"),
+    ('mysql', 'DELETE FROM t'),
+])
+def test_unsafe_queries_are_rejected(connections, server_type, query):
+    server = SimpleNamespace(server_type=server_type)
+    
+    with pytest.raises(ValueError):
+        next(utils.iter_export(server, 'db', query=query, fmt='csv'))
+    
+    assert connections.opened == []
+
+
+@pytest.mark.parametrize('query', [
+    "SELECT id, 'a;b -- c' AS note FROM t WHERE name = 'it''s' AND (id > 1)",
+    'WITH recent AS (SELECT * FROM t WHERE id > 10) SELECT count(*) FROM recent',
+    'SELECT "update", replace(name, \'a\', \'b\') FROM t',
+])
+def test_plain_queries_are_accepted(query):
+    assert utils.build_export_query('postgresql', query=query) == query
+
+
+@pytest.mark.parametrize('server_type, read_only', [
+    ('postgresql', 'SET TRANSACTION READ ONLY'),
+    ('mysql', 'START TRANSACTION READ ONLY'),
+])
+def test_queries_run_in_a_read_only_transaction_without_copy(connections, server_type,
+                                                             read_only):
+    server = SimpleNamespace(server_type=server_type)
+    
+    output = b''.join(utils.iter_export(server, 'db', query='SELECT * FROM t', fmt='csv'))
+    
+    assert output.startswith(b'id,name,created_at\n1,row1,')
+    conn, = connections.opened
+    assert conn.executed == [read_only, 'SELECT * FROM t']
+
+
+def test_table_exports_copy_a_quoted_table_name(connections):
+    server = SimpleNamespace(server_type='postgresql')
+    
+    b''.join(utils.iter_export(server, 'db', table='public.items', fmt='csv'))
+    
+    conn, = connections.opened
+    assert conn.executed == [
+        'SET TRANSACTION READ ONLY',
+        'COPY (SELECT * FROM "public"."items") TO STDOUT WITH (FORMAT csv, HEADER)',
+    ]
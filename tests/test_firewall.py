@@ -0,0 +1,148 @@
+"""
+NEXDB - Firewall reconciliation
+
+Parsing of `ufw status numbered`, the planned changes, the order deletions
+run in, and who may open which ports. ufw itself is replaced by FakeUfw.
+"""
+
+import pytest
+from app import db
+from app.firewall.sync import plan_changes, apply_plan, desired_rules, firewall_policy
+from app.firewall.ufw import FakeUfw, UfwRule, parse_status, rule_key
+from app.models import FirewallRule
+
+COMMENT = 'nexdb'
+SYSTEM_RULES = [('22/tcp', 'ALLOW IN', 'Anywhere', ''), ('5000/tcp', 'ALLOW IN', 'Anywhere', '')]
+
+
+def _rules(ufw):
+    return parse_status(ufw.status())[1]
+
+
+def test_parse_status():
+    output = (
+        'Status: active\n\n'
+        '     To                         Action      From\n'
+        '     --                         ------      ----\n'
+        '[ 1] 22/tcp                     ALLOW IN    Anywhere\n'
+        '[ 2] 3306/tcp                   ALLOW IN    10.0.0.5                   # nexdb\n'
+        '[ 3] 5432/tcp                   DENY IN     192.168.0.0/24\n'
+        '[ 4] 22/tcp (v6)                ALLOW IN    Anywhere (v6)\n'
+    )
+    
+    active, rules = parse_status(output)
+    
+    assert active
+    assert rules == [
+        UfwRule(1, '22/tcp', 'ALLOW', 'IN', '0.0.0.0/0', ''),
+        UfwRule(2, '3306/tcp', 'ALLOW', 'IN', '10.0.0.5', 'nexdb'),
+        UfwRule(3, '5432/tcp', 'DENY', 'IN', '192.168.0.0/24', ''),
+        UfwRule(4, '22/tcp', 'ALLOW', 'IN', '::/0', ''),
+    ]
+    assert rule_key(rules[1]) == ('10.0.0.5', 3306, 'tcp')
+    assert rule_key(rules[2]) is None
+    assert parse_status('Status: inactive\n') == (False, [])
+
+
+def test_plan_changes_only_touches_tagged_rules():
+    ufw = FakeUfw(SYSTEM_RULES + [
+        ('3306/tcp', 'ALLOW IN', '10.0.0.1', COMMENT),
+        ('3306/tcp', 'ALLOW IN', '10.0.0.2', COMMENT),
+        ('3306/tcp', 'ALLOW IN', '10.0.0.2', COMMENT),
+        ('5432/tcp', 'ALLOW IN', '10.0.0.3', ''),
+    ])
+    desired = {('10.0.0.1', 3306, 'tcp'), ('10.0.0.3', 5432, 'tcp'), ('10.0.0.4', 3306, 'tcp')}
+    
+    plan = plan_changes(_rules(ufw), desired, COMMENT)
+    
+    # The duplicate of 10.0.0.2 and the stale rule go; the hand-made rule stays
+    assert [rule.number for rule in plan.delete] == [5, 4]
+    assert plan.add == [('10.0.0.4', 3306, 'tcp')]
+    assert plan.unchanged == 1
+
+
+def test_deletions_run_from_the_highest_number():
+    ufw = FakeUfw(SYSTEM_RULES + [
+        ('3306/tcp', 'ALLOW IN', f'10.0.0.{index}', COMMENT) for index in range(1, 7)
+    ])
+    desired = {('10.0.0.2', 3306, 'tcp'), ('10.0.0.5', 3306, 'tcp'), ('10.0.0.9', 3306, 'tcp')}
+    
+    errors = apply_plan(ufw, plan_changes(_rules(ufw), desired, COMMENT), COMMENT)
+    
+    deletions = [int(args[2]) for args in ufw.calls if args[:2] == ['--force', 'delete']]
+    assert errors == []
+    assert deletions == sorted(deletions, reverse=True) == [8, 6, 5, 3]
+    assert ufw.rules[:2] == SYSTEM_RULES
+    assert {rule_key(rule) for rule in _rules(ufw) if rule.comment == COMMENT} == desired
+
+
+def test_desired_rules_skip_other_hosts_and_protected_ports(app, make_user, make_project):
+    project = make_project(make_user('owner'), servers=3)
+    local, remote, protected = project.database_servers
+    remote.host = 'db.example.com'
+    protected.port = 22
+    db.session.add_all([FirewallRule(server_id=server.id, source='10.0.0.1')
+                        for server in project.database_servers])
+    db.session.commit()
+    
+    with db.engine.connect() as conn:
+        desired = desired_rules(conn, *firewall_policy(app))
+    
+    assert desired == {('10.0.0.1', local.port, 'tcp')}
+
+
+@pytest.fixture
+def fake_ufw(app, monkeypatch, tmp_path):
+    """Enable the firewall with a FakeUfw holding the system rules."""
+    ufw = FakeUfw(SYSTEM_RULES)
+    monkeypatch.setitem(app.config, 'FIREWALL_ENABLED', True)
+    monkeypatch.setitem(app.config, 'FIREWALL_LOCK_FILE', str(tmp_path / 'firewall.lock'))
+    monkeypatch.setitem(app.extensions, 'nexdb_firewall_runner', ufw)
+    return ufw
+
+
+def _put_rules(client, server, headers, sources):
+    return client.put(f'/api/servers/{server.id}/firewall-rules', headers=headers,
+                      json={'rules': [{'source': source} for source in sources]})
+
+
+def test_only_admins_replace_rules(client, make_user, make_project, auth_headers, fake_ufw):
+    owner = make_user('owner')
+    writer = make_user('writer')
+    project = make_project(owner, servers=1, members=[(writer, 'admin')])
+    server = project.database_servers[0]
+    
+    for user in (owner, writer):
+        response = _put_rules(client, server, auth_headers(user), ['10.0.0.1'])
+        assert response.status_code == 403
+    assert FirewallRule.query.count() == 0
+    assert fake_ufw.rules == SYSTEM_RULES
+
+
+def test_admin_rules_are_applied(client, make_user, make_project, auth_headers, fake_ufw):
+    admin = make_user('admin', role='admin')
+    server = make_project(admin, servers=1).database_servers[0]
+    
+    response = _put_rules(client, server, auth_headers(admin), ['10.0.0.1', '10.0.1.0/24'])
+    
+    assert response.status_code == 200
+    assert response.get_json()['firewall']['success']
+    assert fake_ufw.rules[:2] == SYSTEM_RULES
+    assert {rule_key(rule) for rule in _rules(fake_ufw) if rule.comment == COMMENT} == \
+        {('10.0.0.1', server.port, 'tcp'), ('10.0.1.0/24', server.port, 'tcp')}
+
+
+@pytest.mark.parametrize('host, port', [('db.example.com', 3306), ('127.0.0.1', 22),
+                                        ('localhost', 5000), ('127.0.0.1', 5001)])
+def test_ports_that_must_not_be_opened(client, make_user, make_project, auth_headers, fake_ufw,
+                                       host, port):
+    admin = make_user('admin', role='admin')
+    server = make_project(admin, servers=1).database_servers[0]
+    server.host, server.port = host, port
+    db.session.commit()
+    
+    response = _put_rules(client, server, auth_headers(admin), ['10.0.0.1'])
+    
+    assert response.status_code == 400
+    assert FirewallRule.query.count() == 0
+    assert fake_ufw.rules == SYSTEM_RULES
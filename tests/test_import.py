@@ -0,0 +1,60 @@
+"""
+NEXDB - Streaming CSV imports
+
+The managed servers are replaced by FakeConnection, whose cursors record the
+statements they run.
+"""
+
+import io
+from types import SimpleNamespace
+from app.database import utils
+from app.database.fake import FakeConnection, FakeCursor
+
+
+class RecordingCursor(FakeCursor):
+    
+    def executemany(self, sql, seq_of_params):
+        self.connection.executed.append((sql, list(seq_of_params)))
+
+
+class RecordingConnection(FakeConnection):
+    
+    def __init__(self, server, database=None, **options):
+        super().__init__(server, database)
+        self.options = options
+        self.executed = []
+    
+    def cursor(self, name=None, *args, **kwargs):
+        return RecordingCursor(self, name)
+
+
+def test_mysql_import_inserts_rows_without_local_infile(app, monkeypatch):
+    opened = []
+    
+    def connect(server, database=None, **options):
+        opened.append(RecordingConnection(server, database, **options))
+        return opened[-1]
+    monkeypatch.setattr(utils, 'connect_to_server', connect)
+    upload = io.BytesIO(b'id,name\n1,a\n2,"b,c"\n3,d\n')
+    
+    result = utils.import_csv(SimpleNamespace(server_type='mysql'), 'db', 'items', upload,
+                              batch_size=2)
+    
+    assert result['success'], result
+    assert (result['rows'], result['batches']) == (3, 2)
+    conn, = opened
+    assert 'local_infile' not in conn.options
+    assert conn.executed == [
+        ('INSERT INTO `items` (`id`, `name`) VALUES (%s, %s)', [['1', 'a'], ['2', 'b,c']]),
+        ('INSERT INTO `items` (`id`, `name`) VALUES (%s, %s)', [['3', 'd']]),
+    ]
+
+
+def test_mysql_import_rejects_ragged_rows(app, monkeypatch):
+    monkeypatch.setattr(utils, 'connect_to_server', RecordingConnection)
+    upload = io.BytesIO(b'id,name\n1,a\n2\n')
+    
+    result = utils.import_csv(SimpleNamespace(server_type='mysql'), 'db', 'items', upload)
+    
+    assert not result['success']
+    assert 'same number of fields' in result['message']
@@ -0,0 +1,78 @@
+"""
+NEXDB - Access to the async introspection API
+
+The managed servers are replaced by FakeServerConnector, and requests are
+sent straight to the ASGI application.
+"""
+
+import asyncio
+import json
+import pytest
+from app.database.fake import FakeServerConnector
+from app.introspection.asgi import IntrospectionApp
+
+
+@pytest.fixture
+def introspection(app, monkeypatch):
+    """Return a function sending GET requests to a fresh IntrospectionApp."""
+    monkeypatch.setitem(app.config, 'SERVER_CONNECTOR', FakeServerConnector)
+    monkeypatch.delitem(app.extensions, 'nexdb_server_connector', raising=False)
+    
+    def get(path, headers):
+        asgi_app = IntrospectionApp(app)
+        messages = []
+        
+        async def send(message):
+            messages.append(message)
+        
+        async def request():
+            scope = {'type': 'http', 'method': 'GET', 'path': path,
+                     'headers': [(name.lower().encode(), value.encode())
+                                 for name, value in headers.items()]}
+            try:
+                await asgi_app(scope, None, send)
+            finally:
+                await asgi_app.close()
+        
+        asyncio.run(request())
+        return messages[0]['status'], json.loads(messages[1]['body'])
+    return get
+
+
+@pytest.mark.parametrize('kind', ['status', 'catalog', 'metrics', 'processes'])
+def test_members_with_write_access_see_every_kind(introspection, make_user, make_project,
+                                                   auth_headers, kind):
+    owner = make_user('owner')
+    writer = make_user('writer')
+    server = make_project(owner, servers=1, members=[(writer, 'write')]).database_servers[0]
+    
+    for user in (owner, writer):
+        status, body = introspection(f'/api/introspection/servers/{server.id}/{kind}',
+                                     auth_headers(user))
+        assert status == 200, body
+        assert kind in body
+
+
+def test_read_members_do_not_see_processes(introspection, make_user, make_project, auth_headers):
+    reader = make_user('reader')
+    server = make_project(make_user('owner'), servers=1,
+                          members=[(reader, 'read')]).database_servers[0]
+    
+    status, _ = introspection(f'/api/introspection/servers/{server.id}/status', auth_headers(reader))
+    assert status == 200
+    status, body = introspection(f'/api/introspection/servers/{server.id}/processes',
+                                 auth_headers(reader))
+    assert status == 403
+    assert 'query' not in json.dumps(body)
+
+
+def test_admins_outside_the_project_are_refused(introspection, make_user, make_project,
+                                                 auth_headers, client):
+    admin = make_user('admin', role='admin')
+    server = make_project(make_user('owner'), servers=1).database_servers[0]
+    
+    status, _ = introspection(f'/api/introspection/servers/{server.id}/status', auth_headers(admin))
+    
+    # The same answer as the sync API gives for the server
+    assert status == 403
+    assert client.get(f'/api/servers/{server.id}', headers=auth_headers(admin)).status_code == 403
@@ -0,0 +1,69 @@
+"""
+NEXDB - Grants read by the inventory sync
+"""
+
+from types import SimpleNamespace
+from app.api import utils as api_utils
+from app.database.inventory import fetch_inventory
+
+
+class CatalogConnection:
+    """Answers the databases, users and grants queries in turn."""
+    
+    def __init__(self, *results):
+        self.results = list(results)
+    
+    def cursor(self):
+        return self
+    
+    def execute(self, sql):
+        self.rows = self.results.pop(0)
+    
+    def fetchall(self):
+        return self.rows
+    
+    def close(self):
+        pass
+
+
+def _inventory(monkeypatch, server_type, databases, users, grants):
+    conn = CatalogConnection([(name,) for name in databases], [(name,) for name in users], grants)
+    monkeypatch.setattr(api_utils, 'connect_to_server', lambda *args, **kwargs: conn)
+    return fetch_inventory(SimpleNamespace(server_type=server_type))
+
+
+def test_mysql_global_schema_and_table_grants(monkeypatch):
+    inventory = _inventory(
+        monkeypatch, 'mysql', ['mysql', 'app_1', 'app_2', 'appx', 'shop'],
+        ['admin', 'monitor', 'app', 'report'],
+        [
+            ("'admin'@'%'", None, 'SELECT'),
+            ("'admin'@'%'", None, 'PROCESS'),
+            ("'monitor'@'%'", None, 'PROCESS'),
+            ("'monitor'@'%'", None, 'USAGE'),
+            ("'app'@'10.%'", 'app\\_%', 'INSERT'),
+            ("'report'@'localhost'", 'shop', 'select'),
+        ]
+    )
+    
+    assert inventory.grants == {
+        ('admin', 'app_1'): {'SELECT'},
+        ('admin', 'app_2'): {'SELECT'},
+        ('admin', 'appx'): {'SELECT'},
+        ('admin', 'shop'): {'SELECT'},
+        ('app', 'app_1'): {'INSERT'},
+        ('app', 'app_2'): {'INSERT'},
+        ('report', 'shop'): {'SELECT'},
+    }
+
+
+def test_postgresql_grants_of_login_roles(monkeypatch):
+    inventory = _inventory(
+        monkeypatch, 'postgresql', ['postgres', 'shop'], ['owner', 'reader'],
+        [('owner', 'shop', 'ALL PRIVILEGES'), ('reader', 'shop', 'CONNECT'),
+         ('pg_monitor', 'shop', 'CONNECT'), ('owner', 'postgres', 'ALL PRIVILEGES')]
+    )
+    
+    assert inventory.databases == {'shop'}
+    assert inventory.grants == {('owner', 'shop'): {'ALL PRIVILEGES'},
+                                ('reader', 'shop'): {'CONNECT'}}
@@ -0,0 +1,18 @@
+"""
+NEXDB - Request profiling triggers
+"""
+
+import logging
+from app.profiling.triggers import PROFILE_HEADER, issue_profile_token
+
+
+def test_junk_profile_tokens_are_not_logged_as_errors(app, client, caplog):
+    tampered = issue_profile_token(app, 1).replace('.', '.x', 1)
+    
+    with caplog.at_level(logging.WARNING):
+        for token in ('junk', tampered):
+            response = client.get('/login', headers={PROFILE_HEADER: token})
+            assert response.status_code == 200
+            assert 'X-NexDB-Profile-Id' not in response.headers
+    
+    assert caplog.records == []
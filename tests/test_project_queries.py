@@ -0,0 +1,71 @@
+"""
+NEXDB - Query counts of the project API
+
+The project endpoints load owned and shared projects, servers and members in
+a fixed number of queries, however many of them there are.
+"""
+
+from app.tracing.sql import trace_queries
+
+
+def _count_queries(client, path, headers):
+    with trace_queries(path) as trace:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return trace.queries, response.get_json()
+
+
+def test_get_projects_runs_one_query(client, make_user, make_project, auth_headers):
+    owner = make_user('owner')
+    other = make_user('other')
+    make_project(owner, 'Owned', servers=1)
+    make_project(other, 'Shared', servers=1, members=[(owner, 'write')])
+    
+    queries, body = _count_queries(client, '/api/projects', auth_headers(owner))
+    
+    assert queries == 1
+    assert sorted((project['name'], project['access_level']) for project in body['projects']) == \
+        [('Owned', 'owner'), ('Shared', 'write')]
+
+
+def test_get_projects_query_count_does_not_grow_with_projects(client, make_user, make_project,
+                                                               auth_headers):
+    owner = make_user('owner')
+    other = make_user('other')
+    make_project(owner, 'First')
+    few, _ = _count_queries(client, '/api/projects', auth_headers(owner))
+    
+    for number in range(10):
+        make_project(owner, f'Owned {number}', servers=2)
+        make_project(other, f'Shared {number}', members=[(owner, 'read')])
+    many, body = _count_queries(client, '/api/projects', auth_headers(owner))
+    
+    assert len(body['projects']) == 21
+    assert many == few
+
+
+def test_get_project_query_count_does_not_grow_with_servers_or_members(client, make_user,
+                                                                        make_project, auth_headers):
+    owner = make_user('owner')
+    members = [make_user(f'member{number}') for number in range(5)]
+    small = make_project(owner, 'Small', servers=1, members=[(members[0], 'read')])
+    large = make_project(owner, 'Large', servers=8,
+                         members=[(member, 'write') for member in members])
+    
+    few, _ = _count_queries(client, f'/api/projects/{small.id}', auth_headers(owner))
+    many, body = _count_queries(client, f'/api/projects/{large.id}', auth_headers(owner))
+    
+    assert len(body['project']['database_servers']) == 8
+    assert len(body['project']['members']) == 5
+    assert many == few <= 4
+
+
+def test_get_project_as_member(client, make_user, make_project, auth_headers):
+    owner = make_user('owner')
+    member = make_user('member')
+    project = make_project(owner, 'Shared', servers=2, members=[(member, 'read')])
+    
+    queries, body = _count_queries(client, f'/api/projects/{project.id}', auth_headers(member))
+    
+    assert queries <= 4
+    assert body['project']['name'] == 'Shared'
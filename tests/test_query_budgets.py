@@ -0,0 +1,73 @@
+"""
+NEXDB - Query budgets of the main pages
+
+Requests made here run under app.tracing.pytest_plugin, which fails a test
+when a view declared with declare_query_budget runs more statements than
+declared.
+"""
+
+import pytest
+from app import db
+from app.models import Backup
+
+
+def _add_backups(project, count):
+    for server in project.database_servers:
+        for database in server.databases:
+            for number in range(count):
+                db.session.add(Backup(filename=f'{database.name}-{number}.sql.gz',
+                                      size_bytes=1024, status='completed', database_id=database.id))
+    db.session.commit()
+
+
+def test_get_project_within_budget(client, make_user, make_project, auth_headers):
+    owner = make_user('owner')
+    members = [make_user(f'member{number}') for number in range(10)]
+    project = make_project(owner, 'Large', servers=10,
+                           members=[(member, 'read') for member in members])
+    
+    response = client.get(f'/api/projects/{project.id}', headers=auth_headers(members[0]))
+    
+    assert response.status_code == 200
+    assert len(response.get_json()['project']['members']) == 10
+
+
+def test_dashboard_within_budget(client, make_user, make_project, login):
+    owner = make_user('owner')
+    other = make_user('other')
+    for number in range(8):
+        _add_backups(make_project(owner, f'Owned {number}', servers=2), 3)
+        make_project(other, f'Shared {number}', servers=1, members=[(owner, 'write')])
+    login(owner)
+    
+    # The first view computes the summary, the second reads it
+    for _ in range(2):
+        response = client.get('/project/dashboard')
+        assert response.status_code == 200
+    
+    assert b'Owned 7' in response.data
+
+
+@pytest.fixture
+def fleet_owner(make_user, make_project, login):
+    """A logged-in user owning and sharing projects with servers and backups."""
+    owner = make_user('owner')
+    other = make_user('other')
+    for number in range(5):
+        _add_backups(make_project(owner, f'Owned {number}', servers=2), 2)
+        make_project(other, f'Shared {number}', servers=1, members=[(owner, 'read')])
+    login(owner)
+    return owner
+
+
+# Both views together, the first one computing the summary
+@pytest.mark.query_budget(12)
+def test_dashboard_second_view_reads_the_summary(client, fleet_owner, query_trace):
+    client.get('/project/dashboard')
+    
+    with query_trace('second view') as trace:
+        response = client.get('/project/dashboard')
+    
+    assert response.status_code == 200
+    assert trace.queries <= 2
+    assert trace.suspects() == []
@@ -0,0 +1,40 @@
+"""
+NEXDB - Query plan checks
+
+Runs the plan checks of `flask bench plans` on a small synthetic dataset, so
+a dropped or unusable index fails the test suite.
+"""
+
+import pytest
+from app import db
+from app.bench.plans import PlanCheck, key_queries, run_plan_checks, check_plans, build_dataset
+from app.models.backup import Backup
+from sqlalchemy import create_engine
+
+
+@pytest.fixture(scope='module')
+def plan_report():
+    return run_plan_checks(scale=0.1)
+
+
+@pytest.mark.parametrize('name', [check.name for check in key_queries()])
+def test_key_query_uses_indexes(plan_report, name):
+    result = next(result for result in plan_report['results'] if result['name'] == name)
+    assert result['passed'], '\n'.join(result['problems'] + [str(result['plan'])])
+
+
+def test_unindexed_query_is_reported(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.sqlite'}")
+    try:
+        build_dataset(engine, scale=0.01)
+        check = PlanCheck('backups by status',
+                          db.select(Backup).where(Backup.status == 'failed').
+                          order_by(Backup.size_bytes),
+                          ['backups'], True)
+        result, = check_plans(engine, [check])
+    finally:
+        engine.dispose()
+    
+    assert not result['passed']
+    assert any(problem.startswith('full scan') for problem in result['problems'])
+    assert any(problem.startswith('sort not served') for problem in result['problems'])
@@ -0,0 +1,26 @@
+"""
+NEXDB - Shared rate-limit storage
+"""
+
+from limits import parse
+from limits.strategies import MovingWindowRateLimiter
+from limits.storage import storage_from_string
+from config.config import Config
+# Registers the sqlite-shared:// storage scheme
+from app import ratelimit  # noqa: F401
+
+
+def test_limits_use_a_moving_window_by_default():
+    assert Config.RATELIMIT_STRATEGY == 'moving-window'
+
+
+def test_moving_window_limits_are_shared_between_storages(tmp_path):
+    uri = f'sqlite-shared:///{tmp_path / "ratelimit.sqlite"}'
+    # Two storages on one file stand in for two worker processes
+    workers = [MovingWindowRateLimiter(storage_from_string(uri)) for _ in range(2)]
+    limit = parse('3 per minute')
+    
+    allowed = [workers[hit % 2].hit(limit, 'client') for hit in range(5)]
+    
+    assert allowed == [True, True, True, False, False]
+    assert workers[0].get_window_stats(limit, 'client').remaining == 0
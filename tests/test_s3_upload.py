@@ -0,0 +1,48 @@
+"""
+NEXDB - Streamed multipart uploads to S3
+"""
+
+import threading
+import time
+from app.backup import utils
+
+
+class FailingS3:
+    """Fails the first part while the others take a while to upload."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uploading = 0
+        self.uploaded = []
+        self.uploading_at_abort = None
+    
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'upload-1'}
+    
+    def upload_part(self, PartNumber, **kwargs):
+        if PartNumber == 1:
+            raise RuntimeError('part 1 failed')
+        with self.lock:
+            self.uploading += 1
+        time.sleep(0.2)
+        with self.lock:
+            self.uploading -= 1
+            self.uploaded.append(PartNumber)
+        return {'ETag': f'etag-{PartNumber}'}
+    
+    def abort_multipart_upload(self, **kwargs):
+        self.uploading_at_abort = self.uploading
+
+
+def test_abort_waits_for_parts_in_flight(app, monkeypatch):
+    s3 = FailingS3()
+    monkeypatch.setitem(app.config, 'S3_BUCKET', 'backups')
+    monkeypatch.setattr(utils, 'get_s3_client', lambda: s3)
+    
+    result = utils.upload_stream_to_s3((b'x' * 10 for _ in range(8)), 'key', part_size=10,
+                                       concurrency=4)
+    
+    assert not result['success']
+    assert s3.uploading_at_abort == 0
+    # Parts not yet started were cancelled rather than uploaded after the abort
+    assert len(s3.uploaded) < 7
@@ -0,0 +1,31 @@
+"""
+NEXDB - SQLite metadata store tuning
+"""
+
+from app import db
+from app.sqlite import create_sqlite_engine
+
+
+def _pragma(conn, name):
+    return conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+
+def test_application_engine_uses_the_configured_pragmas(app):
+    pragmas = app.config['SQLITE_PRAGMAS']
+    with db.engine.connect() as conn:
+        assert _pragma(conn, 'journal_mode') == pragmas['journal_mode'].lower()
+        assert _pragma(conn, 'busy_timeout') == pragmas['busy_timeout']
+        assert _pragma(conn, 'cache_size') == pragmas['cache_size']
+
+
+def test_engines_follow_config_changes(app, tmp_path):
+    config = dict(app.config)
+    config['SQLITE_PRAGMAS'] = dict(config['SQLITE_PRAGMAS'], busy_timeout=1234,
+                                    journal_mode='DELETE')
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'tuned.sqlite'}", config)
+    try:
+        with engine.connect() as conn:
+            assert _pragma(conn, 'busy_timeout') == 1234
+            assert _pragma(conn, 'journal_mode') == 'delete'
+    finally:
+        engine.dispose()
@@ -0,0 +1,9 @@
+"""
+NEXDB - WSGI entry point
+Run with: gunicorn --config gunicorn.conf.py wsgi:app
+"""
+
+import os
+from app import create_app
+
+app = create_app(os.getenv('FLASK_CONFIG', 'default'))